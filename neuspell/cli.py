@@ -0,0 +1,410 @@
+import argparse
+import contextlib
+import glob
+import importlib
+import json
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+
+import torch
+
+from .corrector import Corrector, _decode_line
+
+""" command line interface, see `python -m neuspell --help` """
+
+CHECKER_MODULES = {
+    "BertsclstmChecker": "corrector_bertsclstm",
+    "CnnlstmChecker": "corrector_cnnlstm",
+    "ElmosclstmChecker": "corrector_elmosclstm",
+    "NestedlstmChecker": "corrector_lstmlstm",
+    "SclstmChecker": "corrector_sclstm",
+    "SclstmbertChecker": "corrector_sclstmbert",
+    "SclstmelmoChecker": "corrector_sclstmelmo",
+    "BertChecker": "corrector_subwordbert",
+}
+# words per forward pass of `correct`, unless --batch-size or --max-tokens is given
+CORRECT_MAX_TOKENS = 2048
+
+
+def load_checker(checker: str, ckpt_path: str = None, **kwargs) -> Corrector:
+    """
+    :param checker: a checker class name, e.g. "SclstmChecker", or a pretrained model name, e.g. "scrnn-probwordnoise"
+    :param ckpt_path: a checkpoint folder to load instead of the checker's default pretrained model
+    """
+    names_to_checkers = {v: k for k, v in Corrector.DEFAULT_CHECKERNAME_TO_NAME_MAPPING.items()}
+    if checker in names_to_checkers:
+        kwargs.setdefault("name", checker)
+        checker = names_to_checkers[checker]
+    if checker not in CHECKER_MODULES:
+        raise ValueError(f"unknown checker `{checker}`, choose one of {[*CHECKER_MODULES, *names_to_checkers]}")
+    checker_class = getattr(importlib.import_module(f".{CHECKER_MODULES[checker]}", __package__), checker)
+    corrector = checker_class(**kwargs)
+    corrector.from_pretrained(ckpt_path=ckpt_path)
+    return corrector
+
+
+def _checker_kwargs(args):
+    tokenize = {"spacy": True, "fast": "fast", "none": False}[args.tokenize]
+    kwargs = {"tokenize": tokenize, "batch_size": args.batch_size, "max_tokens": args.max_tokens}
+    if args.device:
+        kwargs["device"] = args.device
+    if args.backend != "torch":
+        kwargs["backend"] = args.backend
+    if args.quantized:
+        kwargs["quantized"] = True
+    return kwargs
+
+
+def _add_checker_arguments(parser):
+    parser.add_argument("--checker", "--model", dest="checker", default="SclstmChecker",
+                        help="checker class name or pretrained model name (default: SclstmChecker)")
+    parser.add_argument("--ckpt-path", default=None, help="checkpoint folder, instead of the default pretrained one")
+    parser.add_argument("--device", default=None, help="cpu or cuda (default: cuda if available)")
+    parser.add_argument("--tokenize", choices=["spacy", "fast", "none"], default="fast",
+                        help="retokenization of inputs before correction (default: fast)")
+    parser.add_argument("--batch-size", type=int, default=None, help="sentences per forward pass")
+    parser.add_argument("--max-tokens", type=int, default=None,
+                        help=f"words per forward pass (default for `correct`: {CORRECT_MAX_TOKENS})")
+    parser.add_argument("--backend", choices=["torch", "onnx", "torchscript"], default="torch",
+                        help="onnx runs the model under onnxruntime on cpu, torchscript runs its compiled inference "
+                             "module; either is exported on first use (default: torch)")
+    parser.add_argument("--quantized", action="store_true",
+                        help="run the int8 dynamically quantized model on cpu, quantizing it on first use")
+
+
+""" serve """
+
+
+def serve_stdio(corrector: Corrector, max_batch_size=32, max_wait_ms=5, max_pending=1024, stdin=None, stdout=None):
+    """
+    reads newline-delimited JSON requests from `stdin` and writes one JSON line per request to `stdout`, in the
+    order of the requests; requests read close together are corrected in the same batch
+
+    request: {"id": 1, "text": "..."} or {"id": 1, "texts": ["..", ..]}, "id" being optional
+    response: {"id": 1, "corrected": "..."} or {"id": 1, "corrected": ["..", ..]}, or {"id": 1, "error": "..."}
+    empty and whitespace-only texts are returned as they are, without being batched with other requests' texts
+    """
+    from .scheduler import MicroBatchScheduler
+
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    # bounds the requests read ahead of the responses written
+    pending = queue.Queue(maxsize=max_pending)
+
+    def _write_responses():
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            request_id, futures, single, error = item
+            response = {} if request_id is None else {"id": request_id}
+            if error is None:
+                try:
+                    corrected = [future.result()[1] for future in futures]
+                    response["corrected"] = corrected[0] if single else corrected
+                except Exception as e:
+                    response["error"] = f"{e.__class__.__name__}: {e}"
+            else:
+                response["error"] = error
+            stdout.write(json.dumps(response, ensure_ascii=False) + "\n")
+            stdout.flush()
+
+    writer = threading.Thread(target=_write_responses, name="neuspell-stdio-writer", daemon=True)
+    writer.start()
+    with MicroBatchScheduler(corrector, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms) as scheduler:
+        for line in stdin:
+            if not line.strip():
+                continue
+            request_id, futures, single, error = None, [], False, None
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("expected a JSON object")
+                request_id = request.get("id", None)
+                if "text" in request:
+                    texts, single = [request["text"]], True
+                else:
+                    texts = request.get("texts", None)
+                if not (isinstance(texts, list) and all([isinstance(text, str) for text in texts])):
+                    raise ValueError("expected a `text` string or a `texts` list of strings")
+                futures = scheduler.submit_many(texts)
+            except ValueError as e:
+                error = str(e)
+            pending.put((request_id, futures, single, error))
+        pending.put(None)
+        writer.join()
+
+
+def _serve(args):
+    # the checkers log to stdout, which is kept for the responses alone
+    stdout = sys.stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        corrector = load_checker(args.checker, ckpt_path=args.ckpt_path, **_checker_kwargs(args))
+        print(f"{corrector.__class__.__name__} loaded, reading requests from stdin", file=sys.stderr)
+        serve_stdio(corrector, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms, stdout=stdout)
+
+
+""" correct """
+
+_SHARD_CORRECTOR = None
+
+
+def _init_shard_worker(corrector, num_threads):
+    global _SHARD_CORRECTOR
+    torch.set_num_threads(num_threads)
+    _SHARD_CORRECTOR = corrector
+
+
+def _correct_lines(corrector: Corrector, lines):
+    # empty lines are passed through as is, so that outputs align with inputs line by line
+    idxs = [i for i, line in enumerate(lines) if line]
+    corrected_lines = [""] * len(lines)
+    for i, corrected_line in zip(idxs, corrector.correct_strings([lines[i] for i in idxs]) if idxs else []):
+        corrected_lines[i] = corrected_line
+    return corrected_lines
+
+
+def _correct_shard(task, corrector: Corrector = None):
+    """
+    corrects the lines in bytes [start, end) of `src` and atomically writes them to `dest`; lines are stripped of
+    leading and trailing whitespace before correction, so outputs align with inputs line by line but do not keep
+    that whitespace. returns the task, its number of lines and of lines that were not valid utf-8
+    """
+    src, start, end, dest = task
+    with open(src, "rb") as fp:
+        fp.seek(start)
+        data = fp.read(end - start)
+    lines = data.split(b"\n")
+    if lines and not lines[-1]:
+        lines = lines[:-1]
+    lines, nreplaced = zip(*[_decode_line(line) for line in lines]) if lines else ([], [])
+    lines = [line.strip() for line in lines]
+    corrected_lines = _correct_lines(corrector or _SHARD_CORRECTOR, lines)
+    temp_path = dest + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as fp:
+        fp.write("".join([line + "\n" for line in corrected_lines]))
+        fp.flush()
+        os.fsync(fp.fileno())
+    os.replace(temp_path, dest)
+    return task, len(lines), sum(nreplaced)
+
+
+def _shard_offsets(path, shard_bytes):
+    # shards end at line boundaries, and depend only on the file and `shard_bytes`, so that reruns find the same shards
+    size = os.path.getsize(path)
+    offsets = [0]
+    with open(path, "rb") as fp:
+        while offsets[-1] < size:
+            fp.seek(min(offsets[-1] + shard_bytes, size))
+            fp.readline()
+            offsets.append(fp.tell())
+    return list(zip(offsets[:-1], offsets[1:]))
+
+
+def _is_output_path(path, out):
+    # outputs, shards and partial writes of this or earlier runs, e.g. when `out` is inside the inputs' folder
+    return (os.path.commonpath([path, out]) == out or path.endswith(".tmp")
+            or any([part.endswith(".shards") for part in path.split(os.sep)]))
+
+
+def _resolve_inputs(inp, out):
+    if os.path.isdir(inp):
+        paths = [path for path in glob.glob(os.path.join(inp, "**", "*"), recursive=True) if os.path.isfile(path)]
+    elif os.path.isfile(inp):
+        paths = [inp]
+    else:
+        paths = [path for path in glob.glob(inp, recursive=True) if os.path.isfile(path)]
+    out = os.path.abspath(out)
+    paths = sorted([path for path in map(os.path.abspath, paths) if not _is_output_path(path, out)])
+    if not paths:
+        raise FileNotFoundError(f"no input files found for `{inp}`")
+    root = os.path.commonpath([os.path.dirname(path) for path in paths])
+    return [(path, os.path.relpath(path, root)) for path in paths]
+
+
+def _src_manifest(src):
+    stat = os.stat(src)
+    return {"src": src, "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def _read_manifest(manifest_path):
+    if not os.path.isfile(manifest_path):
+        return None
+    with open(manifest_path, "r") as fp:
+        return json.load(fp)
+
+
+def _write_manifest(manifest_path, manifest):
+    with open(manifest_path + ".tmp", "w") as fp:
+        json.dump(manifest, fp)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+
+def _is_corrected(src, dest):
+    # an output is up to date if its input has not changed since, see `_merge_shards`
+    return os.path.isfile(dest) and _read_manifest(dest + ".manifest.json") == _src_manifest(src)
+
+
+def _plan_file(src, dest, shard_bytes):
+    """
+    returns the shards of `src` that are still to be corrected, reusing completed shards of a previous run
+    """
+    shards_dir = dest + ".shards"
+    manifest = {**_src_manifest(src), "shard_bytes": shard_bytes}
+    manifest_path = os.path.join(shards_dir, "manifest.json")
+    if os.path.isdir(shards_dir):
+        if _read_manifest(manifest_path) != manifest:
+            print(f"{src} or the shard size changed since the last run, discarding its completed shards",
+                  file=sys.stderr)
+            shutil.rmtree(shards_dir)
+    if not os.path.isdir(shards_dir):
+        os.makedirs(shards_dir)
+        _write_manifest(manifest_path, manifest)
+    offsets = _shard_offsets(src, shard_bytes)
+    shards = [os.path.join(shards_dir, f"{i:06d}.txt") for i in range(len(offsets))]
+    tasks = [(src, start, end, shard) for (start, end), shard in zip(offsets, shards) if not os.path.isfile(shard)]
+    return shards, tasks
+
+
+def _merge_shards(shards, dest):
+    # the input's size and mtime are kept next to the output, so that later runs correct the input again if it changed
+    manifest = _read_manifest(os.path.join(dest + ".shards", "manifest.json"))
+    temp_path = dest + ".tmp"
+    with open(temp_path, "wb") as opfile:
+        for shard in shards:
+            with open(shard, "rb") as fp:
+                shutil.copyfileobj(fp, opfile)
+        opfile.flush()
+        os.fsync(opfile.fileno())
+    os.replace(temp_path, dest)
+    _write_manifest(dest + ".manifest.json", {key: manifest[key] for key in ["src", "size", "mtime"]})
+    shutil.rmtree(dest + ".shards", ignore_errors=True)
+
+
+def correct_files(corrector: Corrector, inp, out, num_workers=1, shard_mb=8, mp_start_method="spawn"):
+    """
+    corrects every line of every file in `inp` (a file, a folder or a glob pattern) into a file of the same relative
+    path under the folder `out`; each file is split into shards of about `shard_mb` MB, which are corrected by
+    `num_workers` processes sharing the model's weights and written atomically, so that an interrupted run picks up
+    from its completed shards when started again; outputs whose inputs have not changed since (by size and mtime,
+    kept in a .manifest.json next to each output) are not corrected again
+    """
+    shard_bytes = int(shard_mb * 1e6)
+    files, tasks = {}, []
+    for src, rel_path in _resolve_inputs(inp, out):
+        dest = os.path.join(out, rel_path)
+        if _is_corrected(src, dest):
+            print(f"skipping {src}, already corrected at {dest}", file=sys.stderr)
+            continue
+        os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+        shards, file_tasks = _plan_file(src, dest, shard_bytes)
+        files[src] = {"dest": dest, "shards": shards, "remaining": len(file_tasks)}
+        tasks.extend(file_tasks)
+    for src, file in files.items():
+        if file["remaining"] == 0:
+            _merge_shards(file["shards"], file["dest"])
+    print(f"{len(tasks)} shards of {len(files)} files to correct", file=sys.stderr)
+
+    st_time, nlines, nreplaced = time.time(), 0, 0
+    if num_workers > 1:
+        corrector.model.share_memory()
+        num_threads = max(1, torch.get_num_threads() // num_workers)
+        context = torch.multiprocessing.get_context(mp_start_method)
+        pool = context.Pool(num_workers, initializer=_init_shard_worker, initargs=(corrector, num_threads))
+        results = pool.imap_unordered(_correct_shard, tasks)
+    else:
+        pool = None
+        results = (_correct_shard(task, corrector) for task in tasks)
+    try:
+        for (src, _, _, _), nlines_, nreplaced_ in results:
+            nlines += nlines_
+            nreplaced += nreplaced_
+            files[src]["remaining"] -= 1
+            if files[src]["remaining"] == 0:
+                _merge_shards(files[src]["shards"], files[src]["dest"])
+                print(f"corrected {src} into {files[src]['dest']}", file=sys.stderr)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    time_taken = time.time() - st_time
+    print(f"corrected {nlines} lines in {time_taken:.1f} secs ({nlines / max(time_taken, 1e-9):.1f} lines/sec)",
+          file=sys.stderr)
+    if nreplaced:
+        print(f"{nreplaced} lines were not valid utf-8, their invalid bytes were replaced by U+FFFD", file=sys.stderr)
+
+
+def _correct(args):
+    kwargs = _checker_kwargs(args)
+    kwargs.setdefault("bucket_by_length", True)
+    if kwargs["batch_size"] is None and kwargs["max_tokens"] is None:
+        kwargs["max_tokens"] = CORRECT_MAX_TOKENS
+    # the checkers log to stdout; progress goes to stderr alone, so that stdout can be piped
+    with contextlib.redirect_stdout(sys.stderr):
+        corrector = load_checker(args.checker, ckpt_path=args.ckpt_path, **kwargs)
+        correct_files(corrector, args.inp, args.out, num_workers=args.num_workers, shard_mb=args.shard_mb)
+
+
+""" prune-vocab """
+
+
+def _prune_vocab(args):
+    from .corrector import compare_benchmarks
+    from .vocab_pruning import prune_checkpoint
+
+    if not args.ckpt_path:
+        raise SystemExit("--ckpt-path is required")
+    wordlist = None
+    if args.wordlist:
+        with open(args.wordlist, "r") as fp:
+            wordlist = [line.strip() for line in fp if line.strip()]
+    prune_checkpoint(args.ckpt_path, args.out, topn=args.top_n, wordlist=wordlist)
+    if args.clean and args.corrupt:
+        results = []
+        for ckpt_path in [args.ckpt_path, args.out]:
+            corrector = load_checker(args.checker, ckpt_path=ckpt_path, **_checker_kwargs(args))
+            results.append(corrector.benchmark(args.clean, args.corrupt, data_dir=args.data_dir))
+        compare_benchmarks(*results, names=("original", "pruned"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m neuspell")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    serve_parser = subparsers.add_parser("serve", help="keep a checker loaded and correct requests as they come")
+    serve_parser.add_argument("--stdio", action="store_true", required=True,
+                              help="newline-delimited JSON requests on stdin, responses on stdout")
+    serve_parser.add_argument("--max-batch-size", type=int, default=32, help="requests corrected together")
+    serve_parser.add_argument("--max-wait-ms", type=float, default=5,
+                              help="how long a request may wait for others to batch with")
+    _add_checker_arguments(serve_parser)
+    serve_parser.set_defaults(func=_serve)
+
+    correct_parser = subparsers.add_parser("correct", help="correct files line by line, in parallel and resumably; "
+                                                           "lines are stripped of leading and trailing whitespace")
+    correct_parser.add_argument("--in", dest="inp", required=True, help="an input file, folder or glob pattern")
+    correct_parser.add_argument("--out", required=True,
+                                help="output folder; each output has its input's path relative to the inputs' folder")
+    correct_parser.add_argument("--num-workers", type=int, default=1, help="worker processes (default: 1)")
+    correct_parser.add_argument("--shard-mb", type=float, default=8, help="size of a shard of an input, in MB")
+    _add_checker_arguments(correct_parser)
+    correct_parser.set_defaults(func=_correct)
+
+    prune_parser = subparsers.add_parser("prune-vocab", help="prune the output vocab of a checkpoint")
+    prune_parser.add_argument("--out", required=True, help="folder of the pruned checkpoint")
+    prune_group = prune_parser.add_mutually_exclusive_group(required=True)
+    prune_group.add_argument("--top-n", type=int, default=None, help="keep the n most frequent words")
+    prune_group.add_argument("--wordlist", default=None, help="keep the words of this file, one per line")
+    prune_parser.add_argument("--clean", default=None, help="clean file of a test pair, to report the deltas")
+    prune_parser.add_argument("--corrupt", default=None, help="corrupt file of a test pair, to report the deltas")
+    prune_parser.add_argument("--data-dir", default="", help="folder of the test pair")
+    _add_checker_arguments(prune_parser)
+    prune_parser.set_defaults(func=_prune_vocab)
+
+    args = parser.parse_args(argv)
+    args.func(args)
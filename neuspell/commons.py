@@ -1,54 +1,89 @@
 import os
+import threading
 from string import punctuation
+from typing import Any, Callable, List
 
+from .fast_tokenizer import fast_tokenize
 from .util import is_module_available, get_module_or_attr
 
 """ default paths """
 
 DEFAULT_DATA_PATH = os.path.join(os.path.split(__file__)[0], "../data")
-print(f"data folder is set to `{DEFAULT_DATA_PATH}` script")
-if not os.path.exists(DEFAULT_DATA_PATH):
-    os.makedirs(DEFAULT_DATA_PATH)
 
 DEFAULT_TRAINTEST_DATA_PATH = os.path.join(DEFAULT_DATA_PATH, "traintest")
 
 ALLENNLP_ELMO_PRETRAINED_FOLDER = os.path.join(DEFAULT_DATA_PATH, "allennlp_elmo_pretrained")
 
+""" lazily loaded resources """
+
+_RESOURCE_BUILDERS, _RESOURCES = {}, {}
+_RESOURCES_LOCK = threading.RLock()
+
+
+def register_resource(name: str, builder: Callable[[], Any]):
+    """
+    registers a no-argument `builder` (tokenizers, rerankers, etc.) that is only called on the first
+    `get_resource(name)`, so that importing a module never loads weights or touches the disk;
+    re-registering a name drops the resource built so far
+    """
+    with _RESOURCES_LOCK:
+        _RESOURCE_BUILDERS[name] = builder
+        _RESOURCES.pop(name, None)
+
+
+def get_resource(name: str):
+    """
+    returns the resource registered as `name`, building it on first use; a builder that raises is retried on the
+    next call instead of caching the failure
+    """
+    if name in _RESOURCES:
+        return _RESOURCES[name]
+    with _RESOURCES_LOCK:
+        if name not in _RESOURCES:
+            if name not in _RESOURCE_BUILDERS:
+                raise KeyError(f"no resource registered as `{name}`")
+            _RESOURCES[name] = _RESOURCE_BUILDERS[name]()
+        return _RESOURCES[name]
+
+
+def is_resource_loaded(name: str):
+    return name in _RESOURCES
+
+
+def unload_resource(name: str):
+    """
+    drops the built resource (if any) so that its memory can be reclaimed; the next `get_resource` rebuilds it
+    """
+    with _RESOURCES_LOCK:
+        _RESOURCES.pop(name, None)
+
+
 """ special tokenizers """
 
-_SPACY_TOKENIZER, _SPACY_TAGGER = None, None
 
+def _build_spacy_nlp():
+    if not is_module_available("spacy"):
+        raise ImportError("`pip install spacy` to use spacy retokenizer")
+    if not is_module_available("en_core_web_sm"):
+        raise ImportError("run `python -m spacy download en_core_web_sm`")
+    print("creating spacy models ...")
+    spacy_nlp = get_module_or_attr("en_core_web_sm").load(disable=["tagger", "ner", "lemmatizer"])
+    print("spacy models initialized")
+    return spacy_nlp
 
-def _load_spacy_tokenizer():
-    global _SPACY_TOKENIZER, _SPACY_TAGGER
-
-    if not _SPACY_TOKENIZER:
-        if is_module_available("spacy"):
-            if not is_module_available("en_core_web_sm"):
-                raise ImportError("run `python -m spacy download en_core_web_sm`")
-            print("creating spacy models ...")
-            spacy_nlp = get_module_or_attr("en_core_web_sm").load(disable=["tagger", "ner", "lemmatizer"])
-            _SPACY_TOKENIZER = lambda inp: [token.text for token in spacy_nlp(inp)]
-            # spacy_nlp = get_module_or_attr("en_core_web_sm").load(disable=["ner", "lemmatizer"])
-            # _SPACY_TAGGER = lambda inp: [token.tag for token in spacy_nlp(inp)]
-            print("spacy models initialized")
-        else:
-            raise ImportError("`pip install spacy` to use spacy retokenizer")
-    return _SPACY_TOKENIZER
 
+register_resource("spacy", _build_spacy_nlp)
 
-def _custom_tokenizer(inp: str):
-    try:
-        _spacy_tokenizer = _load_spacy_tokenizer()
-        get_tokens = lambda inp: _spacy_tokenizer(inp)
-    except ImportError as e:
-        print(e)
-        get_tokens = lambda inp: inp.split()
 
+def _load_spacy_tokenizer():
+    spacy_nlp = get_resource("spacy")
+    return lambda inp: [token.text for token in spacy_nlp(inp)]
+
+
+def _merge_punct_tokens(tokens):
     def _is_punct(inp):
         return all([i in punctuation for i in inp])
 
-    tokens = get_tokens(inp)
     new_tokens = []
     str_ = ""
     for token in tokens:
@@ -63,4 +98,41 @@ def _custom_tokenizer(inp: str):
     return " ".join(new_tokens)
 
 
+def _custom_tokenizer(inp: str):
+    try:
+        _spacy_tokenizer = _load_spacy_tokenizer()
+        get_tokens = lambda inp: _spacy_tokenizer(inp)
+    except ImportError as e:
+        print(e)
+        get_tokens = lambda inp: inp.split()
+
+    return _merge_punct_tokens(get_tokens(inp))
+
+
+def _custom_batch_tokenizer(inps: List[str], batch_size: int = 256, n_process: int = 1):
+    """
+    same output as `[spacy_tokenizer(inp) for inp in inps]`, but the strings are run through spacy's `nlp.pipe`
+    in batches of `batch_size`, with `n_process` worker processes
+    """
+    try:
+        spacy_nlp = get_resource("spacy")
+        batch_tokens = [
+            [token.text for token in doc] for doc in spacy_nlp.pipe(inps, batch_size=batch_size, n_process=n_process)
+        ]
+    except ImportError as e:
+        print(e)
+        batch_tokens = [inp.split() for inp in inps]
+
+    return [_merge_punct_tokens(tokens) for tokens in batch_tokens]
+
+
+def _custom_fast_tokenizer(inp: str):
+    """
+    same output as `spacy_tokenizer(inp)`, without loading spacy; see `fast_tokenizer.py`
+    """
+    return _merge_punct_tokens(fast_tokenize(inp))
+
+
 spacy_tokenizer = _custom_tokenizer
+spacy_batch_tokenizer = _custom_batch_tokenizer
+fast_tokenizer = _custom_fast_tokenizer
@@ -1,20 +1,118 @@
+import atexit
+import copy
+import io
+import json
+import math
 import os
+import time
+import weakref
 from abc import ABC, abstractmethod
-from typing import List
+from itertools import islice
+from typing import Iterable, List
 
 import torch
 
-from .commons import DEFAULT_DATA_PATH
+from .commons import DEFAULT_DATA_PATH, DEFAULT_TRAINTEST_DATA_PATH, fast_tokenizer, spacy_batch_tokenizer
+from .metrics import stage
+from .model_registry import MODEL_REGISTRY
+from .onnx_backend import EXPORT_WRAPPERS, OrtModel, export_onnx
 from .seq_modeling.downloads import download_pretrained_model
-from .seq_modeling.helpers import load_vocab_dict, get_model_nparams
+from .seq_modeling.helpers import load_data, load_vocab_dict, get_model_nparams, budget_batch_iter
+from .torchscript_backend import SCRIPTABLE_MODEL_TYPES, ScriptedModel, save_torchscript
 from .util import is_module_available
 
 
 def get_size_of_model(model):
-    torch.save(model.state_dict(), "temp.p")
-    size = os.path.getsize("temp.p") / 1e6
-    os.remove('temp.p')
-    return size
+    # serialized in memory, rather than to a file in the working directory
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.getbuffer().nbytes / 1e6
+
+
+def _load_pickled_model(path):
+    try:
+        return torch.load(path, map_location="cpu", weights_only=False)
+    except TypeError:
+        # torch<1.13
+        return torch.load(path, map_location="cpu")
+
+
+def _decode_line(line: bytes):
+    # invalid utf-8 is replaced rather than failing the whole run, and such lines are counted to be reported
+    try:
+        return line.decode("utf-8"), False
+    except UnicodeDecodeError:
+        return line.decode("utf-8", errors="replace"), True
+
+
+def _file_source(src):
+    # identifies the contents of a file being corrected, so that a checkpoint is not resumed once it changed
+    stat = os.stat(src)
+    return {"src": os.path.abspath(src), "src_size": stat.st_size, "src_mtime": stat.st_mtime}
+
+
+def compare_benchmarks(baseline: dict, candidate: dict, names=("baseline", "candidate")):
+    """
+    prints and returns two results of `Corrector.benchmark` and the candidate's deltas relative to the baseline
+    """
+    delta = {
+        "speedup": baseline["seconds"] / max(candidate["seconds"], 1e-9),
+        "accuracy": candidate["accuracy"] - baseline["accuracy"],
+        "word_correction_rate": candidate["word_correction_rate"] - baseline["word_correction_rate"],
+    }
+    if baseline["size_mb"] and candidate["size_mb"]:
+        delta["size_ratio"] = candidate["size_mb"] / baseline["size_mb"]
+    report = {names[0]: baseline, names[1]: candidate, "delta": delta}
+    print("###############################################")
+    for name in [*names, "delta"]:
+        print(f"{name}: " + ", ".join([f"{k}: {v:.4f}" for k, v in report[name].items() if v is not None]))
+    print("###############################################")
+    return report
+
+
+def get_word_metrics(clean_lines: List[str], corrupt_lines: List[str], predicted_lines: List[str]):
+    """
+    word-level accuracy, and correction rate of the misspelt words, as printed by `evaluate()`
+    """
+    corr2corr, corr2incorr, incorr2corr, incorr2incorr = 0, 0, 0, 0
+    for clean_line, corrupt_line, predicted_line in zip(clean_lines, corrupt_lines, predicted_lines):
+        for clean, corrupt, predicted in zip(clean_line.split(), corrupt_line.split(), predicted_line.split()):
+            if clean == corrupt:
+                corr2corr, corr2incorr = corr2corr + (predicted == clean), corr2incorr + (predicted != clean)
+            else:
+                incorr2corr, incorr2incorr = incorr2corr + (predicted == clean), incorr2incorr + (predicted != clean)
+    ntokens = corr2corr + corr2incorr + incorr2corr + incorr2incorr
+    return {
+        "accuracy": (corr2corr + incorr2corr) / max(ntokens, 1),
+        "word_correction_rate": incorr2corr / max(incorr2corr + incorr2incorr, 1),
+        "ntokens": ntokens,
+    }
+
+
+_WORKER_CORRECTOR = None
+
+
+def _init_worker(corrector, num_threads):
+    global _WORKER_CORRECTOR
+    torch.set_num_threads(num_threads)
+    _WORKER_CORRECTOR = corrector
+
+
+def _worker_correct_strings(mystrings):
+    # the batching statistics of the shard are returned with its outputs, to be merged in the parent process
+    _WORKER_CORRECTOR._batching_stats.clear()
+    tokenized_strings, return_strings = _WORKER_CORRECTOR.correct_strings(mystrings, return_all=True)
+    return tokenized_strings, return_strings, dict(_WORKER_CORRECTOR._batching_stats)
+
+
+# correctors with running worker pools, which are closed at exit if they were not closed before
+_WORKER_POOL_OWNERS = weakref.WeakSet()
+
+
+@atexit.register
+def _close_all_workers():
+    for corrector in list(_WORKER_POOL_OWNERS):
+        corrector.close_workers()
 
 
 class Corrector(ABC):
@@ -47,12 +145,56 @@ class Corrector(ABC):
             "SclstmelmoChecker": "scrnnelmo-probwordnoise",
         })
 
+    # the type of the checker's model, for the backends other than torch, see `EXPORT_WRAPPERS` and
+    # `SCRIPTABLE_MODEL_TYPES`
+    MODEL_TYPE = None
+
     def __init__(self, **kwargs):
 
         self._default_name = kwargs.get("name", None)
+        # True for spacy tokenization of `correct_strings` inputs, "fast" for its pure-python port in `fast_tokenizer`
         self.tokenize = kwargs.get("tokenize", True)
+        # spacy tokenization only, see `spacy_batch_tokenizer`
+        self.tokenize_batch_size = kwargs.get("tokenize_batch_size", 256)
+        self.tokenize_n_process = kwargs.get("tokenize_n_process", 1)
+        self.bucket_by_length = kwargs.get("bucket_by_length", False)
+        # batching; by default, a fixed number of sentences per batch based on the device
+        self.batch_size = kwargs.get("batch_size", None)
+        self.max_tokens = kwargs.get("max_tokens", None)
+        self.max_padded_tokens = kwargs.get("max_padded_tokens", None)
+        self._batching_stats = {}
         self.device = kwargs.get("device", "cuda" if torch.cuda.is_available() else "cpu")
         self.device = "cuda" if self.device == "gpu" else self.device
+        # pretrained models and vocabs are shared with other correctors of this process, see `MODEL_REGISTRY`
+        self.share_models = kwargs.get("share_models", True)
+        self._shared_model_key, self._shared_vocab_path = None, None
+        # cpu only; shards `correct_strings` inputs across worker processes, see `_correct_strings_in_workers`
+        self.num_workers = kwargs.get("num_workers", 0)
+        self.mp_start_method = kwargs.get("mp_start_method", "spawn")
+        self._worker_pool = None
+        # "torch"; "onnx" to run the model under onnxruntime on cpu, see `OrtModel`; or "torchscript" to run
+        # its compiled inference module, see `ScriptedModel`. The model is exported to `onnx_path` or
+        # `torchscript_path` (by default, model.onnx or model.pt in the checkpoint folder) the first time
+        # it is loaded, and later loads read the export only
+        self.backend = kwargs.get("backend", "torch")
+        self.onnx_path = kwargs.get("onnx_path", None)
+        self.ort_num_threads = kwargs.get("ort_num_threads", None)
+        self.torchscript_path = kwargs.get("torchscript_path", None)
+        if self.backend not in ["torch", "onnx", "torchscript"]:
+            raise ValueError(f"unknown backend `{self.backend}`, choose one of ['torch', 'onnx', 'torchscript']")
+        if (self.backend == "onnx" and self.MODEL_TYPE not in EXPORT_WRAPPERS) or \
+                (self.backend == "torchscript" and self.MODEL_TYPE not in SCRIPTABLE_MODEL_TYPES):
+            raise NotImplementedError(f"the {self.backend} backend is not available for {self.__class__.__name__}")
+        if self.backend == "onnx":
+            self.device = "cpu"
+        # torch backend only; loads the dynamically quantized model saved in the checkpoint folder, or
+        # quantizes and saves it on first load, see `quantize_model` and `save_quantized_model`
+        self.quantized = kwargs.get("quantized", False)
+        if self.quantized:
+            if self.backend != "torch":
+                raise ValueError("quantized checkpoints are only available with the torch backend")
+            self.device = "cpu"
+        self.is_quantized = False
 
         self.ckpt_path, self.vocab_path, self.weights_path = None, None, None
         self.model, self.vocab = None, None
@@ -69,6 +211,30 @@ class Corrector(ABC):
         if kwargs.get("pretrained", False):
             self.from_pretrained(ckpt_path=self.ckpt_path)
 
+    @property
+    def model(self):
+        # a shared model is held by `MODEL_REGISTRY` alone, so that its memory budget can free it; it is loaded
+        # again on its next use then
+        if self._shared_model_key is not None:
+            return MODEL_REGISTRY.get_model(self._shared_model_key, self._load_model_for_registry)
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        # also set by `load_model` when loading a shared model, which is unshared explicitly, see `_unshare_model`
+        self._model = model
+
+    @property
+    def vocab(self):
+        if self._shared_vocab_path is not None:
+            return MODEL_REGISTRY.get_vocab(self._shared_vocab_path, load_vocab_dict)
+        return self._vocab
+
+    @vocab.setter
+    def vocab(self, vocab):
+        self._vocab = vocab
+        self._shared_vocab_path = None
+
     def is_model_ready(self):
         assert not (self.model is None or self.vocab is None), print("model & vocab must be loaded first")
 
@@ -79,11 +245,20 @@ class Corrector(ABC):
     def set_device(self, device='cpu'):
         prev_device = self.device
         device = "cuda" if ((device == "gpu" or device == "cuda") and torch.cuda.is_available()) else "cpu"
+        if self.backend == "onnx" and device != "cpu":
+            raise ValueError("the onnx backend runs on cpu only")
+        if self.is_quantized and device != "cpu":
+            raise ValueError("quantized models run on cpu only")
         if not (prev_device == device):
+            self.close_workers()
             # use .to() if moving from cpu or gpu, and for reverse, use map_location
             # https://tinyurl.com/y57pcjvd
             # https://pytorch.org/tutorials/recipes/recipes/save_load_across_devices.html
-            if self.model is not None:
+            if self._shared_model_key is not None:
+                # moving the shared model would move it for every corrector using it
+                self.device = device
+                self._load_shared_model(self.ckpt_path)
+            elif self.model is not None:
                 try:
                     self.model.to(device)
                 except Exception as e:
@@ -97,6 +272,108 @@ class Corrector(ABC):
             print(f"model set to work on {device}")
         return
 
+    def get_batch_size(self):
+        """
+        number of sentences per batch; batches are bounded only by the token budgets
+        if any of `max_tokens` or `max_padded_tokens` is set and `batch_size` is not
+        """
+        if self.batch_size:
+            return self.batch_size
+        if self.max_tokens or self.max_padded_tokens:
+            return None
+        return 4 if self.device == "cpu" else 16
+
+    def _batching_kwargs(self):
+        return {
+            "batch_size": self.get_batch_size(),
+            "max_tokens": self.max_tokens,
+            "max_padded_tokens": self.max_padded_tokens,
+            "stats": self._batching_stats,
+        }
+
+    def _tokenize_strings(self, mystrings: List[str]) -> List[str]:
+        if self.tokenize == "fast":
+            with stage("fast_tokenize"):
+                return [fast_tokenizer(my_str) for my_str in mystrings]
+        with stage("spacy_tokenize"):
+            return spacy_batch_tokenizer(mystrings, batch_size=self.tokenize_batch_size,
+                                         n_process=self.tokenize_n_process)
+
+    def _use_workers(self):
+        return self.num_workers > 1 and self.device == "cpu"
+
+    def _correct_strings_in_workers(self, mystrings: List[str], return_all=False):
+        """
+        splits `mystrings` into contiguous shards that `num_workers` processes correct in parallel, and
+        joins their outputs back in input order; the workers are started on first use and kept alive
+        until `close_workers()` (or exit), and the model's weights are moved to shared memory so that they all read
+        the same tensors instead of holding a copy each; the workers' batching statistics add up in `batching_stats()`
+        """
+        if self._worker_pool is None:
+            self.model.share_memory()
+            # split the intra-op threads among workers, so that the cores are not oversubscribed
+            num_threads = max(1, torch.get_num_threads() // self.num_workers)
+            context = torch.multiprocessing.get_context(self.mp_start_method)
+            # a copy that corrects in-process (see `__getstate__`); the pool's threads keep its initargs alive, which
+            # would otherwise keep this corrector from being garbage collected, and its pool from being closed
+            self._worker_pool = context.Pool(self.num_workers, initializer=_init_worker,
+                                             initargs=(copy.copy(self), num_threads))
+            _WORKER_POOL_OWNERS.add(self)
+        # a few shards per worker keeps them all busy when shards take uneven times
+        shard_size = max(self.get_batch_size() or 1, math.ceil(len(mystrings) / (4 * self.num_workers)))
+        shards = [mystrings[i:i + shard_size] for i in range(0, len(mystrings), shard_size)]
+        tokenized_strings, return_strings = [], []
+        for tokenized_shard, return_shard, shard_stats in self._worker_pool.imap(_worker_correct_strings, shards):
+            tokenized_strings.extend(tokenized_shard)
+            return_strings.extend(return_shard)
+            for name, val in shard_stats.items():
+                self._batching_stats[name] = self._batching_stats.get(name, 0) + val
+        if return_all:
+            return tokenized_strings, return_strings
+        else:
+            return return_strings
+
+    def close_workers(self):
+        if self._worker_pool is not None:
+            self._worker_pool.terminate()
+            self._worker_pool.join()
+            self._worker_pool = None
+        _WORKER_POOL_OWNERS.discard(self)
+
+    def __del__(self):
+        # getattr, as __init__ may have failed before setting it
+        if getattr(self, "_worker_pool", None) is not None:
+            self.close_workers()
+
+    def __getstate__(self):
+        # the copy sent to worker processes corrects in-process, with the model and vocab it was given rather than
+        # those of the registry of its process
+        state = self.__dict__.copy()
+        state.update({"num_workers": 0, "_worker_pool": None})
+        if self._shared_model_key is not None:
+            state.update({"_model": self.model, "_shared_model_key": None})
+        if self._shared_vocab_path is not None:
+            state.update({"_vocab": self.vocab, "_shared_vocab_path": None})
+        return state
+
+    def batching_stats(self, reset=False):
+        stats = {
+            "batch_size": self.get_batch_size(),
+            "max_tokens": self.max_tokens,
+            "max_padded_tokens": self.max_padded_tokens,
+            "bucket_by_length": self.bucket_by_length,
+        }
+        stats.update(self._batching_stats)
+        if self._batching_stats.get("nbatches", 0) > 0:
+            stats.update({
+                "avg_batch_size": stats["nitems"] / stats["nbatches"],
+                "avg_tokens_per_batch": stats["ntokens"] / stats["nbatches"],
+                "padding_ratio": 1 - stats["ntokens"] / max(stats["npadded_tokens"], 1),
+            })
+        if reset:
+            self._batching_stats.clear()
+        return stats
+
     def correct(self, x):
         return self.correct_string(x)
 
@@ -107,8 +384,33 @@ class Corrector(ABC):
         else:
             return x[0]
 
-    def correct_from_file(self, src, dest="./clean_version.txt"):
+    def correct_strings_iter(self, mystrings: Iterable[str], return_all=False):
+        """
+        lazily corrects strings from any iterable (a list, a file object, a generator, ...) and yields
+        the corrected strings in input order as soon as each batch is corrected; with `return_all=True`,
+        yields tuples of (tokenized input string, corrected string)
+        """
+        self.is_model_ready()
+        # batches are formed here with the instance's batching options, so that
+        # every call to `correct_strings` below runs a single batch through the model
+        data = ((line, line) for line in mystrings)
+        for _, batch_strings in budget_batch_iter(data, self.get_batch_size(), max_tokens=self.max_tokens,
+                                                  max_padded_tokens=self.max_padded_tokens):
+            if return_all:
+                yield from zip(*self.correct_strings(batch_strings, return_all=True))
+            else:
+                yield from self.correct_strings(batch_strings)
+
+    def correct_from_file(self, src, dest="./clean_version.txt", chunk_size=None, resume=False):
+        """
+        :param chunk_size: if given, `src` is streamed `chunk_size` lines at a time and each corrected chunk
+            is appended to `dest` right away, keeping memory bounded irrespective of the size of `src`
+        :param resume: when streaming, continue an interrupted run from the checkpoint saved next to `dest`
+        """
         self.is_model_ready()
+        if chunk_size:
+            self._correct_from_file_streaming(src, dest, chunk_size, resume=resume)
+            return
         x = [line.strip() for line in open(src, 'r')]
         y = self.correct_strings(x)
         print(f"saving results at: {dest}")
@@ -118,6 +420,60 @@ class Corrector(ABC):
         opfile.close()
         return
 
+    def _correct_from_file_streaming(self, src, dest, chunk_size, resume=False):
+        # progress is saved as byte offsets into `src` and `dest` after every chunk is written
+        ckpt_path = dest + ".ckpt"
+        src_offset, dest_offset, nlines, nreplaced = 0, 0, 0, 0
+        if resume and os.path.isfile(ckpt_path):
+            with open(ckpt_path, "r") as fp:
+                ckpt = json.load(fp)
+            if ckpt["src"] != os.path.abspath(src):
+                raise ValueError(f"checkpoint at {ckpt_path} was created for a different source file: {ckpt['src']}")
+            if {key: ckpt.get(key, None) for key in ["src", "src_size", "src_mtime"]} != _file_source(src):
+                raise ValueError(f"{src} changed since the checkpoint at {ckpt_path} was saved, its offsets do not "
+                                 f"apply anymore; remove the checkpoint to start over")
+            if not os.path.isfile(dest) or os.path.getsize(dest) < ckpt["dest_offset"]:
+                print(f"{dest} is missing or shorter than at the checkpoint, starting over")
+            else:
+                src_offset, dest_offset, nlines = ckpt["src_offset"], ckpt["dest_offset"], ckpt["nlines"]
+                nreplaced = ckpt.get("nreplaced", 0)
+                print(f"resuming from line {nlines} of {src}")
+
+        print(f"saving results at: {dest}")
+        with open(src, "rb") as srcfile, open(dest, "r+b" if src_offset else "wb") as opfile:
+            srcfile.seek(src_offset)
+            # drop anything written after the last checkpoint
+            opfile.truncate(dest_offset)
+            opfile.seek(dest_offset)
+            while True:
+                lines = list(islice(srcfile, chunk_size))
+                if not lines:
+                    break
+                x, replaced = zip(*[_decode_line(line) for line in lines])
+                y = self.correct_strings([line.strip() for line in x])
+                opfile.write("".join([line + "\n" for line in y]).encode("utf-8"))
+                opfile.flush()
+                os.fsync(opfile.fileno())
+                nlines += len(lines)
+                nreplaced += sum(replaced)
+                self._save_file_checkpoint(ckpt_path, src, srcfile.tell(), opfile.tell(), nlines, nreplaced=nreplaced)
+
+        if os.path.isfile(ckpt_path):
+            os.remove(ckpt_path)
+        print(f"corrected {nlines} lines")
+        if nreplaced:
+            print(f"{nreplaced} lines were not valid utf-8, their invalid bytes were replaced by U+FFFD")
+        return
+
+    @staticmethod
+    def _save_file_checkpoint(ckpt_path, src, src_offset, dest_offset, nlines, nreplaced=0):
+        temp_path = ckpt_path + ".tmp"
+        with open(temp_path, "w") as fp:
+            json.dump({**_file_source(src), "src_offset": src_offset, "dest_offset": dest_offset, "nlines": nlines,
+                       "nreplaced": nreplaced}, fp)
+        # atomic, so an interruption never leaves a partially written checkpoint
+        os.replace(temp_path, ckpt_path)
+
     def _from_pretrained(self, ckpt_path=None, vocab_path=None):
 
         if ckpt_path:
@@ -131,17 +487,125 @@ class Corrector(ABC):
         if not os.path.isfile(self.vocab_path):  # leads to "FileNotFoundError"
             download_pretrained_model(self.ckpt_path)
 
+        self.close_workers()
+        self._shared_model_key = None
         self.load_output_vocab(self.vocab_path)
-        self.load_model(self.ckpt_path)
+        self.is_quantized = False
+        if self.backend == "onnx":
+            self._load_onnx_model()
+        elif self.backend == "torchscript":
+            self._load_torchscript_model()
+        elif self.quantized:
+            self._load_quantized_model()
+        elif self.share_models:
+            self._load_shared_model(self.ckpt_path)
+        else:
+            self.load_model(self.ckpt_path)
 
         return
 
+    def _load_shared_model(self, ckpt_path):
+        key = (self.__class__.__name__, os.path.abspath(ckpt_path), os.path.abspath(self.vocab_path), self.device)
+        self._shared_model_key, self._model = None, None
+        MODEL_REGISTRY.get_model(key, self._load_model_for_registry)
+        self._shared_model_key = key
+
+    def _load_model_for_registry(self):
+        # without this corrector keeping a reference to the model, see `model`
+        self.load_model(self.ckpt_path)
+        model, self._model = self._model, None
+        model.eval()
+        return model
+
+    def _load_onnx_model(self):
+        onnx_path = self.onnx_path or os.path.join(self.ckpt_path, "model.onnx")
+        if not os.path.isfile(onnx_path):
+            self.load_model(self.ckpt_path)
+            export_onnx(self.model, self.MODEL_TYPE, onnx_path)
+        self.model = OrtModel(onnx_path, self.MODEL_TYPE, num_threads=self.ort_num_threads)
+        self._shared_model_key = None
+
+    def _load_torchscript_model(self):
+        torchscript_path = self.torchscript_path or os.path.join(self.ckpt_path, "model.pt")
+        if not os.path.isfile(torchscript_path):
+            self.load_model(self.ckpt_path)
+            save_torchscript(self.model, torchscript_path)
+        self.model = ScriptedModel(torchscript_path, device=self.device)
+        self._shared_model_key = None
+
+    def _quantization_source(self):
+        # identifies the float weights a quantized model was made from, to tell when it is stale
+        weights_path = os.path.join(self.ckpt_path, "pytorch_model.bin")
+        if not os.path.isfile(weights_path):
+            return None
+        stat = os.stat(weights_path)
+        return {"weights_path": os.path.abspath(weights_path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+    def _load_quantized_model(self):
+        quantized_path = os.path.join(self.ckpt_path, "quantized_model.pt")
+        source_path = os.path.splitext(quantized_path)[0] + ".json"
+        is_stale = True
+        if os.path.isfile(quantized_path) and os.path.isfile(source_path):
+            with open(source_path, "r") as fp:
+                is_stale = json.load(fp) != self._quantization_source()
+            if is_stale:
+                print(f"{quantized_path} is stale, the checkpoint's weights changed since it was saved")
+        if not is_stale:
+            print(f"loading quantized model from path:{quantized_path}")
+            self.model = _load_pickled_model(quantized_path)
+            self.model.eval()
+            self.is_quantized = True
+            self._shared_model_key = None
+        else:
+            self.is_quantized = False
+            self.load_model(self.ckpt_path)
+            self.quantize_model()
+            self.save_quantized_model(quantized_path)
+
+    def export_onnx(self, onnx_path=None):
+        """
+        exports the loaded (torch) model to `onnx_path`, by default model.onnx in the checkpoint folder,
+        to be run with `backend="onnx"`
+        """
+        self.is_model_ready()
+        if self.MODEL_TYPE not in EXPORT_WRAPPERS:
+            raise NotImplementedError(f"onnx export is not available for {self.__class__.__name__}")
+        if not isinstance(self.model, torch.nn.Module):
+            raise Exception("only a model loaded with the torch backend can be exported")
+        # exported on cpu, without moving this corrector's model
+        model = self.model if self.device == "cpu" else copy.deepcopy(self.model)
+        return export_onnx(model, self.MODEL_TYPE, onnx_path or os.path.join(self.ckpt_path, "model.onnx"))
+
+    def export_torchscript(self, torchscript_path=None):
+        """
+        saves the compiled inference module of the loaded (torch) model to `torchscript_path`, by default
+        model.pt in the checkpoint folder, to be run with `backend="torchscript"`
+        """
+        self.is_model_ready()
+        if self.MODEL_TYPE not in SCRIPTABLE_MODEL_TYPES:
+            raise NotImplementedError(f"torchscript export is not available for {self.__class__.__name__}")
+        if not isinstance(self.model, torch.nn.Module):
+            raise Exception("only a model loaded with the torch backend can be exported")
+        return save_torchscript(self.model, torchscript_path or os.path.join(self.ckpt_path, "model.pt"))
+
+    def _unshare_model(self):
+        """
+        gives this corrector its own copy of the model before modifying it in place, e.g. when finetuning
+        """
+        if self._shared_model_key is not None:
+            self.model = copy.deepcopy(self.model)
+            self._shared_model_key = None
+
     def from_pretrained(self, ckpt_path=None, vocab_path=None, **kwargs):
-        self._from_pretrained(ckpt_path=None, vocab_path=None, **kwargs)
+        self._from_pretrained(ckpt_path=ckpt_path, vocab_path=vocab_path, **kwargs)
 
     def load_output_vocab(self, vocab_path):
         print(f"loading vocab from path:{vocab_path}")
-        self.vocab = load_vocab_dict(vocab_path)
+        if self.share_models:
+            MODEL_REGISTRY.get_vocab(vocab_path, load_vocab_dict)
+            self._vocab, self._shared_vocab_path = None, vocab_path
+        else:
+            self.vocab = load_vocab_dict(vocab_path)
 
     def evaluate(self, **kwargs):
         raise NotImplementedError
@@ -177,15 +641,18 @@ class Corrector(ABC):
 
     # new!!
     def quantize_model(self, print_stats=False):
+        """
+        dynamically quantizes the weights of the `nn.Linear` and `nn.LSTM` modules to int8; the quantized model can be
+        saved with `save_quantized_model` and loaded with `quantized=True`, see `quantization_report` for its speed and
+        accuracy
+        """
         self.is_model_ready()
-
-        try:
-            quantized_model = torch.quantization.quantize_dynamic(
-                self.model, {torch.nn.Linear}, dtype=torch.qint8
-            )
-        except RuntimeError as e:
-            msg = "Consider moving models to `cpu` by calling `.set_device(device='cpu')` before quantization. "
-            raise Exception(msg) from e
+        if self.backend != "torch":
+            raise Exception("quantization is only available with the torch backend")
+        if self.is_quantized:
+            print("model is already quantized")
+            return
+        quantized_model = self._quantized_copy()
 
         if print_stats:
             print("Before quantization:")
@@ -193,4 +660,88 @@ class Corrector(ABC):
             print("After quantization:")
             print(self.model_size(quantized_model))
 
+        self.close_workers()
         self.model = quantized_model
+        self.is_quantized = True
+        # `quantize_dynamic` returns a copy, so the shared model is left as is
+        self._shared_model_key = None
+
+    def _quantized_copy(self):
+        try:
+            return torch.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear, torch.nn.LSTM}, dtype=torch.qint8
+            )
+        except RuntimeError as e:
+            msg = "Consider moving models to `cpu` by calling `.set_device(device='cpu')` before quantization. "
+            raise Exception(msg) from e
+
+    def save_quantized_model(self, quantized_path=None):
+        """
+        saves the quantized model, by default as quantized_model.pt in the checkpoint folder, where `quantized=True`
+        loads it from; the whole module is saved, as quantized weights cannot be loaded into a float model. The size and
+        modification time of the checkpoint's pytorch_model.bin are saved next to it, in a .json of the same name, and
+        `quantized=True` quantizes again when they no longer match
+        """
+        self.is_model_ready()
+        if not self.is_quantized:
+            raise Exception("call `quantize_model()` first")
+        quantized_path = quantized_path or os.path.join(self.ckpt_path, "quantized_model.pt")
+        # atomic, so that a corrector loading it concurrently never reads a partial file
+        temp_path = quantized_path + ".tmp"
+        torch.save(self.model, temp_path)
+        os.replace(temp_path, quantized_path)
+        source_path = os.path.splitext(quantized_path)[0] + ".json"
+        with open(source_path + ".tmp", "w") as fp:
+            json.dump(self._quantization_source(), fp)
+        os.replace(source_path + ".tmp", source_path)
+        print(f"quantized model saved at: {quantized_path}")
+        return quantized_path
+
+    def benchmark(self, clean_file, corrupt_file, data_dir="", nrepeats=1):
+        """
+        corrects the test pair of `evaluate()` and returns the model's size, the latency and the word-level accuracy
+        """
+        self.is_model_ready()
+        data_dir = DEFAULT_TRAINTEST_DATA_PATH if data_dir == "default" else data_dir
+        test_data = load_data(data_dir, clean_file, corrupt_file)
+        clean_lines, corrupt_lines = [line[0] for line in test_data], [line[1] for line in test_data]
+
+        tokenize, self.tokenize = self.tokenize, False  # the test files are whitespace-tokenized already
+        try:
+            st_time = time.perf_counter()
+            for _ in range(nrepeats):
+                predicted_lines = self.correct_strings(corrupt_lines)
+            elapsed = (time.perf_counter() - st_time) / nrepeats
+        finally:
+            self.tokenize = tokenize
+        return {
+            "size_mb": get_size_of_model(self.model) if isinstance(self.model, torch.nn.Module) else None,
+            "seconds": elapsed,
+            "sentences_per_second": len(corrupt_lines) / max(elapsed, 1e-9),
+            **get_word_metrics(clean_lines, corrupt_lines, predicted_lines),
+        }
+
+    def quantization_report(self, clean_file, corrupt_file, data_dir="", nrepeats=1):
+        """
+        `benchmark` of the loaded model and of its quantized copy; the loaded model is left as is
+        """
+        self.is_model_ready()
+        if self.device != "cpu" or self.is_quantized or self.backend != "torch":
+            raise Exception("the report compares a float model on cpu with its quantized copy, "
+                            "call `.set_device(device='cpu')` on a non-quantized model first")
+        # both models are measured in-process: worker processes keep the model they were started with, see
+        # `_correct_strings_in_workers`, and a quantized model cannot be moved to shared memory for them
+        self.close_workers()
+        float_model, shared_model_key, num_workers = self.model, self._shared_model_key, self.num_workers
+        self.num_workers = 0
+        try:
+            float_results = self.benchmark(clean_file, corrupt_file, data_dir=data_dir, nrepeats=nrepeats)
+            self.model, self._shared_model_key = self._quantized_copy(), None
+            quantized_results = self.benchmark(clean_file, corrupt_file, data_dir=data_dir, nrepeats=nrepeats)
+        finally:
+            self.num_workers = num_workers
+            if shared_model_key is not None:
+                self._model, self._shared_model_key = None, shared_model_key
+            else:
+                self.model = float_model
+        return compare_benchmarks(float_results, quantized_results, names=("float", "quantized"))
@@ -1,7 +1,7 @@
 from typing import List
 
-from .commons import spacy_tokenizer
 from .corrector import Corrector
+from .metrics import timed
 from .seq_modeling.cnnlstm import load_model, load_pretrained, model_predictions, model_inference
 from .seq_modeling.helpers import load_data
 
@@ -10,18 +10,23 @@ from .seq_modeling.helpers import load_data
 
 class CnnlstmChecker(Corrector):
 
+    MODEL_TYPE = "cnnlstm"
+
     def load_model(self, ckpt_path):
         print(f"initializing model")
         initialized_model = load_model(self.vocab)
         self.model = load_pretrained(initialized_model, self.ckpt_path, device=self.device)
 
+    @timed("correct_strings")
     def correct_strings(self, mystrings: List[str], return_all=False) -> List[str]:
         self.is_model_ready()
+        if self._use_workers():
+            return self._correct_strings_in_workers(mystrings, return_all=return_all)
         if self.tokenize:
-            mystrings = [spacy_tokenizer(my_str) for my_str in mystrings]
+            mystrings = self._tokenize_strings(mystrings)
         data = [(line, line) for line in mystrings]
-        batch_size = 4 if self.device == "cpu" else 16
-        return_strings = model_predictions(self.model, data, self.vocab, device=self.device, batch_size=batch_size)
+        return_strings = model_predictions(self.model, data, self.vocab, device=self.device,
+                                           bucket_by_length=self.bucket_by_length, **self._batching_kwargs())
         if return_all:
             return mystrings, return_strings
         else:
@@ -31,7 +36,6 @@ class CnnlstmChecker(Corrector):
         self.is_model_ready()
         data_dir = DEFAULT_TRAINTEST_DATA_PATH if data_dir == "default" else data_dir
 
-        batch_size = 4 if self.device == "cpu" else 16
         for x, y, z in zip([data_dir], [clean_file], [corrupt_file]):
             print(x, y, z)
             test_data = load_data(x, y, z)
@@ -39,6 +43,6 @@ class CnnlstmChecker(Corrector):
                                 test_data,
                                 topk=1,
                                 device=self.device,
-                                batch_size=batch_size,
-                                vocab_=self.vocab)
+                                vocab_=self.vocab,
+                                **self._batching_kwargs())
         return
@@ -5,8 +5,9 @@ from typing import List
 import numpy as np
 import torch
 
-from .commons import spacy_tokenizer, DEFAULT_TRAINTEST_DATA_PATH
+from .commons import DEFAULT_TRAINTEST_DATA_PATH
 from .corrector import Corrector
+from .metrics import timed
 from .seq_modeling.helpers import load_data, sclstm_tokenize, save_vocab_dict
 from .seq_modeling.helpers import train_validation_split, batch_iter, labelize, progressBar, batch_accuracy_func
 from .util import is_module_available, get_module_or_attr
@@ -33,13 +34,16 @@ class ElmosclstmChecker(Corrector):
         initialized_model = load_model(self.vocab)
         self.model = load_pretrained(initialized_model, self.ckpt_path, device=self.device)
 
+    @timed("correct_strings")
     def correct_strings(self, mystrings: List[str], return_all=False) -> List[str]:
         self.is_model_ready()
+        if self._use_workers():
+            return self._correct_strings_in_workers(mystrings, return_all=return_all)
         if self.tokenize:
-            mystrings = [spacy_tokenizer(my_str) for my_str in mystrings]
+            mystrings = self._tokenize_strings(mystrings)
         data = [(line, line) for line in mystrings]
-        batch_size = 4 if self.device == "cpu" else 16
-        return_strings = model_predictions(self.model, data, self.vocab, device=self.device, batch_size=batch_size)
+        return_strings = model_predictions(self.model, data, self.vocab, device=self.device,
+                                           bucket_by_length=self.bucket_by_length, **self._batching_kwargs())
         if return_all:
             return mystrings, return_strings
         else:
@@ -49,7 +53,6 @@ class ElmosclstmChecker(Corrector):
         self.is_model_ready()
         data_dir = DEFAULT_TRAINTEST_DATA_PATH if data_dir == "default" else data_dir
 
-        batch_size = 4 if self.device == "cpu" else 16
         for x, y, z in zip([data_dir], [clean_file], [corrupt_file]):
             print(x, y, z)
             test_data = load_data(x, y, z)
@@ -57,8 +60,8 @@ class ElmosclstmChecker(Corrector):
                                 test_data,
                                 topk=1,
                                 device=self.device,
-                                batch_size=batch_size,
-                                vocab_=self.vocab)
+                                vocab_=self.vocab,
+                                **self._batching_kwargs())
         return
 
     def finetune(self, clean_file, corrupt_file, data_dir="", validation_split=0.2, n_epochs=2,
@@ -75,6 +78,7 @@ class ElmosclstmChecker(Corrector):
 
         # load vocab and model
         self.is_model_ready()
+        self._unshare_model()
 
         # finetune
         #############################################
@@ -1,6 +1,7 @@
 from typing import List
 
 from .corrector import Corrector
+from .metrics import stage, timed
 from .seq_modeling.helpers import bert_tokenize_for_valid_examples
 from .seq_modeling.helpers import load_data
 from .seq_modeling.sclstmbert import load_model, load_pretrained, model_predictions, model_inference
@@ -15,12 +16,16 @@ class SclstmbertChecker(Corrector):
         initialized_model = load_model(self.vocab)
         self.model = load_pretrained(initialized_model, self.ckpt_path, device=self.device)
 
+    @timed("correct_strings")
     def correct_strings(self, mystrings: List[str], return_all=False) -> List[str]:
         self.is_model_ready()
-        mystrings = bert_tokenize_for_valid_examples(mystrings, mystrings)[0]
+        if self._use_workers():
+            return self._correct_strings_in_workers(mystrings, return_all=return_all)
+        with stage("bert_pretokenize"):
+            mystrings = bert_tokenize_for_valid_examples(mystrings, mystrings)[0]
         data = [(line, line) for line in mystrings]
-        batch_size = 4 if self.device == "cpu" else 16
-        return_strings = model_predictions(self.model, data, self.vocab, device=self.device, batch_size=batch_size)
+        return_strings = model_predictions(self.model, data, self.vocab, device=self.device,
+                                           bucket_by_length=self.bucket_by_length, **self._batching_kwargs())
         if return_all:
             return mystrings, return_strings
         else:
@@ -30,7 +35,6 @@ class SclstmbertChecker(Corrector):
         self.is_model_ready()
         data_dir = DEFAULT_TRAINTEST_DATA_PATH if data_dir == "default" else data_dir
 
-        batch_size = 4 if self.device == "cpu" else 16
         for x, y, z in zip([data_dir], [clean_file], [corrupt_file]):
             print(x, y, z)
             test_data = load_data(x, y, z)
@@ -38,6 +42,6 @@ class SclstmbertChecker(Corrector):
                                 test_data,
                                 topk=1,
                                 device=self.device,
-                                batch_size=batch_size,
-                                vocab_=self.vocab)
+                                vocab_=self.vocab,
+                                **self._batching_kwargs())
         return
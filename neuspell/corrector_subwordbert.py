@@ -8,6 +8,7 @@ from pytorch_pretrained_bert import BertAdam
 
 from .commons import DEFAULT_TRAINTEST_DATA_PATH
 from .corrector import Corrector
+from .metrics import stage, timed
 from .seq_modeling.helpers import bert_tokenize_for_valid_examples
 from .seq_modeling.helpers import load_data, load_vocab_dict, save_vocab_dict
 from .seq_modeling.helpers import train_validation_split, batch_iter, labelize, progressBar, batch_accuracy_func
@@ -18,6 +19,8 @@ from .seq_modeling.subwordbert import load_model, load_pretrained, model_predict
 
 class BertChecker(Corrector):
 
+    MODEL_TYPE = "subwordbert"
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
@@ -28,12 +31,16 @@ class BertChecker(Corrector):
         initialized_model = load_model(self.vocab)
         self.model = load_pretrained(initialized_model, self.ckpt_path, device=self.device)
 
+    @timed("correct_strings")
     def correct_strings(self, mystrings: List[str], return_all=False) -> List[str]:
         self.is_model_ready()
-        mystrings = bert_tokenize_for_valid_examples(mystrings, mystrings, self.bert_pretrained_name_or_path)[0]
+        if self._use_workers():
+            return self._correct_strings_in_workers(mystrings, return_all=return_all)
+        with stage("bert_pretokenize"):
+            mystrings = bert_tokenize_for_valid_examples(mystrings, mystrings, self.bert_pretrained_name_or_path)[0]
         data = [(line, line) for line in mystrings]
-        batch_size = 4 if self.device == "cpu" else 16
-        return_strings = model_predictions(self.model, data, self.vocab, device=self.device, batch_size=batch_size)
+        return_strings = model_predictions(self.model, data, self.vocab, device=self.device,
+                                           bucket_by_length=self.bucket_by_length, **self._batching_kwargs())
         if return_all:
             return mystrings, return_strings
         else:
@@ -43,7 +50,6 @@ class BertChecker(Corrector):
         self.is_model_ready()
         data_dir = DEFAULT_TRAINTEST_DATA_PATH if data_dir == "default" else data_dir
 
-        batch_size = 4 if self.device == "cpu" else 16
         for x, y, z in zip([data_dir], [clean_file], [corrupt_file]):
             print(x, y, z)
             test_data = load_data(x, y, z)
@@ -51,8 +57,8 @@ class BertChecker(Corrector):
                                 test_data,
                                 topk=1,
                                 device=self.device,
-                                batch_size=batch_size,
-                                vocab_=self.vocab)
+                                vocab_=self.vocab,
+                                **self._batching_kwargs())
         return
 
     def from_huggingface(self, bert_pretrained_name_or_path, vocab: Union[Dict, str]):
@@ -67,6 +73,7 @@ class BertChecker(Corrector):
             raise ValueError(f"unknown vocab type or unable to find path: {type(vocab)}")
         self.model = load_model(self.vocab, bert_pretrained_name_or_path=self.bert_pretrained_name_or_path)
         self.model.to(self.device)
+        self._shared_model_key = None
         return
 
     def finetune(self,
@@ -89,6 +96,7 @@ class BertChecker(Corrector):
 
         # load vocab and model
         self.is_model_ready()
+        self._unshare_model()
 
         # finetune
         #############################################
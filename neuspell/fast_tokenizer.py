@@ -0,0 +1,339 @@
+"""
+A pure-python port of the spaCy english tokenizer (prefix, suffix and infix rules, tokenizer exceptions and url
+matching), used as `tokenize="fast"` in `Corrector` to avoid loading `en_core_web_sm` just to split words.
+
+Differences to spaCy are limited to characters outside the latin, greek and cyrillic scripts (letters are cased
+only within these) and to units and currency symbols of other scripts.
+See `tests/test_fast_tokenizer.py` for the conformance check against the spaCy path.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, List
+
+""" character classes """
+
+_ALPHA_LOWER = r"a-zß-öø-ÿĀ-ſƀ-ɏά-ώа-џ"
+_ALPHA_UPPER = r"A-ZÀ-ÖØ-ÞĀ-ſƀ-ɏΆ-ΫЀ-Я"
+_ALPHA = r"a-zA-ZÀ-ÖØ-öø-ɏΆ-ώЀ-џ"
+
+_units = (
+    "km km² km³ m m² m³ dm dm² dm³ cm cm² cm³ mm mm² mm³ ha µm nm yd in ft "
+    "kg g mg µg t lb oz m/s km/h kmh mph hPa Pa mbar mb MB kb KB gb GB tb "
+    "TB T G M K %"
+)
+_currency = r"\$ £ € ¥ ฿ US\$ C\$ A\$ ₽ ﷼ ₴ ₹ ₩ ₪ ₫ ₱ ₺ ₿"
+_punct = r"… …… , : ; \! \? ¿ ؟ ¡ \( \) \[ \] \{ \} < > _ # \* & 。 ？ ！ ， 、 ； ： ～ · । ، ۔ ؛ ٪"
+_quotes = r'\' " ” “ ` ‘ ´ ’ ‚ , „ » « 「 」 『 』 （ ） 〔 〕 【 】 《 》 〈 〉 〈 〉  ⟦ ⟧'
+_hyphens = "- – — -- --- —— ~"
+# symbols like dingbats, but also emoji
+_icons = (
+    r"\u00A6\u00A9\u00AE\u00B0\u0482\u058D\u058E\u060E\u060F\u06DE\u06E9\u06FD\u06FE\u07F6\u09FA\u0B70"
+    r"\u0BF3-\u0BF8\u0BFA\u0C7F\u0D4F\u0D79\u0F01-\u0F03\u0F13\u0F15-\u0F17\u0F1A-\u0F1F\u0F34"
+    r"\u0F36\u0F38\u0FBE-\u0FC5\u0FC7-\u0FCC\u0FCE\u0FCF\u0FD5-\u0FD8\u109E\u109F\u1390-\u1399"
+    r"\u1940\u19DE-\u19FF\u1B61-\u1B6A\u1B74-\u1B7C\u2100\u2101\u2103-\u2106\u2108\u2109\u2114\u2116"
+    r"\u2117\u211E-\u2123\u2125\u2127\u2129\u212E\u213A\u213B\u214A\u214C\u214D\u214F\u218A\u218B"
+    r"\u2195-\u2199\u219C-\u219F\u21A1\u21A2\u21A4\u21A5\u21A7-\u21AD\u21AF-\u21CD\u21D0\u21D1\u21D3"
+    r"\u21D5-\u21F3\u2300-\u2307\u230C-\u231F\u2322-\u2328\u232B-\u237B\u237D-\u239A\u23B4-\u23DB"
+    r"\u23E2-\u2426\u2440-\u244A\u249C-\u24E9\u2500-\u25B6\u25B8-\u25C0\u25C2-\u25F7\u2600-\u266E"
+    r"\u2670-\u2767\u2794-\u27BF\u2800-\u28FF\u2B00-\u2B2F\u2B45\u2B46\u2B4D-\u2B73\u2B76-\u2B95"
+    r"\u2B98-\u2BC8\u2BCA-\u2BFE\u2CE5-\u2CEA\u2E80-\u2E99\u2E9B-\u2EF3\u2F00-\u2FD5\u2FF0-\u2FFB"
+    r"\u3004\u3012\u3013\u3020\u3036\u3037\u303E\u303F\u3190\u3191\u3196-\u319F\u31C0-\u31E3"
+    r"\u3200-\u321E\u322A-\u3247\u3250\u3260-\u327F\u328A-\u32B0\u32C0-\u32FE\u3300-\u33FF\u4DC0-\u4DFF"
+    r"\uA490-\uA4C6\uA828-\uA82B\uA836\uA837\uA839\uAA77-\uAA79\uFDFD\uFFE4\uFFE8\uFFED\uFFEE\uFFFC"
+    r"\uFFFD\U00010137-\U0001013F\U00010179-\U00010189\U0001018C-\U0001018E\U00010190-\U0001019B"
+    r"\U000101A0\U000101D0-\U000101FC\U00010877\U00010878\U00010AC8\U0001173F\U00016B3C-\U00016B3F"
+    r"\U00016B45\U0001BC9C\U0001D000-\U0001D0F5\U0001D100-\U0001D126\U0001D129-\U0001D164"
+    r"\U0001D16A-\U0001D16C\U0001D183\U0001D184\U0001D18C-\U0001D1A9\U0001D1AE-\U0001D1E8"
+    r"\U0001D200-\U0001D241\U0001D245\U0001D300-\U0001D356\U0001D800-\U0001D9FF\U0001DA37-\U0001DA3A"
+    r"\U0001DA6D-\U0001DA74\U0001DA76-\U0001DA83\U0001DA85\U0001DA86\U0001ECAC\U0001F000-\U0001F02B"
+    r"\U0001F030-\U0001F093\U0001F0A0-\U0001F0AE\U0001F0B1-\U0001F0BF\U0001F0C1-\U0001F0CF"
+    r"\U0001F0D1-\U0001F0F5\U0001F110-\U0001F16B\U0001F170-\U0001F1AC\U0001F1E6-\U0001F202"
+    r"\U0001F210-\U0001F23B\U0001F240-\U0001F248\U0001F250\U0001F251\U0001F260-\U0001F265"
+    r"\U0001F300-\U0001F3FA\U0001F400-\U0001F6D4\U0001F6E0-\U0001F6EC\U0001F6F0-\U0001F6F9"
+    r"\U0001F700-\U0001F773\U0001F780-\U0001F7D8\U0001F800-\U0001F80B\U0001F810-\U0001F847"
+    r"\U0001F850-\U0001F859\U0001F860-\U0001F887\U0001F890-\U0001F8AD\U0001F900-\U0001F90B"
+    r"\U0001F910-\U0001F93E\U0001F940-\U0001F970\U0001F973-\U0001F976\U0001F97A\U0001F97C-\U0001F9A2"
+    r"\U0001F9B0-\U0001F9B9\U0001F9C0-\U0001F9C2\U0001F9D0-\U0001F9FF\U0001FA60-\U0001FA6D"
+)
+
+_merge_chars = lambda chars: chars.strip().replace(" ", "|")
+_group_chars = lambda chars: chars.strip().replace(" ", "")
+_split_chars = lambda chars: [char.strip() for char in chars.strip().split(" ")]
+
+_UNITS, _CURRENCY, _PUNCT, _HYPHENS = map(_merge_chars, [_units, _currency, _punct, _hyphens])
+_CONCAT_QUOTES = _group_chars(_quotes)
+_LIST_PUNCT, _LIST_QUOTES, _LIST_CURRENCY = map(_split_chars, [_punct, _quotes, _currency])
+_LIST_ELLIPSES = [r"\.\.+", "…"]
+_LIST_ICONS = [r"[{i}]".format(i=_icons)]
+
+""" affix rules """
+
+_PREFIXES = ["§", "%", "=", "—", "–", r"\+(?![0-9])"] + _LIST_PUNCT + _LIST_ELLIPSES + _LIST_QUOTES + \
+            _LIST_CURRENCY + _LIST_ICONS
+
+_SUFFIXES = _LIST_PUNCT + _LIST_ELLIPSES + _LIST_QUOTES + _LIST_ICONS + ["'s", "'S", "’s", "’S", "—", "–"] + [
+    r"(?<=[0-9])\+",
+    r"(?<=°[FfCcKk])\.",
+    r"(?<=[0-9])(?:{c})".format(c=_CURRENCY),
+    r"(?<=[0-9])(?:{u})".format(u=_UNITS),
+    r"(?<=[0-9{al}{e}{p}(?:{q})])\.".format(al=_ALPHA_LOWER, e=r"%²\-\+", q=_CONCAT_QUOTES, p=_PUNCT),
+    r"(?<=[{au}][{au}])\.".format(au=_ALPHA_UPPER),
+]
+
+_INFIXES = _LIST_ELLIPSES + _LIST_ICONS + [
+    r"(?<=[0-9])[+\-\*^](?=[0-9-])",
+    r"(?<=[{al}{q}])\.(?=[{au}{q}])".format(al=_ALPHA_LOWER, au=_ALPHA_UPPER, q=_CONCAT_QUOTES),
+    r"(?<=[{a}]),(?=[{a}])".format(a=_ALPHA),
+    r"(?<=[{a}0-9])(?:{h})(?=[{a}])".format(a=_ALPHA, h=_HYPHENS),
+    r"(?<=[{a}0-9])[:<>=/](?=[{a}])".format(a=_ALPHA),
+]
+
+_prefix_search = re.compile("|".join(["^" + piece for piece in _PREFIXES if piece.strip()])).search
+_suffix_search = re.compile("|".join([piece + "$" for piece in _SUFFIXES if piece.strip()])).search
+_infix_finditer = re.compile("|".join([piece for piece in _INFIXES if piece.strip()])).finditer
+
+_url_match = re.compile(
+    r"(?u)^"
+    r"(?:(?:[\w\+\-\.]{2,})://)?"
+    r"(?:\S+(?::\S*)?@)?"
+    r"(?:"
+    r"(?!(?:10|127)(?:\.\d{1,3}){3})"
+    r"(?!(?:169\.254|192\.168)(?:\.\d{1,3}){2})"
+    r"(?!172\.(?:1[6-9]|2\d|3[0-1])(?:\.\d{1,3}){2})"
+    r"(?:[1-9]\d?|1\d\d|2[01]\d|22[0-3])"
+    r"(?:\.(?:1?\d{1,2}|2[0-4]\d|25[0-5])){2}"
+    r"(?:\.(?:[1-9]\d?|1\d\d|2[0-4]\d|25[0-4]))"
+    r"|"
+    r"(?:(?:[A-Za-z0-9¡-￿][A-Za-z0-9¡-￿_-]{0,62})?[A-Za-z0-9¡-￿]\.)+"
+    r"(?:[" + _ALPHA_LOWER + r"]{2,63})"
+    r")"
+    r"(?::\d{2,5})?"
+    r"(?:[/?#]\S*)?"
+    r"$"
+).match
+
+""" tokenizer exceptions """
+
+
+def _build_exceptions() -> Dict[str, List[str]]:
+    exc = {}
+
+    for orth in [" ", "\t", "\\t", "\n", "\\n", "—", "\u00a0", "'", '\\")', "<space>", "''", "C++", "ä.", "ö.",
+                 "ü."] + [f"{char}." for char in "abcdefghijklmnopqrstuvwxyz"]:
+        exc[orth] = [orth]
+    for orth in _EMOTICONS.split():
+        exc[orth] = [orth]
+    for unit in "cfkCFK":
+        exc[f"°{unit}."] = ["°", unit, "."]
+
+    # pronouns, w-words and verbs followed by contractions, with and without the apostrophe
+    def _add(word, *clitics):
+        for orth in [word, word.title()]:
+            exc[orth + "".join(clitics)] = [orth, *clitics]
+            exc[orth + "".join(clitics).replace("'", "")] = [orth, *[clitic.replace("'", "") for clitic in clitics]]
+
+    _add("i", "'m")
+    _add("i", "'m", "a")
+    for pron in ["i", "you", "he", "she", "it", "we", "they"]:
+        for clitics in [["'ll"], ["'ll", "'ve"], ["'d"], ["'d", "'ve"]]:
+            _add(pron, *clitics)
+    for pron in ["i", "you", "we", "they"]:
+        _add(pron, "'ve")
+    for pron in ["you", "we", "they"]:
+        _add(pron, "'re")
+    for pron in ["he", "she", "it"]:
+        _add(pron, "'s")
+    for word in ["who", "what", "when", "where", "why", "how", "there", "that", "this", "these", "those"]:
+        clitics_list = [["'ll"], ["'ll", "'ve"], ["'d"], ["'d", "'ve"]]
+        if word not in ["these", "those"]:
+            clitics_list += [["'s"]]
+        if word not in ["that", "this"]:
+            clitics_list += [["'re"], ["'ve"]]
+        for clitics in clitics_list:
+            _add(word, *clitics)
+    for verb in ["ca", "could", "do", "does", "did", "had", "may", "might", "must", "need", "ought", "sha", "should",
+                 "wo", "would"]:
+        _add(verb, "n't")
+        _add(verb, "n't", "'ve")
+    for verb in ["could", "might", "must", "should", "would"]:
+        _add(verb, "'ve")
+    for verb in ["ai", "are", "is", "was", "were", "have", "has", "dare"]:
+        _add(verb, "n't")
+
+    for word in ["doin", "goin", "nothin", "nuthin", "ol", "somethin"]:
+        for orth in [word, word.title()]:
+            exc[orth] = [orth]
+            exc[orth + "'"] = [orth + "'"]
+    for word in ["em", "ll", "nuff"]:
+        exc[word] = [word]
+        exc["'" + word] = ["'" + word]
+
+    for hour in range(1, 12 + 1):
+        for period in ["a.m.", "am", "p.m.", "pm"]:
+            exc[f"{hour}{period}"] = [f"{hour}", period]
+
+    exc.update({
+        "y'all": ["y'", "all"], "yall": ["y", "all"],
+        "how'd'y": ["how", "'d", "'y"], "How'd'y": ["How", "'d", "'y"],
+        "not've": ["not", "'ve"], "notve": ["not", "ve"], "Not've": ["Not", "'ve"], "Notve": ["Not", "ve"],
+        "cannot": ["can", "not"], "Cannot": ["Can", "not"],
+        "gonna": ["gon", "na"], "Gonna": ["Gon", "na"], "gotta": ["got", "ta"], "Gotta": ["Got", "ta"],
+        "let's": ["let", "'s"], "Let's": ["Let", "'s"], "c'mon": ["c'm", "on"], "C'mon": ["C'm", "on"],
+    })
+
+    for orth in _SINGLE_TOKEN_EXCEPTIONS.split():
+        exc[orth] = [orth]
+
+    for orth in ["Ill", "ill", "Its", "its", "Hell", "hell", "Shell", "shell", "Shed", "shed", "were", "Were", "Well",
+                 "well", "Whore", "whore"]:
+        exc.pop(orth, None)
+
+    # every exception with an apostrophe also applies with a right single quotation mark
+    for orth, tokens in list(exc.items()):
+        if "'" in orth:
+            exc[orth.replace("'", "’")] = [token.replace("'", "’") for token in tokens]
+    return exc
+
+
+_EMOTICONS = r"""
+:) :-) :)) :-)) :))) :-))) (: (-: =) (= :] :-] [: [-: [= =] :o) (o: :} :-} 8) 8-) (-8 ;) ;-) (; (-; :( :-( :((
+:-(( :((( :-((( ): )-: =( >:( :') :'-) :'( :'-( :/ :-/ =/ =| :| :-| ]= =[ :1 :P :-P :p :-p :O :-O :o :-o :0 :-0
+:() >:o :* :-* :3 :-3 =3 :> :-> :X :-X :x :-x :D :-D ;D ;-D =D xD XD xDD XDD 8D 8-D ^_^ ^__^ ^___^ >.< >.> <.<
+._. ;_; -_- -__- v.v V.V v_v V_V o_o o_O O_o O_O 0_o o_0 0_0 o.O O.o O.O o.o 0.0 o.0 0.o @_@ <3 <33 <333 </3
+(^_^) (-_-) (._.) (>_<) (*_*) (¬_¬) ಠ_ಠ ಠ︵ಠ (ಠ_ಠ) ¯\(ツ)/¯ (╯°□°）╯︵┻━┻ ><(((*>
+"""
+
+_SINGLE_TOKEN_EXCEPTIONS = """
+'S 's ‘S ‘s and/or w/o 're 'Cause 'cause 'cos 'Cos 'coz 'Coz 'cuz 'Cuz 'bout ma'am Ma'am o'clock O'clock lovin'
+Lovin' lovin Lovin havin' Havin' havin Havin doin' Doin' doin Doin goin' Goin' goin Goin Mt. Ak. Ala. Apr. Ariz.
+Ark. Aug. Calif. Colo. Conn. Dec. Del. Feb. Fla. Ga. Ia. Id. Ill. Ind. Jan. Jul. Jun. Kan. Kans. Ky. La. Mar. Mass.
+Mich. Minn. Miss. N.C. N.D. N.H. N.J. N.M. N.Y. Neb. Nebr. Nev. Nov. Oct. Okla. Ore. Pa. S.C. Sep. Sept. Tenn. Va.
+Wash. Wis. 'd a.m. Adm. Bros. co. Co. Corp. D.C. Dr. e.g. E.g. E.G. Gen. Gov. i.e. I.e. I.E. Inc. Jr. Ltd. Md.
+Messrs. Mo. Mont. Mr. Mrs. Ms. p.m. Ph.D. Prof. Rep. Rev. Sen. St. vs. v.s.
+"""
+
+_EXCEPTIONS = _build_exceptions()
+
+""" tokenization """
+
+
+def _split_infixes(string: str) -> List[str]:
+    tokens = []
+    start = 0
+    for match in _infix_finditer(string):
+        infix_start, infix_end = match.start(), match.end()
+        if infix_start == 0:
+            continue
+        if infix_start != start:
+            tokens.append(string[start:infix_start])
+        if infix_start != infix_end:
+            tokens.append(string[infix_start:infix_end])
+        start = infix_end
+    if string[start:]:
+        tokens.append(string[start:])
+    return tokens
+
+
+def _find_affix(search, string: str) -> int:
+    match = search(string)
+    return match.end() - match.start() if match else 0
+
+
+def _tokenize_affixes(string: str, with_special_cases: bool = True) -> List[str]:
+    if with_special_cases and string in _EXCEPTIONS:
+        return _EXCEPTIONS[string]
+
+    # strip prefixes and suffixes until what remains is an exception or no more affixes are found
+    prefixes, suffixes = [], []
+    last_size = 0
+    while string and len(string) != last_size:
+        if with_special_cases and string in _EXCEPTIONS:
+            break
+        last_size = len(string)
+        pre_len = _find_affix(_prefix_search, string)
+        if pre_len and with_special_cases and string[pre_len:] in _EXCEPTIONS:
+            prefixes.append(string[:pre_len])
+            string = string[pre_len:]
+            break
+        suf_len = _find_affix(_suffix_search, string[pre_len:])
+        if suf_len and with_special_cases and string[:-suf_len] in _EXCEPTIONS:
+            suffixes.append(string[-suf_len:])
+            string = string[:-suf_len]
+            break
+        if pre_len and suf_len and pre_len + suf_len <= len(string):
+            prefixes.append(string[:pre_len])
+            suffixes.append(string[-suf_len:])
+            string = string[pre_len:-suf_len]
+        elif pre_len:
+            prefixes.append(string[:pre_len])
+            string = string[pre_len:]
+        elif suf_len:
+            suffixes.append(string[-suf_len:])
+            string = string[:-suf_len]
+
+    tokens = prefixes
+    if with_special_cases and string in _EXCEPTIONS:
+        tokens += _EXCEPTIONS[string]
+    elif string and _url_match(string):
+        tokens.append(string)
+    elif string:
+        tokens += _split_infixes(string)
+    return tokens + suffixes[::-1]
+
+
+# exceptions that affixes would split, keyed by that split; spaCy re-merges such token sequences after tokenization
+_SPLIT_EXCEPTIONS = {
+    tuple(_tokenize_affixes(orth, with_special_cases=False)): orth for orth in sorted(_EXCEPTIONS)
+    if _find_affix(_prefix_search, orth) or _find_affix(_suffix_search, orth) or any(_infix_finditer(orth))
+    or " " in orth
+}
+_SPLIT_EXCEPTION_STARTS = set([tokens[0] for tokens in _SPLIT_EXCEPTIONS])
+_MAX_SPLIT_EXCEPTION_LEN = max([len(tokens) for tokens in _SPLIT_EXCEPTIONS])
+
+
+_tokenize_span = lru_cache(maxsize=100000)(_tokenize_affixes)
+
+
+def _merge_split_exceptions(tokens: List[str], space_after: List[bool]) -> List[str]:
+    # longest matches first, and of these the leftmost; matches overlapping a previous one are dropped, and so are
+    # the ones spanning whitespace, though these still block the matches they overlap
+    matches = [(start, end) for start in range(len(tokens)) if tokens[start] in _SPLIT_EXCEPTION_STARTS
+               for end in range(start + 1, min(start + _MAX_SPLIT_EXCEPTION_LEN, len(tokens)) + 1)
+               if tuple(tokens[start:end]) in _SPLIT_EXCEPTIONS]
+    if not matches:
+        return tokens
+    kept, seen = [], set()
+    for start, end in sorted(matches, key=lambda match: (match[0] - match[1], match[0])):
+        if start not in seen and end - 1 not in seen and not any(space_after[start:end - 1]):
+            kept.append((start, end))
+        seen.update(range(start, end))
+    for start, end in sorted(kept, reverse=True):
+        tokens = tokens[:start] + _EXCEPTIONS[_SPLIT_EXCEPTIONS[tuple(tokens[start:end])]] + tokens[end:]
+    return tokens
+
+
+def fast_tokenize(text: str) -> List[str]:
+    """
+    returns the token texts that `[token.text for token in spacy_nlp(text)]` gives with `en_core_web_sm`
+
+    as in spaCy, the text is split into runs of whitespace and non-whitespace characters, dropping the single
+    space that follows a token; each run is then tokenized separately
+    """
+    tokens, space_after = [], []
+    start, in_ws = 0, text[:1].isspace()
+    for i, char in enumerate(text):
+        if char.isspace() != in_ws:
+            if start < i:
+                span_tokens = _tokenize_span(text[start:i])
+                tokens += span_tokens
+                space_after += [False] * len(span_tokens)
+            if char == " " and tokens:
+                space_after[-1] = True
+            start = i + 1 if char == " " else i
+            in_ws = not in_ws
+    if start < len(text):
+        span_tokens = _tokenize_span(text[start:])
+        tokens += span_tokens
+        space_after += [False] * len(span_tokens)
+    return _merge_split_exceptions(tokens, space_after)
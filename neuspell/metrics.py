@@ -0,0 +1,221 @@
+import os
+import threading
+import time
+from functools import wraps
+from typing import Callable, Dict, List, Tuple
+
+""" stage-level latency metrics, off unless `enable_metrics()` is called or NEUSPELL_METRICS=1 is set """
+
+# the metrics live in the memory of the process that records them: a server with several worker processes (e.g.
+# gunicorn --workers 2) has one set per worker, and each scrape of an endpoint serving `render_prometheus()` only sees
+# the worker that answers it; scrape each worker separately, or forward observations with `add_hook`
+
+_ENABLED = os.environ.get("NEUSPELL_METRICS", "0") == "1"
+_HOOKS: List[Callable[[str, str, float], None]] = []
+
+TIME_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1., 2.5, 5., 10., 30.)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+RATIO_BUCKETS = (.05, .1, .2, .3, .4, .5, .6, .7, .8, .9, 1.)
+RATE_BUCKETS = (1e2, 3e2, 1e3, 3e3, 1e4, 3e4, 1e5, 3e5, 1e6)
+
+
+def enable_metrics():
+    global _ENABLED
+    _ENABLED = True
+
+
+def disable_metrics():
+    global _ENABLED
+    _ENABLED = False
+
+
+def metrics_enabled():
+    return _ENABLED
+
+
+def add_hook(hook: Callable[[str, str, float], None]):
+    """
+    `hook(metric_name, label, value)` is called for every observation while metrics are enabled, e.g. to forward
+    them to another monitoring system
+    """
+    _HOOKS.append(hook)
+
+
+def remove_hook(hook: Callable[[str, str, float], None]):
+    _HOOKS.remove(hook)
+
+
+class Histogram:
+    """
+    a prometheus-style histogram with cumulative buckets, with one series per value of its (single) label
+    """
+
+    def __init__(self, name: str, documentation: str, buckets: Tuple, label_name: str = None):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.label_name = label_name
+        self._series: Dict[str, List] = {}  # label -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, label: str = ""):
+        with self._lock:
+            if label not in self._series:
+                self._series[label] = [0] * (len(self.buckets) + 2)
+            series = self._series[label]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+        for hook in _HOOKS:
+            hook(self.name, label, value)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {label: {"count": series[-2], "sum": series[-1], "buckets": dict(zip(self.buckets, series))}
+                    for label, series in self._series.items()}
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series_items = sorted([(label, [*series]) for label, series in self._series.items()])
+        for label, series in series_items:
+            label_str = f'{self.label_name}="{label}",' if self.label_name else ""
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{label_str}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label_str}le="+Inf"}} {series[-2]}')
+            label_str = f"{{{label_str[:-1]}}}" if label_str else ""
+            lines.append(f"{self.name}_count{label_str} {series[-2]}")
+            lines.append(f"{self.name}_sum{label_str} {series[-1]}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("neuspell_stage_seconds", "time spent per stage of a correction", TIME_BUCKETS, "stage")
+BATCH_SIZE = Histogram("neuspell_batch_size", "sentences per batch of a forward pass", SIZE_BUCKETS)
+BATCH_PADDING_RATIO = Histogram("neuspell_batch_padding_ratio",
+                                "fraction of padded word positions per batch of a forward pass", RATIO_BUCKETS)
+BATCH_TOKENS_PER_SECOND = Histogram("neuspell_batch_tokens_per_second",
+                                    "words per second through a batch's tokenization, forward pass and untokenization",
+                                    RATE_BUCKETS)
+HISTOGRAMS = [STAGE_SECONDS, BATCH_SIZE, BATCH_PADDING_RATIO, BATCH_TOKENS_PER_SECOND]
+
+
+class _Stage:
+    __slots__ = ("name", "st_time")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.st_time = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        STAGE_SECONDS.observe(time.perf_counter() - self.st_time, self.name)
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name: str):
+    """
+    times the enclosed block as stage `name`
+
+    USAGE
+    -----
+    with stage("spacy_tokenize"):
+        ...
+    -----
+    """
+    return _Stage(name) if _ENABLED else _NULL_STAGE
+
+
+def timed(name: str):
+    """
+    decorator version of `stage`
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _ENABLED:
+                return func(*args, **kwargs)
+            with _Stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class _BatchTimer:
+    __slots__ = ("st_time", "lap_time")
+
+    def __init__(self):
+        self.st_time = self.lap_time = time.perf_counter()
+
+    def lap(self, name: str):
+        # time since the previous lap, or since the timer was created
+        now = time.perf_counter()
+        STAGE_SECONDS.observe(now - self.lap_time, name)
+        self.lap_time = now
+
+    def done(self, batch_lengths):
+        batch_lengths = [int(length) for length in batch_lengths]
+        if not batch_lengths:
+            return
+        ntokens, npadded_tokens = sum(batch_lengths), len(batch_lengths) * max(batch_lengths)
+        BATCH_SIZE.observe(len(batch_lengths))
+        BATCH_PADDING_RATIO.observe(1 - ntokens / max(npadded_tokens, 1))
+        BATCH_TOKENS_PER_SECOND.observe(ntokens / max(time.perf_counter() - self.st_time, 1e-9))
+
+
+class _NullBatchTimer:
+    __slots__ = ()
+
+    def lap(self, name: str):
+        pass
+
+    def done(self, batch_lengths):
+        pass
+
+
+_NULL_BATCH_TIMER = _NullBatchTimer()
+
+
+def batch_timer():
+    """
+    records the stages of one batch in `model_predictions`, one `lap(stage_name)` after each stage, and the
+    batch's size, padding ratio and throughput with `done(batch_lengths)`
+    """
+    return _BatchTimer() if _ENABLED else _NULL_BATCH_TIMER
+
+
+def reset_metrics():
+    for histogram in HISTOGRAMS:
+        histogram.reset()
+
+
+def render_prometheus() -> str:
+    """
+    all metrics of this process in the prometheus text exposition format
+    """
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,136 @@
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+import torch
+
+""" process-wide registry of loaded models and vocabs """
+
+
+def get_model_memory(model: torch.nn.Module) -> int:
+    """
+    bytes held by the parameters and buffers of `model`
+    """
+    tensors = [*model.parameters(), *model.buffers()]
+    return sum([tensor.numel() * tensor.element_size() for tensor in tensors])
+
+
+class _Vocab(dict):
+    # plain dicts cannot be weakly referenced, see `ModelRegistry._alive`
+    pass
+
+
+class ModelRegistry:
+    """
+    de-duplicates checkpoints and vocabs loaded in this process, so that correctors created for the same
+    checkpoint (on the same device) share one read-only copy of the weights and of the vocab;
+    when `max_memory_mb` is set, least-recently-used entries are dropped from the registry once the
+    loaded entries exceed it. Correctors hold shared models and vocabs through the registry (see `Corrector.model`),
+    so a dropped entry is freed as soon as no correction is using it, and is loaded again on its next use; an entry
+    still in use is handed out again rather than loaded a second time, and counts towards the budget until freed
+    """
+
+    def __init__(self, max_memory_mb: Optional[float] = None):
+        self.max_memory_mb = max_memory_mb
+        self._entries = OrderedDict()  # key -> object, in lru order
+        # key -> object, for every object not freed yet, including dropped ones still in use
+        self._alive = weakref.WeakValueDictionary()
+        self._sizes = {}  # key -> size in bytes
+        self._lock = threading.RLock()
+        # a key is loaded by one thread at a time, while lookups of the other keys go on
+        self._load_locks = {}
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get_vocab(self, vocab_path: str, loader: Callable[[str], dict]) -> dict:
+        # the pickle's size on disk is used as an estimate of the vocab's memory
+        vocab_path = os.path.abspath(vocab_path)
+        return self._get(("vocab", vocab_path), lambda: _Vocab(loader(vocab_path)),
+                         lambda vocab: os.path.getsize(vocab_path))
+
+    def get_model(self, key: Hashable, loader: Callable[[], torch.nn.Module]) -> torch.nn.Module:
+        return self._get(("model", key), loader, get_model_memory)
+
+    def _lookup(self, key):
+        # under `_lock`
+        obj = self._entries.get(key, None)
+        if obj is None:
+            obj = self._alive.get(key, None)
+            if obj is None:
+                return None
+            self._entries[key] = obj
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return obj
+
+    def _get(self, key, loader, get_size):
+        with self._lock:
+            obj = self._lookup(key)
+            if obj is not None:
+                return obj
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            with self._lock:
+                # loaded by another thread in the meantime
+                obj = self._lookup(key)
+                if obj is not None:
+                    return obj
+                self.stats["misses"] += 1
+            obj = loader()
+            size = get_size(obj)
+            with self._lock:
+                self._alive[key] = obj
+                self._sizes[key] = size
+                self._entries[key] = obj
+                self._evict(keep=key)
+            return obj
+
+    def _evict(self, keep=None):
+        if self.max_memory_mb is None:
+            return
+        while self.memory_mb() > self.max_memory_mb:
+            key = next((key for key in self._entries if key != keep), None)
+            if key is None:
+                break
+            # the registry holds the last reference to an entry that is not in use, which is freed here
+            self._entries.pop(key)
+            self.stats["evictions"] += 1
+            print(f"model registry: memory budget of {self.max_memory_mb} MB exceeded, dropped {key}")
+
+    def memory_mb(self) -> float:
+        """
+        memory of the models and vocabs loaded and not freed yet, including dropped ones that are still in use
+        """
+        with self._lock:
+            return sum([self._sizes[key] for key in list(self._alive.keys())]) / 1e6
+
+    def set_max_memory(self, max_memory_mb: Optional[float]):
+        with self._lock:
+            self.max_memory_mb = max_memory_mb
+            self._evict()
+
+    def release(self, key: Hashable):
+        """
+        drops a model key (as passed to `get_model`) or a vocab path from the registry
+        """
+        with self._lock:
+            for key_ in [("model", key), ("vocab", os.path.abspath(key) if isinstance(key, str) else key)]:
+                self._entries.pop(key_, None)
+                self._alive.pop(key_, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._alive.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        vocab_key = os.path.abspath(key) if isinstance(key, str) else key
+        return ("model", key) in self._entries or ("vocab", vocab_key) in self._entries
+
+
+_max_memory_mb = os.environ.get("NEUSPELL_MAX_MODEL_MEMORY_MB", None)
+MODEL_REGISTRY = ModelRegistry(max_memory_mb=float(_max_memory_mb) if _max_memory_mb else None)
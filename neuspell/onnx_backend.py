@@ -0,0 +1,196 @@
+import inspect
+import os
+from typing import Optional
+
+import torch
+from torch import nn
+from torch.nn.utils.rnn import pad_sequence
+
+from .seq_modeling.helpers import _subword_word_map
+from .seq_modeling.models import SCLSTMInference, CharCNNWordLSTMInference
+from .util import is_module_available
+
+if is_module_available("onnxruntime"):
+    import onnxruntime
+
+""" onnx export of the checkers' models, and an onnxruntime (cpu) backend to run them """
+
+
+#################################################
+# tensor-only inference graphs for export
+#################################################
+
+# the lstm checkers' models are exported through their scriptable inference modules, see `get_inference_module`
+
+
+class SubwordBertForExport(nn.Module):
+    """
+    `SubwordBert` inference on the tensors of `bert_tokenize`'s dict; sub-tokens are averaged into words with a
+    one-hot matmul, which computes the same as `merge_subword_encodings` with a graph that does not depend on the
+    number of words
+    """
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask, token_type_ids, subword_word_map):
+        bert_encodings = self.model.bert_model(input_ids=input_ids, attention_mask=attention_mask,
+                                               token_type_ids=token_type_ids)[0]
+        word_idxs = torch.arange(subword_word_map.max() + 1, device=subword_word_map.device)
+        # [BS,max_nsubwords,max_nwords]
+        onehot = (subword_word_map.unsqueeze(2) == word_idxs.view(1, 1, -1)).to(bert_encodings.dtype)
+        word_encodings = torch.bmm(onehot.transpose(1, 2), bert_encodings)
+        word_encodings = word_encodings / onehot.sum(dim=1).clamp(min=1).unsqueeze(2)
+        return torch.argmax(self.model.dense(word_encodings), dim=-1)
+
+
+EXPORT_WRAPPERS = {
+    "sclstm": SCLSTMInference,
+    "cnnlstm": CharCNNWordLSTMInference,
+    "subwordbert": SubwordBertForExport,
+}
+
+
+def _dummy_inputs(model, model_type):
+    # distinct sizes along each axis, so that no dynamic axis is mistaken for another while tracing
+    batch_lengths = torch.tensor([3, 2]).long()
+    if model_type == "sclstm":
+        args = (torch.rand(2, 3, model.lstmmodule.input_size), batch_lengths)
+        dynamic_axes = {"batch_screps": {0: "batch", 1: "nwords"}}
+    elif model_type == "cnnlstm":
+        embeddings = model.cnnmodule.embeddings
+        batch_idxs = torch.randint(0, embeddings.num_embeddings, (2, 3, 5))
+        batch_idxs[1, 2, :] = embeddings.padding_idx
+        args = (batch_idxs, batch_lengths)
+        dynamic_axes = {"batch_idxs": {0: "batch", 1: "nwords", 2: "nchars"}}
+    elif model_type == "subwordbert":
+        input_ids = torch.randint(0, model.bert_model.config.vocab_size, (2, 6))
+        subword_word_map = torch.tensor([[-1, 0, 0, 1, 2, -1], [-1, 0, 1, -1, -1, -1]]).long()
+        args = (input_ids, torch.ones_like(input_ids), torch.zeros_like(input_ids), subword_word_map)
+        dynamic_axes = {name: {0: "batch", 1: "nsubwords"}
+                        for name in ["input_ids", "attention_mask", "token_type_ids", "subword_word_map"]}
+        return args, [*dynamic_axes], dynamic_axes
+    else:
+        raise ValueError(f"unknown model type `{model_type}`, choose one of {[*EXPORT_WRAPPERS]}")
+    input_names = [*dynamic_axes, "batch_lengths"]
+    dynamic_axes["batch_lengths"] = {0: "batch"}
+    return args, input_names, dynamic_axes
+
+
+def export_onnx(model: nn.Module, model_type: str, onnx_path: str, opset_version: int = 14):
+    """
+    exports the inference path (topk=1) of a `SCLSTM`, `CharCNNWordLSTMModel` or `SubwordBert` to `onnx_path`, with
+    dynamic batch and sequence axes; the graph returns the [BS,max_nwords] predicted word idxs
+
+    :param model_type: one of "sclstm", "cnnlstm" or "subwordbert"
+    """
+    if not is_module_available("onnx"):
+        raise ImportError("install `onnx` and `onnxruntime` by running `pip install neuspell[onnx]`")
+    model.eval()
+    model.to("cpu")
+    args, input_names, dynamic_axes = _dummy_inputs(model, model_type)
+    wrapper = EXPORT_WRAPPERS[model_type](model).eval()
+    # packed sequences are only supported by the torchscript-based exporter, which is not the default in newer torch
+    kwargs = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    os.makedirs(os.path.dirname(os.path.abspath(onnx_path)), exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(wrapper, args, onnx_path,
+                          input_names=input_names,
+                          output_names=["predictions"],
+                          dynamic_axes={**dynamic_axes, "predictions": {0: "batch", 1: "nwords"}},
+                          opset_version=opset_version,
+                          do_constant_folding=True,
+                          **kwargs)
+    print(f"onnx model saved at: {onnx_path}")
+    return onnx_path
+
+
+#################################################
+# onnxruntime backend
+#################################################
+
+class OrtModel:
+    """
+    runs a model exported with `export_onnx` under onnxruntime on cpu; it is called like the torch model is in the
+    checkers' `model_predictions`, i.e. `_, batch_predictions = model(batch_inputs, batch_lengths, topk=1)`, so that
+    the pre- and post-processing around it is unchanged
+
+    :param num_threads: onnxruntime's intra-op threads, its default (all physical cores) if not given
+    """
+
+    def __init__(self, onnx_path: str, model_type: str, num_threads: Optional[int] = None):
+        if not is_module_available("onnxruntime"):
+            raise ImportError("install `onnxruntime` by running `pip install neuspell[onnx]`")
+        if model_type not in EXPORT_WRAPPERS:
+            raise ValueError(f"unknown model type `{model_type}`, choose one of {[*EXPORT_WRAPPERS]}")
+        self.onnx_path = onnx_path
+        self.model_type = model_type
+        self.num_threads = num_threads
+        self._session = self._create_session()
+
+    def _create_session(self):
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        if self.num_threads:
+            options.intra_op_num_threads = self.num_threads
+            options.inter_op_num_threads = 1
+        return onnxruntime.InferenceSession(self.onnx_path, options, providers=["CPUExecutionProvider"])
+
+    def __call__(self, batch_inputs, batch_lengths_or_splits, aux_word_embs=None, targets=None, topk=1,
+                 shortlist=None):
+        if aux_word_embs is not None or targets is not None or shortlist is not None or topk != 1:
+            raise NotImplementedError("the onnx backend only computes top-1 predictions, use the torch backend")
+        feeds = getattr(self, f"_{self.model_type}_feeds")(batch_inputs, batch_lengths_or_splits)
+        batch_predictions = self._session.run(["predictions"], {k: v.cpu().numpy() for k, v in feeds.items()})[0]
+        return None, batch_predictions
+
+    @staticmethod
+    def _sclstm_feeds(batch_screps, batch_lengths):
+        return {"batch_screps": pad_sequence(batch_screps, batch_first=True, padding_value=0).float(),
+                "batch_lengths": batch_lengths.long()}
+
+    @staticmethod
+    def _cnnlstm_feeds(batch_idxs, batch_lengths):
+        if not torch.is_tensor(batch_idxs):
+            raise ValueError("expected a [BS,max_nwords,max_nchars] tensor, see `char_tokenize(..., batched=True)`")
+        return {"batch_idxs": batch_idxs.long(), "batch_lengths": batch_lengths.long()}
+
+    @staticmethod
+    def _subwordbert_feeds(batch_bert_dict, batch_splits):
+        feeds = {k: batch_bert_dict[k].long() for k in ["input_ids", "attention_mask", "token_type_ids"]}
+        if "subword_word_map" in batch_bert_dict:
+            feeds["subword_word_map"] = batch_bert_dict["subword_word_map"].long()
+        else:
+            feeds["subword_word_map"] = _subword_word_map(batch_splits, feeds["input_ids"].size(1))
+        return feeds
+
+    # the parts of the torch.nn.Module api used by the checkers
+
+    def eval(self):
+        return self
+
+    def to(self, device):
+        if str(device) != "cpu":
+            raise ValueError(f"the onnx backend runs on cpu only, got device `{device}`")
+        return self
+
+    def share_memory(self):
+        return self
+
+    def parameters(self):
+        return iter([])
+
+    def buffers(self):
+        return iter([])
+
+    def __getstate__(self):
+        # sessions cannot be pickled, e.g. for worker processes; each copy creates its own
+        state = self.__dict__.copy()
+        state["_session"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._session = self._create_session()
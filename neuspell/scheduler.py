@@ -0,0 +1,186 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List
+
+from .corrector import Corrector
+
+""" micro-batching of concurrent requests """
+
+
+class MicroBatchScheduler:
+    """
+    queues concurrent single-string requests to a `Corrector` and corrects them together in one `correct_strings`
+    call; a batch is run as soon as `max_batch_size` requests are queued, or `max_wait_ms` after its first request
+    was queued, whichever happens first; with `max_queue_size`, `submit` raises `queue.Full` rather than queueing
+    more than that many requests, so that callers can push back; empty and whitespace-only strings are returned as
+    they are, without being queued, and if a batch fails, its requests are retried one by one so that a bad request
+    fails alone
+
+    USAGE
+    -----
+    scheduler = MicroBatchScheduler(checker, max_batch_size=32, max_wait_ms=5)
+    # from any number of threads
+    corrected = scheduler.correct_string("I luk foward to receving your reply")
+    # or, without blocking
+    future = scheduler.submit("I luk foward to receving your reply")
+    corrected = future.result()
+    -----
+    """
+
+    def __init__(self, corrector: Corrector, max_batch_size: int = 32, max_wait_ms: float = 5, max_queue_size: int = 0):
+        self.corrector = corrector
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_queue_size = max_queue_size
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._closed, self._stopped = False, False
+        # so that no request is queued after the sentinel of `close`
+        self._close_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {"nrequests": 0, "nbatches": 0, "total_queueing_delay_ms": 0.0, "max_queueing_delay_ms": 0.0}
+        self._thread = threading.Thread(target=self._run, name="neuspell-micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, mystring: str) -> Future:
+        """
+        queues `mystring` and returns a future that resolves to a tuple of (tokenized string, corrected string)
+        """
+        future = Future()
+        with self._close_lock:
+            if self._closed:
+                raise RuntimeError("scheduler is closed")
+            if not mystring.strip():
+                # the models cannot take empty inputs, see `cli._correct_lines`
+                future.set_result((mystring, mystring))
+                return future
+            self._queue.put_nowait((mystring, future, time.perf_counter()))
+        return future
+
+    def correct_string(self, mystring: str, return_all=False, timeout=None) -> str:
+        tokenized_string, corrected_string = self.submit(mystring).result(timeout=timeout)
+        if return_all:
+            return tokenized_string, corrected_string
+        else:
+            return corrected_string
+
+    def submit_many(self, mystrings: List[str]) -> List[Future]:
+        """
+        queues all of `mystrings` or, if the queue fills up midway, none of them
+        """
+        futures = []
+        try:
+            for my_str in mystrings:
+                futures.append(self.submit(my_str))
+        except queue.Full:
+            for future in futures:
+                future.cancel()
+            raise
+        return futures
+
+    def correct_strings(self, mystrings: List[str], return_all=False, timeout=None) -> List[str]:
+        results = [future.result(timeout=timeout) for future in self.submit_many(mystrings)]
+        if return_all:
+            return [result[0] for result in results], [result[1] for result in results]
+        else:
+            return [result[1] for result in results]
+
+    def _next_batch(self):
+        item = self._queue.get()
+        if item is None:
+            return None
+        batch = [item]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # finish this batch, then stop
+                self._stopped = True
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while not self._stopped:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            # requests that were cancelled while queued are dropped
+            batch = [(my_str, future, t) for my_str, future, t in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            st_time = time.perf_counter()
+            self._update_metrics([(st_time - t) * 1000 for _, _, t in batch])
+            mystrings = [my_str for my_str, _, _ in batch]
+            results = self._correct(mystrings)
+            if isinstance(results, BaseException):
+                # the batch mixes requests of different callers, one bad request must not fail the others
+                results = [self._correct([my_str]) for my_str in mystrings] if len(batch) > 1 else [results]
+                results = [result if isinstance(result, BaseException) else result[0] for result in results]
+            for (_, future, _), result in zip(batch, results):
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _correct(self, mystrings):
+        # a list of (tokenized string, corrected string) per string or, if the correction fails, the exception
+        try:
+            tokenized_strings, corrected_strings = self.corrector.correct_strings(mystrings, return_all=True)
+            assert len(corrected_strings) == len(mystrings)
+        except BaseException as e:
+            return e
+        return list(zip(tokenized_strings, corrected_strings))
+
+    def _update_metrics(self, queueing_delays_ms):
+        with self._metrics_lock:
+            self._metrics["nrequests"] += len(queueing_delays_ms)
+            self._metrics["nbatches"] += 1
+            self._metrics["total_queueing_delay_ms"] += sum(queueing_delays_ms)
+            self._metrics["max_queueing_delay_ms"] = max(self._metrics["max_queueing_delay_ms"], *queueing_delays_ms)
+
+    def metrics(self, reset=False):
+        """
+        batch fill rate is the average batch size relative to `max_batch_size`, and queueing delay is the time
+        from `submit` to the start of the request's batch
+        """
+        with self._metrics_lock:
+            metrics = {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "max_queue_size": self.max_queue_size,
+                "queued": self._queue.qsize(),
+            }
+            metrics.update(self._metrics)
+            if self._metrics["nbatches"] > 0:
+                metrics.update({
+                    "avg_batch_size": metrics["nrequests"] / metrics["nbatches"],
+                    "batch_fill_rate": metrics["nrequests"] / metrics["nbatches"] / self.max_batch_size,
+                    "avg_queueing_delay_ms": metrics["total_queueing_delay_ms"] / metrics["nrequests"],
+                })
+            if reset:
+                self._metrics.update(
+                    {"nrequests": 0, "nbatches": 0, "total_queueing_delay_ms": 0.0, "max_queueing_delay_ms": 0.0})
+        return metrics
+
+    def close(self, wait=True):
+        """
+        stops accepting requests; requests queued so far are still corrected
+        """
+        with self._close_lock:
+            if not self._closed:
+                self._closed = True
+                self._queue.put(None)
+        if wait:
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
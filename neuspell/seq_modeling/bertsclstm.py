@@ -3,6 +3,7 @@ import time
 from .downloads import download_pretrained_model
 from .evals import get_metrics
 from .helpers import *
+from ..metrics import batch_timer
 from .models import BertSCLSTM
 
 
@@ -58,11 +59,18 @@ def load_pretrained_large(model, checkpoint_path, optimizer=None, device='cuda')
     return model
 
 
-def model_predictions(model, data, vocab, device, batch_size=16):
+def model_predictions(model, data, vocab, device, batch_size=16, bucket_by_length=False, max_tokens=None,
+                      max_padded_tokens=None, stats=None):
     """
     model: an instance of BertSCLSTM
     data: list of tuples, with each tuple consisting of correct and incorrect 
             sentence string (would be split at whitespaces)
+    bucket_by_length: if True, sentences of similar lengths are batched together to reduce padding;
+            predictions are still returned in the order of data, so every line must pass the
+            bert pre-processing check (as is the case for inputs from `BertsclstmChecker.correct_strings`)
+    max_tokens, max_padded_tokens: optional budgets of bert sub-tokens per batch, see `budget_batch_iter` and
+            `bert_subword_length_key`
+    stats: optional dict in which batching statistics are accumulated
     """
 
     topk = 1
@@ -71,10 +79,18 @@ def model_predictions(model, data, vocab, device, batch_size=16):
     final_sentences = []
     VALID_batch_size = batch_size
     # print("data size: {}".format(len(data)))
-    data_iter = batch_iter(data, batch_size=VALID_batch_size, shuffle=False)
+    # the budgets bound the bert inputs, which have more sub-tokens than the sentences have words
+    key = bert_subword_length_key(data) if (max_tokens or max_padded_tokens) else None
+    if bucket_by_length:
+        # number of characters is a cheap proxy for the number of bert subwords
+        order = get_bucketed_order(data, key=key or (lambda item: len(item[1])))
+        data = [data[idx] for idx in order]
+    data_iter = budget_batch_iter(data, VALID_batch_size, max_tokens=max_tokens,
+                                  max_padded_tokens=max_padded_tokens, key=key, stats=stats)
     model.eval()
     model.to(device)
     for batch_id, (batch_labels, batch_sentences) in enumerate(data_iter):
+        timer = batch_timer()
         # set batch data for bert
         batch_labels_, batch_sentences_, batch_bert_inp, batch_bert_splits = bert_tokenize_for_valid_examples(
             batch_labels, batch_sentences)
@@ -87,33 +103,40 @@ def model_predictions(model, data, vocab, device, batch_size=16):
         else:
             batch_labels, batch_sentences = batch_labels_, batch_sentences_
         batch_bert_inp = {k: v.to(device) for k, v in batch_bert_inp.items()}
+        timer.lap("bert_tokenize")
         # set batch data for others
-        batch_labels_ids, batch_lengths = labelize(batch_labels, vocab)
-        batch_idxs, batch_lengths_ = sclstm_tokenize(batch_sentences, vocab)
-        assert (batch_lengths_ == batch_lengths).all() == True
+        batch_idxs, batch_lengths = sclstm_tokenize(batch_sentences, vocab)
         assert len(batch_bert_splits) == len(batch_idxs)
         batch_idxs = [batch_idxs_.to(device) for batch_idxs_ in batch_idxs]
+        timer.lap("sc_tokenize")
         # batch_lengths = batch_lengths.to(device)
-        batch_labels_ids = batch_labels_ids.to(device)
         # forward
         with torch.no_grad():
             """
             NEW: batch_predictions can now be of shape (batch_size,batch_max_seq_len,topk) if topk>1, else (batch_size,batch_max_seq_len)
             """
-            _, batch_predictions = model(batch_idxs, batch_lengths, batch_bert_inp, batch_bert_splits,
-                                         targets=batch_labels_ids, topk=topk)
+            _, batch_predictions = model(batch_idxs, batch_lengths, batch_bert_inp, batch_bert_splits, topk=topk)
+        timer.lap("forward")
         batch_predictions = untokenize_without_unks(batch_predictions, batch_lengths, vocab, batch_labels)
+        timer.lap("untokenize")
+        timer.done(batch_lengths)
         final_sentences.extend(batch_predictions)
+    if bucket_by_length:
+        final_sentences = restore_order(final_sentences, order)
     # print("total inference time for this data is: {:4f} secs".format(time.time()-inference_st_time))
     return final_sentences
 
 
-def model_inference(model, data, topk, device, batch_size=16, vocab_=None):
+def model_inference(model, data, topk, device, batch_size=16, vocab_=None, max_tokens=None, max_padded_tokens=None,
+                    stats=None):
     """
     model: an instance of BertSCLSTM
     data: list of tuples, with each tuple consisting of correct and incorrect 
             sentence string (would be split at whitespaces)
     topk: how many of the topk softmax predictions are considered for metrics calculations
+    max_tokens, max_padded_tokens: optional budgets of bert sub-tokens per batch, see `budget_batch_iter` and
+            `bert_subword_length_key`
+    stats: optional dict in which batching statistics are accumulated
     """
     if vocab_ is not None:
         vocab = vocab_
@@ -125,7 +148,9 @@ def model_inference(model, data, topk, device, batch_size=16, vocab_=None):
     valid_loss = 0.
     valid_acc = 0.
     print("data size: {}".format(len(data)))
-    data_iter = batch_iter(data, batch_size=VALID_batch_size, shuffle=False)
+    key = bert_subword_length_key(data) if (max_tokens or max_padded_tokens) else None
+    data_iter = budget_batch_iter(data, VALID_batch_size, max_tokens=max_tokens,
+                                  max_padded_tokens=max_padded_tokens, key=key, stats=stats)
     model.eval()
     model.to(device)
     for batch_id, (batch_labels, batch_sentences) in tqdm(enumerate(data_iter)):
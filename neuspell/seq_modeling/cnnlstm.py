@@ -3,6 +3,7 @@ import time
 from .downloads import download_pretrained_model
 from .evals import get_metrics
 from .helpers import *
+from ..metrics import batch_timer
 from .models import CharCNNWordLSTMModel
 
 
@@ -62,11 +63,16 @@ def load_pretrained_large(model, checkpoint_path, optimizer=None, device='cuda')
     return model
 
 
-def model_predictions(model, data, vocab, device, batch_size=16):
+def model_predictions(model, data, vocab, device, batch_size=16, bucket_by_length=False, max_tokens=None,
+                      max_padded_tokens=None, stats=None):
     """
     model: an instance of CharCNNWordLSTMModel
     data: list of tuples, with each tuple consisting of correct and incorrect 
             sentence string (would be split at whitespaces)
+    bucket_by_length: if True, sentences of similar lengths are batched together to reduce padding;
+            predictions are still returned in the order of data
+    max_tokens, max_padded_tokens: optional token budgets per batch, see `budget_batch_iter`
+    stats: optional dict in which batching statistics are accumulated
     """
 
     topk = 1
@@ -75,33 +81,44 @@ def model_predictions(model, data, vocab, device, batch_size=16):
     final_sentences = []
     VALID_batch_size = batch_size
     print("data size: {}".format(len(data)))
-    data_iter = batch_iter(data, batch_size=VALID_batch_size, shuffle=False)
+    if bucket_by_length:
+        order = get_bucketed_order(data)
+        data = [data[idx] for idx in order]
+    data_iter = budget_batch_iter(data, VALID_batch_size, max_tokens=max_tokens,
+                                  max_padded_tokens=max_padded_tokens, stats=stats)
     model.eval()
     model.to(device)
     for batch_id, (batch_clean_sentences, batch_corrupt_sentences) in tqdm(enumerate(data_iter)):
+        timer = batch_timer()
         # set batch data
-        batch_labels, batch_lengths = labelize(batch_clean_sentences, vocab)
-        batch_idxs, batch_lengths_ = char_tokenize(batch_corrupt_sentences, vocab)
-        assert (batch_lengths_ == batch_lengths).all() == True
-        batch_idxs = [batch_idxs_.to(device) for batch_idxs_ in batch_idxs]
+        batch_idxs, batch_lengths = char_tokenize(batch_corrupt_sentences, vocab, batched=True)
+        batch_idxs = batch_idxs.to(device)
+        timer.lap("char_tokenize")
         # batch_lengths = batch_lengths.to(device)
-        batch_labels = batch_labels.to(device)
         # forward
         with torch.no_grad():
             # because topk=1, batch_predictions are of shape (batch_size,batch_max_seq_len)
-            _, batch_predictions = model(batch_idxs, batch_lengths, targets=batch_labels, topk=topk)
+            _, batch_predictions = model(batch_idxs, batch_lengths, topk=topk)
+        timer.lap("forward")
         batch_predictions = untokenize_without_unks(batch_predictions, batch_lengths, vocab, batch_clean_sentences)
+        timer.lap("untokenize")
+        timer.done(batch_lengths)
         final_sentences.extend(batch_predictions)
+    if bucket_by_length:
+        final_sentences = restore_order(final_sentences, order)
     print("total inference time for this data is: {:4f} secs".format(time.time() - inference_st_time))
     return final_sentences
 
 
-def model_inference(model, data, topk, device, batch_size=16, vocab_=None):
+def model_inference(model, data, topk, device, batch_size=16, vocab_=None, max_tokens=None, max_padded_tokens=None,
+                    stats=None):
     """
     model: an instance of CharCNNWordLSTMModel
     data: list of tuples, with each tuple consisting of correct and incorrect 
             sentence string (would be split at whitespaces)
     topk: how many of the topk softmax predictions are considered for metrics calculations
+    max_tokens, max_padded_tokens: optional token budgets per batch, see `budget_batch_iter`
+    stats: optional dict in which batching statistics are accumulated
     """
     if vocab_ is not None:
         vocab = vocab_
@@ -113,16 +130,17 @@ def model_inference(model, data, topk, device, batch_size=16, vocab_=None):
     valid_loss = 0.
     valid_acc = 0.
     print("data size: {}".format(len(data)))
-    data_iter = batch_iter(data, batch_size=VALID_batch_size, shuffle=False)
+    data_iter = budget_batch_iter(data, VALID_batch_size, max_tokens=max_tokens,
+                                  max_padded_tokens=max_padded_tokens, stats=stats)
     model.eval()
     model.to(device)
     for batch_id, (batch_clean_sentences, batch_corrupt_sentences) in tqdm(enumerate(data_iter)):
         st_time = time.time()
         # set batch data
         batch_labels, batch_lengths = labelize(batch_clean_sentences, vocab)
-        batch_idxs, batch_lengths_ = char_tokenize(batch_corrupt_sentences, vocab)
+        batch_idxs, batch_lengths_ = char_tokenize(batch_corrupt_sentences, vocab, batched=True)
         assert (batch_lengths_ == batch_lengths).all() == True
-        batch_idxs = [batch_idxs_.to(device) for batch_idxs_ in batch_idxs]
+        batch_idxs = batch_idxs.to(device)
         # batch_lengths = batch_lengths.to(device)
         batch_labels = batch_labels.to(device)
         # forward
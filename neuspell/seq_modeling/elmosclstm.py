@@ -4,6 +4,8 @@ from .downloads import download_pretrained_model
 from .evals import get_metrics
 from .helpers import *
 from .models import ElmoSCLSTM
+from ..commons import get_resource, register_resource
+from ..metrics import batch_timer
 from .util import get_module_or_attr
 
 """ NEW: reranking snippets """
@@ -13,28 +15,39 @@ from torch.nn import CrossEntropyLoss
 
 HFACE_batch_size = 8
 RERANKER = "GPT-2"  # GPT/GPT-2/CTRL/Transformer-XL/XLNet
-if RERANKER == "GPT":
-    from transformers import OpenAIGPTTokenizer, OpenAIGPTLMHeadModel
-
-    gpt2Tokenizer = OpenAIGPTTokenizer.from_pretrained('openai-gpt')
-    gpt2LMHeadModel = OpenAIGPTLMHeadModel.from_pretrained('openai-gpt')
-    gpt2Tokenizer.add_special_tokens({'pad_token': "[PAD]"})
-    gpt2LMHeadModel.resize_token_embeddings(len(gpt2Tokenizer))
-    assert gpt2Tokenizer.pad_token == '[PAD]'
-elif "GPT-2":
-    from transformers import GPT2Tokenizer, GPT2LMHeadModel
-
-    gpt2Tokenizer = GPT2Tokenizer.from_pretrained('gpt2-medium')
-    gpt2LMHeadModel = GPT2LMHeadModel.from_pretrained('gpt2-medium')
-    gpt2Tokenizer.pad_token = gpt2Tokenizer.eos_token
-elif "Transformer-XL":
-    from transformers import TransfoXLTokenizer, TransfoXLLMHeadModel
-
-    txlTokenizer = TransfoXLTokenizer.from_pretrained('transfo-xl-wt103')
-    txlLMHeadModel = TransfoXLLMHeadModel.from_pretrained('transfo-xl-wt103')
-    txlTokenizer.pad_token = txlTokenizer.eos_token
-else:
-    raise NotImplementedError
+
+
+def _load_reranker():
+    """
+    returns the (tokenizer, lm head model) pair used for reranking; built once on first use via `get_resource`,
+    so that importing this module does not download or load any weights
+    """
+    if RERANKER == "GPT":
+        from transformers import OpenAIGPTTokenizer, OpenAIGPTLMHeadModel
+
+        gpt2Tokenizer = OpenAIGPTTokenizer.from_pretrained('openai-gpt')
+        gpt2LMHeadModel = OpenAIGPTLMHeadModel.from_pretrained('openai-gpt')
+        gpt2Tokenizer.add_special_tokens({'pad_token': "[PAD]"})
+        gpt2LMHeadModel.resize_token_embeddings(len(gpt2Tokenizer))
+        assert gpt2Tokenizer.pad_token == '[PAD]'
+    elif "GPT-2":
+        from transformers import GPT2Tokenizer, GPT2LMHeadModel
+
+        gpt2Tokenizer = GPT2Tokenizer.from_pretrained('gpt2-medium')
+        gpt2LMHeadModel = GPT2LMHeadModel.from_pretrained('gpt2-medium')
+        gpt2Tokenizer.pad_token = gpt2Tokenizer.eos_token
+    elif "Transformer-XL":
+        from transformers import TransfoXLTokenizer, TransfoXLLMHeadModel
+
+        gpt2Tokenizer = TransfoXLTokenizer.from_pretrained('transfo-xl-wt103')
+        gpt2LMHeadModel = TransfoXLLMHeadModel.from_pretrained('transfo-xl-wt103')
+        gpt2Tokenizer.pad_token = gpt2Tokenizer.eos_token
+    else:
+        raise NotImplementedError
+    return gpt2Tokenizer, gpt2LMHeadModel
+
+
+register_resource("elmosclstm_reranker", _load_reranker)
 
 
 def get_losses_from_gpt_lm(this_sents: "list[str]", gpt2LMHeadModel, gpt2Tokenizer, device):
@@ -127,11 +140,16 @@ def load_pretrained_large(model, checkpoint_path, optimizer=None, device='cuda')
     return model
 
 
-def model_predictions(model, data, vocab, device, batch_size=16, backoff="pass-through"):
+def model_predictions(model, data, vocab, device, batch_size=16, backoff="pass-through", bucket_by_length=False,
+                      max_tokens=None, max_padded_tokens=None, stats=None):
     """
     model: an instance of ElmoSCLSTM
     data: list of tuples, with each tuple consisting of correct and incorrect 
             sentence string (would be split at whitespaces)
+    bucket_by_length: if True, sentences of similar lengths are batched together to reduce padding;
+            predictions are still returned in the order of data
+    max_tokens, max_padded_tokens: optional token budgets per batch, see `budget_batch_iter`
+    stats: optional dict in which batching statistics are accumulated
     """
 
     topk = 1
@@ -140,28 +158,37 @@ def model_predictions(model, data, vocab, device, batch_size=16, backoff="pass-t
     final_sentences = []
     VALID_batch_size = batch_size
     # print("data size: {}".format(len(data)))
-    data_iter = batch_iter(data, batch_size=VALID_batch_size, shuffle=False)
+    if bucket_by_length:
+        order = get_bucketed_order(data)
+        data = [data[idx] for idx in order]
+    data_iter = budget_batch_iter(data, VALID_batch_size, max_tokens=max_tokens,
+                                  max_padded_tokens=max_padded_tokens, stats=stats)
     model.eval()
     model.to(device)
     for batch_id, (batch_clean_sentences, batch_corrupt_sentences) in enumerate(data_iter):
+        timer = batch_timer()
         # set batch data
-        batch_labels, batch_lengths = labelize(batch_clean_sentences, vocab)
-        batch_idxs, batch_lengths_ = sclstm_tokenize(batch_corrupt_sentences, vocab)
-        assert (batch_lengths_ == batch_lengths).all() == True
+        batch_idxs, batch_lengths = sclstm_tokenize(batch_corrupt_sentences, vocab)
         batch_idxs = [batch_idxs_.to(device) for batch_idxs_ in batch_idxs]
+        timer.lap("sc_tokenize")
         # batch_lengths = batch_lengths.to(device)
-        batch_labels = batch_labels.to(device)
         elmo_batch_to_ids = get_module_or_attr("allennlp.modules.elmo", "batch_to_ids")
         batch_elmo_inp = elmo_batch_to_ids([line.split() for line in batch_corrupt_sentences]).to(device)
+        timer.lap("elmo_tokenize")
         # forward
         with torch.no_grad():
             """
             NEW: batch_predictions can now be of shape (batch_size,batch_max_seq_len,topk) if topk>1, else (batch_size,batch_max_seq_len)
             """
-            _, batch_predictions = model(batch_idxs, batch_lengths, batch_elmo_inp, targets=batch_labels, topk=topk)
+            _, batch_predictions = model(batch_idxs, batch_lengths, batch_elmo_inp, topk=topk)
+        timer.lap("forward")
         batch_predictions = untokenize_without_unks(batch_predictions, batch_lengths, vocab, batch_clean_sentences,
                                                     backoff=backoff)
+        timer.lap("untokenize")
+        timer.done(batch_lengths)
         final_sentences.extend(batch_predictions)
+    if bucket_by_length:
+        final_sentences = restore_order(final_sentences, order)
     # print("total inference time for this data is: {:4f} secs".format(time.time()-inference_st_time))
     return final_sentences
 
@@ -192,12 +219,9 @@ def model_predictions_for_ui(model, data, vocab, device, batch_size=16, backoff=
     model.to(device)
     for batch_id, (batch_clean_sentences, batch_corrupt_sentences) in enumerate(data_iter):
         # set batch data
-        batch_labels, batch_lengths = labelize(batch_clean_sentences, vocab)
-        batch_idxs, batch_lengths_ = sclstm_tokenize(batch_corrupt_sentences, vocab)
-        assert (batch_lengths_ == batch_lengths).all() == True
+        batch_idxs, batch_lengths = sclstm_tokenize(batch_corrupt_sentences, vocab)
         batch_idxs = [batch_idxs_.to(device) for batch_idxs_ in batch_idxs]
         # batch_lengths = batch_lengths.to(device)
-        batch_labels = batch_labels.to(device)
         elmo_batch_to_ids = get_module_or_attr("allennlp.modules.elmo", "batch_to_ids")
         batch_elmo_inp = elmo_batch_to_ids([line.split() for line in batch_corrupt_sentences]).to(device)
         # forward
@@ -207,18 +231,17 @@ def model_predictions_for_ui(model, data, vocab, device, batch_size=16, backoff=
                     """
                     NEW: batch_predictions can now be of shape (batch_size,batch_max_seq_len,topk) if topk>1, else (batch_size,batch_max_seq_len) if topk==1
                     """
-                    _, batch_predictions = model(batch_idxs, batch_lengths, batch_elmo_inp, targets=batch_labels,
-                                                 topk=topk)  # topk=1 or 5
+                    _, batch_predictions = model(batch_idxs, batch_lengths, batch_elmo_inp, topk=topk)  # topk=1 or 5
                 else:
                     """
                     NEW: batch_predictions can now be of shape (batch_size,batch_max_seq_len,topk) if topk==None
                     """
                     _, batch_predictions, batch_predictions_probs = model(batch_idxs, batch_lengths, batch_elmo_inp,
-                                                                          targets=batch_labels, topk=topk,
+                                                                          topk=topk,
                                                                           beam_search=True)
         except RuntimeError:
             print(
-                f"batch_idxs:{len(batch_idxs)},batch_lengths:{batch_lengths.shape},batch_elmo_inp:{batch_elmo_inp.shape},batch_labels:{batch_labels.shape}")
+                f"batch_idxs:{len(batch_idxs)},batch_lengths:{batch_lengths.shape},batch_elmo_inp:{batch_elmo_inp.shape}")
             raise Exception("")
 
         # based on beam_search, do either greedy topk or beam search for topk
@@ -238,7 +261,8 @@ def model_predictions_for_ui(model, data, vocab, device, batch_size=16, backoff=
     return final_sentences
 
 
-def model_inference(model, data, topk, device, batch_size=16, beam_search=False, selected_lines_file=None, vocab_=None):
+def model_inference(model, data, topk, device, batch_size=16, beam_search=False, selected_lines_file=None, vocab_=None,
+                    max_tokens=None, max_padded_tokens=None, stats=None):
     """
     model: an instance of ElmoSCLSTM
     data: list of tuples, with each tuple consisting of correct and incorrect 
@@ -247,6 +271,8 @@ def model_inference(model, data, topk, device, batch_size=16, beam_search=False,
     device: "cuda:0" or "cpu"
     batch_size: batch size for input to the model
     beam_search: if True, greedy topk will not be performed
+    max_tokens, max_padded_tokens: optional token budgets per batch, see `budget_batch_iter`
+    stats: optional dict in which batching statistics are accumulated
     """
     if vocab_ is not None:
         vocab = vocab_
@@ -269,7 +295,8 @@ def model_inference(model, data, topk, device, batch_size=16, beam_search=False,
     corr2corr, corr2incorr, incorr2corr, incorr2incorr = 0, 0, 0, 0
     predictions = []
     print("data size: {}".format(len(data)))
-    data_iter = batch_iter(data, batch_size=VALID_batch_size, shuffle=False)
+    data_iter = budget_batch_iter(data, VALID_batch_size, max_tokens=max_tokens,
+                                  max_padded_tokens=max_padded_tokens, stats=stats)
     model.eval()
     model.to(device)
     for batch_id, (batch_clean_sentences, batch_corrupt_sentences) in tqdm(enumerate(data_iter)):
@@ -357,6 +384,7 @@ def model_inference(model, data, topk, device, batch_size=16, beam_search=False,
 
             ##########################################################
             ############### this does reranking ######################
+            gpt2Tokenizer, gpt2LMHeadModel = get_resource("elmosclstm_reranker")
             gpt2LMHeadModel.to(device)
             gpt2LMHeadModel.eval()
             # txlLMHeadModel.to(device)
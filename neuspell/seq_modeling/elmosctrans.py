@@ -4,6 +4,7 @@ from .downloads import download_pretrained_model
 from .evals import get_metrics
 from .helpers import *
 from .models import ElmoSCTransformer
+from ..metrics import batch_timer
 from .util import get_module_or_attr
 
 
@@ -59,11 +60,16 @@ def load_pretrained_large(model, checkpoint_path, optimizer=None, device='cuda')
     return model
 
 
-def model_predictions(model, data, vocab, device, batch_size=16):
+def model_predictions(model, data, vocab, device, batch_size=16, bucket_by_length=False, max_tokens=None,
+                      max_padded_tokens=None, stats=None):
     """
     model: an instance of ElmoSCTransformer
     data: list of tuples, with each tuple consisting of correct and incorrect 
             sentence string (would be split at whitespaces)
+    bucket_by_length: if True, sentences of similar lengths are batched together to reduce padding;
+            predictions are still returned in the order of data
+    max_tokens, max_padded_tokens: optional token budgets per batch, see `budget_batch_iter`
+    stats: optional dict in which batching statistics are accumulated
     """
 
     topk = 1
@@ -72,39 +78,50 @@ def model_predictions(model, data, vocab, device, batch_size=16):
     final_sentences = []
     VALID_batch_size = batch_size
     print("data size: {}".format(len(data)))
-    data_iter = batch_iter(data, batch_size=VALID_batch_size, shuffle=False)
+    if bucket_by_length:
+        order = get_bucketed_order(data)
+        data = [data[idx] for idx in order]
+    data_iter = budget_batch_iter(data, VALID_batch_size, max_tokens=max_tokens,
+                                  max_padded_tokens=max_padded_tokens, stats=stats)
     model.eval()
     model.to(device)
     for batch_id, (batch_clean_sentences, batch_corrupt_sentences) in enumerate(data_iter):
+        timer = batch_timer()
         # set batch data
-        batch_labels, batch_lengths = labelize(batch_clean_sentences, vocab)
-        batch_idxs, batch_lengths_, inverted_mask = sctrans_tokenize(batch_corrupt_sentences, vocab)
-        assert (batch_lengths_ == batch_lengths).all() == True
+        batch_idxs, batch_lengths, inverted_mask = sctrans_tokenize(batch_corrupt_sentences, vocab)
         batch_idxs = [batch_idxs_.to(device) for batch_idxs_ in batch_idxs]
         # batch_lengths = batch_lengths.to(device)
-        batch_labels = batch_labels.to(device)
         inverted_mask = inverted_mask.to(device)
+        timer.lap("sc_tokenize")
         elmo_batch_to_ids = get_module_or_attr("allennlp.modules.elmo", "batch_to_ids")
         batch_elmo_inp = elmo_batch_to_ids([line.split() for line in batch_corrupt_sentences]).to(device)
+        timer.lap("elmo_tokenize")
         # forward
         with torch.no_grad():
             """
             NEW: batch_predictions can now be of shape (batch_size,batch_max_seq_len,topk) if topk>1, else (batch_size,batch_max_seq_len)
             """
-            _, batch_predictions = model(batch_idxs, inverted_mask, batch_lengths, batch_elmo_inp, targets=batch_labels,
-                                         topk=topk)
+            _, batch_predictions = model(batch_idxs, inverted_mask, batch_lengths, batch_elmo_inp, topk=topk)
+        timer.lap("forward")
         batch_predictions = untokenize_without_unks(batch_predictions, batch_lengths, vocab, batch_clean_sentences)
+        timer.lap("untokenize")
+        timer.done(batch_lengths)
         final_sentences.extend(batch_predictions)
+    if bucket_by_length:
+        final_sentences = restore_order(final_sentences, order)
     print("total inference time for this data is: {:4f} secs".format(time.time() - inference_st_time))
     return final_sentences
 
 
-def model_inference(model, data, topk, device, batch_size=16, vocab_=None):
+def model_inference(model, data, topk, device, batch_size=16, vocab_=None, max_tokens=None, max_padded_tokens=None,
+                    stats=None):
     """
     model: an instance of ElmoSCTransformer
     data: list of tuples, with each tuple consisting of correct and incorrect 
             sentence string (would be split at whitespaces)
     topk: how many of the topk softmax predictions are considered for metrics calculations
+    max_tokens, max_padded_tokens: optional token budgets per batch, see `budget_batch_iter`
+    stats: optional dict in which batching statistics are accumulated
     """
 
     if vocab_ is not None:
@@ -118,7 +135,8 @@ def model_inference(model, data, topk, device, batch_size=16, vocab_=None):
     valid_loss = 0.
     valid_acc = 0.
     print("data size: {}".format(len(data)))
-    data_iter = batch_iter(data, batch_size=VALID_batch_size, shuffle=False)
+    data_iter = budget_batch_iter(data, VALID_batch_size, max_tokens=max_tokens,
+                                  max_padded_tokens=max_padded_tokens, stats=stats)
     model.eval()
     model.to(device)
     for batch_id, (batch_clean_sentences, batch_corrupt_sentences) in tqdm(enumerate(data_iter)):
@@ -0,0 +1,98 @@
+import os
+
+import torch
+from torch import nn
+from torch.nn.utils.rnn import pad_sequence
+
+from .seq_modeling.models import get_inference_module
+
+""" torchscript archives of the checkers' models, loaded without the (python) model definitions """
+
+SCRIPTABLE_MODEL_TYPES = ["sclstm", "cnnlstm", "lstmlstm"]
+
+
+def save_torchscript(model: nn.Module, torchscript_path: str):
+    """
+    compiles the scriptable inference module of a `SCLSTM`, `CharCNNWordLSTMModel` or `CharLSTMWordLSTMModel` (see
+    `get_inference_module`) and saves it as a .pt archive, loadable with `ScriptedModel`
+    """
+    model.eval()
+    scripted_module = torch.jit.script(get_inference_module(model).eval())
+    os.makedirs(os.path.dirname(os.path.abspath(torchscript_path)), exist_ok=True)
+    scripted_module.save(torchscript_path)
+    print(f"torchscript model saved at: {torchscript_path}")
+    return torchscript_path
+
+
+class ScriptedModel:
+    """
+    runs a .pt archive saved with `save_torchscript`; it is called like the torch model is in the checkers'
+    `model_predictions`, i.e. `_, batch_predictions = model(batch_inputs, ..., batch_lengths, topk=1)`, so that
+    the pre- and post-processing around it is unchanged
+    """
+
+    def __init__(self, torchscript_path: str, device="cpu"):
+        self.torchscript_path = torchscript_path
+        self.device = device
+        self.module = torch.jit.load(torchscript_path, map_location=device)
+        self.module.eval()
+        self.model_type = self.module.model_type
+
+    def __call__(self, *args, aux_word_embs=None, targets=None, topk=1, shortlist=None):
+        if aux_word_embs is not None or targets is not None or shortlist is not None:
+            raise NotImplementedError("the torchscript backend only computes predictions, use the torch backend")
+        args = getattr(self, f"_{self.model_type}_args")(*args)
+        batch_predictions = self.module(*args, topk=topk)
+        return None, batch_predictions.cpu().numpy()
+
+    def _sclstm_args(self, batch_screps, batch_lengths):
+        return pad_sequence(batch_screps, batch_first=True, padding_value=0).to(self.device), batch_lengths
+
+    def _batched_char_idxs(self, batch_idxs):
+        # a list of per-sentence [nwords,nchars] tensors as a single [BS,max_nwords,max_nchars] tensor
+        if torch.is_tensor(batch_idxs):
+            return batch_idxs.to(self.device)
+        char_padding_idx = self.module.char_padding_idx
+        max_nchars = max([idxs.size(1) for idxs in batch_idxs])
+        batch_idxs = [torch.nn.functional.pad(idxs, (0, max_nchars - idxs.size(1)), value=char_padding_idx)
+                      for idxs in batch_idxs]
+        return pad_sequence(batch_idxs, batch_first=True, padding_value=char_padding_idx).to(self.device)
+
+    def _cnnlstm_args(self, batch_idxs, batch_lengths):
+        return self._batched_char_idxs(batch_idxs), batch_lengths
+
+    def _lstmlstm_args(self, batch_idxs, batch_char_lengths, batch_lengths):
+        if not torch.is_tensor(batch_char_lengths):
+            batch_char_lengths = pad_sequence(batch_char_lengths, batch_first=True, padding_value=0)
+        return self._batched_char_idxs(batch_idxs), batch_char_lengths, batch_lengths
+
+    # the parts of the torch.nn.Module api used by the checkers
+
+    def eval(self):
+        return self
+
+    def to(self, device):
+        self.module.to(device)
+        self.device = device
+        return self
+
+    def share_memory(self):
+        self.module.share_memory()
+        return self
+
+    def parameters(self):
+        return self.module.parameters()
+
+    def buffers(self):
+        return self.module.buffers()
+
+    def __getstate__(self):
+        # script modules cannot be pickled, e.g. for worker processes; each copy loads the archive again
+        state = self.__dict__.copy()
+        state["module"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.module = torch.jit.load(self.torchscript_path, map_location=self.device)
+        self.module.eval()
@@ -0,0 +1,131 @@
+import os
+import shutil
+from typing import Dict, Iterable, List, Tuple
+
+import torch
+
+from .corrector import _load_pickled_model
+from .seq_modeling.helpers import load_vocab_dict, save_vocab_dict
+
+""" pruning of the output vocabulary of a checkpoint, for smaller and faster checkers """
+
+# files of a checkpoint folder derived from its weights, which are stale once the weights are pruned
+DERIVED_FILES = ["model.onnx", "model.pt", "quantized_model.pt", "quantized_model.json"]
+
+
+def _copy_tree(src: str, dest: str):
+    # `shutil.copytree` into an existing folder, which its `dirs_exist_ok` only allows from python 3.8
+    for dir_path, _, file_names in os.walk(src):
+        dest_dir_path = os.path.join(dest, os.path.relpath(dir_path, src))
+        os.makedirs(dest_dir_path, exist_ok=True)
+        for file_name in file_names:
+            shutil.copy2(os.path.join(dir_path, file_name), os.path.join(dest_dir_path, file_name))
+
+
+def _token_freq_items(vocab: dict) -> List[Tuple[str, int]]:
+    # `token_freq` is a list of (token, freq) sorted by freq in vocabs from `get_tokens`, but can also be a dict
+    token_freq = vocab["token_freq"]
+    return [*token_freq.items()] if isinstance(token_freq, dict) else [*token_freq]
+
+
+def _special_tokens(vocab: dict) -> List[str]:
+    return [vocab[key] for key in ["pad_token", "unk_token", "eos_token"] if key in vocab]
+
+
+def top_tokens(vocab: dict, topn: int) -> List[str]:
+    """
+    the `topn` most frequent words of the output vocab, besides the special tokens
+    """
+    special_tokens = _special_tokens(vocab)
+    items = [(token, freq) for token, freq in _token_freq_items(vocab) if token not in special_tokens]
+    return [token for token, _ in sorted(items, key=lambda item: item[1], reverse=True)[:topn]]
+
+
+def prune_vocab(vocab: dict, keep_tokens: Iterable[str]) -> Tuple[dict, List[int]]:
+    """
+    returns a copy of `vocab` whose output vocab has only the `keep_tokens` found in it and the special tokens,
+    in their original order, and the old idxs of the new output vocab, i.e. new idx -> old idx
+    """
+    token2idx = vocab["token2idx"]
+    keep_tokens = set(keep_tokens) | set(_special_tokens(vocab))
+    kept_idxs = sorted([token2idx[token] for token in keep_tokens if token in token2idx])
+    idx2token = {new_idx: vocab["idx2token"][old_idx] for new_idx, old_idx in enumerate(kept_idxs)}
+
+    new_vocab = dict(vocab)
+    new_vocab["idx2token"] = idx2token
+    new_vocab["token2idx"] = {token: idx for idx, token in idx2token.items()}
+    token_freq = [(token, freq) for token, freq in _token_freq_items(vocab) if token in new_vocab["token2idx"]]
+    new_vocab["token_freq"] = dict(token_freq) if isinstance(vocab["token_freq"], dict) else token_freq
+    for key in ["pad_token", "unk_token", "eos_token"]:
+        if f"{key}_idx" in vocab:
+            new_vocab[f"{key}_idx"] = new_vocab["token2idx"][vocab[key]]
+    return new_vocab, kept_idxs
+
+
+def prune_state_dict(state_dict: Dict[str, torch.Tensor], kept_idxs: List[int], output_dim: int):
+    """
+    keeps the rows of the output layer(s) (`dense.weight` and `dense.bias` of output_dim rows) at `kept_idxs`
+    """
+    kept_idxs_tensor = torch.tensor(kept_idxs, dtype=torch.long)
+    new_state_dict, pruned_keys = {}, []
+    for key, tensor in state_dict.items():
+        if key.split(".")[-2:] in [["dense", "weight"], ["dense", "bias"]] and tensor.size(0) == output_dim:
+            tensor = tensor.index_select(0, kept_idxs_tensor.to(tensor.device)).clone()
+            pruned_keys.append(key)
+        new_state_dict[key] = tensor
+    if not pruned_keys:
+        raise ValueError(f"no output layer with {output_dim} outputs found in the checkpoint")
+    return new_state_dict, pruned_keys
+
+
+def prune_checkpoint(ckpt_path: str, dest_path: str, topn: int = None, wordlist: Iterable[str] = None,
+                     vocab_path: str = None) -> str:
+    """
+    writes a copy of the checkpoint folder `ckpt_path` to `dest_path` with its output vocab pruned to the `topn`
+    most frequent words (by `token_freq`) or to the words of `wordlist`; the weights of pytorch_model.bin and, if
+    present, of the training checkpoint model.pth.tar are pruned alike, and other files of the folder are copied as
+    is, except those derived from the weights, see `DERIVED_FILES`
+
+    USAGE
+    -----
+    prune_checkpoint("data/checkpoints/scrnn-probwordnoise", "data/checkpoints/scrnn-probwordnoise-50k", topn=50000)
+    checker = SclstmChecker()
+    checker.from_pretrained("data/checkpoints/scrnn-probwordnoise-50k")
+    -----
+    """
+    if (topn is None) == (wordlist is None):
+        raise ValueError("give exactly one of `topn` or `wordlist`")
+    if os.path.abspath(ckpt_path) == os.path.abspath(dest_path):
+        raise ValueError("the pruned checkpoint must be written to a new folder")
+    vocab = load_vocab_dict(vocab_path or os.path.join(ckpt_path, "vocab.pkl"))
+    output_dim = len(vocab["token_freq"])
+    keep_tokens = top_tokens(vocab, topn) if topn is not None else [word.strip() for word in wordlist]
+    new_vocab, kept_idxs = prune_vocab(vocab, keep_tokens)
+
+    state_dict = _load_pickled_model(os.path.join(ckpt_path, "pytorch_model.bin"))
+    new_state_dict, pruned_keys = prune_state_dict(state_dict, kept_idxs, output_dim)
+    checkpoint_data = None
+    if os.path.isfile(os.path.join(ckpt_path, "model.pth.tar")):
+        checkpoint_data = _load_pickled_model(os.path.join(ckpt_path, "model.pth.tar"))
+        checkpoint_data["model_state_dict"], _ = prune_state_dict(checkpoint_data["model_state_dict"], kept_idxs,
+                                                                  output_dim)
+        if checkpoint_data.get("optimizer_state_dict"):
+            # the optimizer's per-parameter state (e.g. adam's moments) has the unpruned shapes; it starts afresh
+            checkpoint_data["optimizer_state_dict"]["state"] = {}
+
+    os.makedirs(dest_path, exist_ok=True)
+    for name in os.listdir(ckpt_path):
+        if name in ["pytorch_model.bin", "model.pth.tar", "vocab.pkl", *DERIVED_FILES]:
+            continue
+        src, dest = os.path.join(ckpt_path, name), os.path.join(dest_path, name)
+        if os.path.isdir(src):
+            _copy_tree(src, dest)
+        else:
+            shutil.copy2(src, dest)
+    torch.save(new_state_dict, os.path.join(dest_path, "pytorch_model.bin"))
+    if checkpoint_data is not None:
+        torch.save(checkpoint_data, os.path.join(dest_path, "model.pth.tar"))
+    save_vocab_dict(os.path.join(dest_path, "vocab.pkl"), new_vocab)
+    print(f"pruned the output vocab from {output_dim} to {len(kept_idxs)} tokens in {pruned_keys}, "
+          f"saved at: {dest_path}")
+    return dest_path
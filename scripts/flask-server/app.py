@@ -2,12 +2,23 @@
 Usage
 -----
 CUDA_VISIBLE_DEVICES=0 python app.py
+or, to serve the JSON API in production, with 2 processes of 16 threads each
+CUDA_VISIBLE_DEVICES=0 gunicorn --workers 2 --worker-class gthread --threads 16 --bind 0.0.0.0:5000 app:app
+-----
+/metrics and /v1/models report only the process that answers the request, i.e. one of the gunicorn workers; to
+monitor all of them, run single-worker servers on separate ports and scrape each one
 """
 
+import atexit
+import logging
 import os
+import queue
+import threading
+from concurrent.futures import TimeoutError
+from logging.handlers import MemoryHandler, QueueHandler, QueueListener
 from time import time
 
-from flask import Flask, render_template, request
+from flask import Flask, Response, jsonify, render_template, request
 from flask_cors import CORS
 from neuspell import BertChecker
 from neuspell import BertsclstmChecker
@@ -15,6 +26,8 @@ from neuspell import CnnlstmChecker
 from neuspell import NestedlstmChecker
 from neuspell import SclstmChecker
 from neuspell import SclstmbertChecker
+from neuspell.metrics import enable_metrics, render_prometheus
+from neuspell.scheduler import MicroBatchScheduler
 from neuspell.seq_modeling.util import is_module_available
 
 # from neuspell import AspellChecker, JamspellChecker
@@ -27,13 +40,43 @@ else:
 
 TOKENIZE = True
 PRELOADED_MODELS = {}
-CURR_MODEL_KEYWORD = "bert"
-CURR_MODEL = None
+# the model of requests that do not name one; fixed per deployment, so that it is the same in every worker process
+DEFAULT_MODEL = os.environ.get("NEUSPELL_DEFAULT_MODEL", "bert")
 TOPK = 1
 LOGS_PATH = "./logs"
+DEBUG = os.environ.get("NEUSPELL_DEBUG", "0") == "1"
+# stage-level latencies and batch statistics, served at /metrics
+if os.environ.get("NEUSPELL_METRICS", "1") == "1":
+    enable_metrics()
+
+# JSON API; each model gets its own queue, whose requests are corrected in batches, see `MicroBatchScheduler`
+MAX_BATCH_SIZE = int(os.environ.get("NEUSPELL_MAX_BATCH_SIZE", 32))
+MAX_WAIT_MS = float(os.environ.get("NEUSPELL_MAX_WAIT_MS", 10))
+MAX_QUEUE_SIZE = int(os.environ.get("NEUSPELL_MAX_QUEUE_SIZE", 1024))
+MAX_STRINGS_PER_REQUEST = int(os.environ.get("NEUSPELL_MAX_STRINGS_PER_REQUEST", 256))
+REQUEST_TIMEOUT = float(os.environ.get("NEUSPELL_REQUEST_TIMEOUT", 30))
+SCHEDULERS = {}
+_LOAD_LOCK = threading.Lock()
+
+# queries are logged from a background thread, and written to disk in chunks
 if not os.path.exists(LOGS_PATH):
     os.makedirs(LOGS_PATH)
-opfile = open(os.path.join(LOGS_PATH, str(time()) + ".logs.txt"), "w")
+_log_file_handler = logging.FileHandler(os.path.join(LOGS_PATH, str(time()) + ".logs.txt"))
+_log_file_handler.setFormatter(logging.Formatter("%(message)s"))
+_log_buffer_handler = MemoryHandler(capacity=256, flushLevel=logging.ERROR, target=_log_file_handler)
+_log_listener = QueueListener(queue.Queue(), _log_buffer_handler)
+query_logger = logging.getLogger("neuspell.queries")
+query_logger.setLevel(logging.INFO)
+query_logger.propagate = False
+query_logger.addHandler(QueueHandler(_log_listener.queue))
+_log_listener.start()
+
+
+@atexit.register
+def _stop_query_logging():
+    _log_listener.stop()
+    _log_buffer_handler.close()
+    _log_file_handler.close()
 
 # Define the app
 app = Flask(__name__)
@@ -46,63 +89,163 @@ def home():
     return render_template('home.html')
 
 
+def _page_error(message, status):
+    # the pages' errors send the user back to the choice of model, with the same status codes as the JSON API
+    return render_template('home.html', error=message), status
+
+
 @app.route('/loaded', methods=['POST'])
 def loaded():
-    global CURR_MODEL_KEYWORD, CURR_MODEL
-    print(request.form)
-    print(request.form["checkers"])
-    CURR_MODEL_KEYWORD = request.form["checkers"]
-    CURR_MODEL = load_model(CURR_MODEL_KEYWORD)
-    return render_template('loaded.html')
+    # the chosen model is carried in the pages' forms rather than kept in the process, which can be one of several
+    model_keyword = request.form.get("checkers", DEFAULT_MODEL)
+    try:
+        scheduler = get_scheduler(model_keyword)
+    except NotImplementedError as e:
+        return _page_error(str(e), 404)
+    if scheduler is None:
+        return _page_error(f"model `{model_keyword}` is not available", 404)
+    return render_template('loaded.html', checkers=model_keyword)
 
 
 @app.route('/reset', methods=['POST'])
 def reset():
-    return render_template('loaded.html')
+    return render_template('loaded.html', checkers=request.form.get("checkers", DEFAULT_MODEL))
 
 
 @app.route('/predict', methods=['POST'])
 def predict():
-    global CURR_MODEL, CURR_MODEL_KEYWORD, TOPK
     if request.method == 'POST':
-        print("#################")
-        print(request.form)
-        print(request.form.keys())
+        model_keyword = request.form.get("checkers", DEFAULT_MODEL)
         message = request.form['hidden-message']
         message = message.strip("\n").strip("\r")
         if message == "":
-            return render_template('loaded.html')
+            return render_template('loaded.html', checkers=model_keyword)
         if TOPK == 1:
-            message_modified, result = CURR_MODEL.correct_string(message, return_all=True)
-            print(message)
-            print(message_modified)
-            print(result)
-            save_query(CURR_MODEL_KEYWORD + "\t" + message + "\t" + message_modified + "\t" + result + "\n")
+            try:
+                scheduler = get_scheduler(model_keyword)
+            except NotImplementedError as e:
+                return _page_error(str(e), 404)
+            if scheduler is None:
+                return _page_error(f"model `{model_keyword}` is not available", 404)
+            try:
+                future = scheduler.submit(message)
+            except queue.Full:
+                return _page_error("server is busy, retry later", 503)
+            try:
+                message_modified, result = future.result(timeout=REQUEST_TIMEOUT)
+            except TimeoutError:
+                future.cancel()
+                return _page_error("timed out", 504)
+            save_query(model_keyword + "\t" + message + "\t" + message_modified + "\t" + result + "\n")
             paired = [(a, b) if a == b else ("+-+" + a + "-+-", "+-+" + b + "-+-") for a, b in
                       zip(message_modified.split(), result.split())]
-            print(paired)
             return render_template('result.html', prediction=" ".join([x[1] for x in paired]),
-                                   message=" ".join([x[0] for x in paired]))
+                                   message=" ".join([x[0] for x in paired]), checkers=model_keyword)
         else:
             raise NotImplementedError("please keep TOPK=1")
-        # results = PRELOADED_MODELS[CURR_MODEL_KEYWORD].correct_strings_for_ui([message], topk=TOPK)
-        # save_query(CURR_MODEL_KEYWORD+"\t"+message+"\t"+"\t".join(results)+"\n")
+        # results = PRELOADED_MODELS[model_keyword].correct_strings_for_ui([message], topk=TOPK)
+        # save_query(model_keyword+"\t"+message+"\t"+"\t".join(results)+"\n")
         # return render_template('results.html', prediction=results, message=message)	
     return render_template('home.html')
 
 
+@app.route('/v1/correct', methods=['POST'])
+def v1_correct():
+    """
+    request: {"model": "sc-rnn", "texts": ["..", ..], "options": {"return_tokenized": false}}
+    response: {"model": "sc-rnn", "corrected": ["..", ..]} with an additional "tokenized" list if asked for
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"error": "expected a JSON object"}), 400
+    model_keyword = payload.get("model", DEFAULT_MODEL)
+    texts = payload.get("texts", None)
+    options = payload.get("options", None) or {}
+    if not (isinstance(texts, list) and all([isinstance(text, str) for text in texts])):
+        return jsonify({"error": "`texts` must be a list of strings"}), 400
+    if len(texts) > MAX_STRINGS_PER_REQUEST:
+        return jsonify({"error": f"at most {MAX_STRINGS_PER_REQUEST} texts per request"}), 413
+    # empty and whitespace-only texts are returned as they are, without being batched with other requests' texts
+
+    try:
+        scheduler = get_scheduler(model_keyword)
+    except NotImplementedError as e:
+        return jsonify({"error": str(e)}), 404
+    if scheduler is None:
+        return jsonify({"error": f"model `{model_keyword}` is not available"}), 404
+
+    try:
+        futures = scheduler.submit_many([text.strip("\n").strip("\r") for text in texts])
+    except queue.Full:
+        return jsonify({"error": "server is busy, retry later"}), 503, {"Retry-After": "1"}
+    # a single deadline for the whole request, however many texts it has
+    deadline = time() + REQUEST_TIMEOUT
+    try:
+        results = [future.result(timeout=max(0, deadline - time())) for future in futures]
+    except TimeoutError:
+        for future in futures:
+            future.cancel()
+        return jsonify({"error": "timed out"}), 504
+
+    response = {"model": model_keyword, "corrected": [corrected for _, corrected in results]}
+    if options.get("return_tokenized", False):
+        response["tokenized"] = [tokenized for tokenized, _ in results]
+    for text, (_, corrected) in zip(texts, results):
+        save_query(model_keyword + "\t" + text + "\t" + corrected + "\n")
+    return jsonify(response)
+
+
+@app.route('/v1/models', methods=['GET'])
+def v1_models():
+    return jsonify({k: v.metrics() for k, v in SCHEDULERS.items()})
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # metrics of this worker process only, see the usage notes at the top
+    lines = []
+    for name, kind, documentation in [
+        ("nrequests", "counter", "texts corrected by the model's queue"),
+        ("nbatches", "counter", "batches run by the model's queue"),
+        ("total_queueing_delay_ms", "counter", "total time texts waited in the model's queue"),
+        ("queued", "gauge", "texts currently waiting in the model's queue"),
+    ]:
+        lines.extend([f"# HELP neuspell_scheduler_{name} {documentation}", f"# TYPE neuspell_scheduler_{name} {kind}"])
+        for model_keyword, scheduler in list(SCHEDULERS.items()):
+            lines.append(f'neuspell_scheduler_{name}{{model="{model_keyword}"}} {scheduler.metrics()[name]}')
+    return Response(render_prometheus() + "\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+
+def get_scheduler(model_keyword):
+    if model_keyword not in SCHEDULERS:
+        with _LOAD_LOCK:
+            if model_keyword not in SCHEDULERS:
+                model = load_model(model_keyword)
+                if model is None:
+                    return None
+                SCHEDULERS[model_keyword] = MicroBatchScheduler(model, max_batch_size=MAX_BATCH_SIZE,
+                                                                max_wait_ms=MAX_WAIT_MS, max_queue_size=MAX_QUEUE_SIZE)
+    return SCHEDULERS[model_keyword]
+
+
 def load_model(model_keyword="bert"):
     global PRELOADED_MODELS
-    if model_keyword in PRELOADED_MODELS:
-        return PRELOADED_MODELS[model_keyword]
+    if model_keyword not in PRELOADED_MODELS:
+        model = _load_model(model_keyword)
+        if model is None:
+            return None
+        PRELOADED_MODELS[model_keyword] = model
+    return PRELOADED_MODELS[model_keyword]
+
 
+def _load_model(model_keyword="bert"):
     try:
         if model_keyword == "aspell":
             # return AspellChecker(tokenize=TOKENIZE)
-            raise Exception("Not enabled. Install required modules and uncomment this to enable")
+            raise NotImplementedError(f"{model_keyword} is not enabled, install its modules and uncomment it in app.py")
         elif model_keyword == "jamspell":
             # return JamspellChecker(tokenize=TOKENIZE)
-            raise Exception("Not enabled. Install required modules and uncomment this to enable")
+            raise NotImplementedError(f"{model_keyword} is not enabled, install its modules and uncomment it in app.py")
         elif model_keyword == "cnn-rnn":
             return CnnlstmChecker(tokenize=TOKENIZE, pretrained=True)
         elif model_keyword == "sc-rnn":
@@ -154,13 +297,11 @@ def preload_models():
 
 
 def save_query(text):
-    global opfile
-    opfile.write(text)
-    opfile.flush()
+    query_logger.info(text.rstrip("\n"))
     return
 
 
 if __name__ == "__main__":
     print("*** Flask Server ***")
     preload_models()
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(debug=DEBUG, host='0.0.0.0', port=5000, threaded=True)
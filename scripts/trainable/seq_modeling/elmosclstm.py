@@ -45,6 +45,7 @@ from helpers import progressBar
 from helpers import load_vocab_dict, save_vocab_dict
 from helpers import load_data, train_validation_split, get_char_tokens, get_tokens, num_unk_tokens
 from helpers import batch_iter, labelize, tokenize, char_tokenize, sclstm_tokenize
+from helpers import get_bucketed_order, restore_order
 from helpers import untokenize, untokenize_without_unks, untokenize_without_unks2, untokenize_without_unks3, get_model_nparams
 from helpers import batch_accuracy_func
 from helpers2 import get_line_representation, get_lines
@@ -56,27 +57,32 @@ from evals import get_metrics
 # (GPT/GPT-2/CTRL/Transformer-XL/XLNet)
 import torch
 from torch.nn import CrossEntropyLoss
+from functools import lru_cache
 HFACE_BATCH_SIZE = 8
 RERANKER = "GPT-2"  # GPT/GPT-2/CTRL/Transformer-XL/XLNet
-if RERANKER=="GPT":
-    from transformers import OpenAIGPTTokenizer, OpenAIGPTLMHeadModel
-    gpt2Tokenizer = OpenAIGPTTokenizer.from_pretrained('openai-gpt')
-    gpt2LMHeadModel = OpenAIGPTLMHeadModel.from_pretrained('openai-gpt')
-    gpt2Tokenizer.add_special_tokens({'pad_token':"[PAD]"})
-    gpt2LMHeadModel.resize_token_embeddings(len(gpt2Tokenizer))
-    assert gpt2Tokenizer.pad_token == '[PAD]'
-elif "GPT-2":
-    from transformers import GPT2Tokenizer, GPT2LMHeadModel
-    gpt2Tokenizer = GPT2Tokenizer.from_pretrained('gpt2-medium')
-    gpt2LMHeadModel = GPT2LMHeadModel.from_pretrained('gpt2-medium')
-    gpt2Tokenizer.pad_token = gpt2Tokenizer.eos_token
-elif "Transformer-XL":
-    from transformers import TransfoXLTokenizer, TransfoXLLMHeadModel
-    txlTokenizer = TransfoXLTokenizer.from_pretrained('transfo-xl-wt103')
-    txlLMHeadModel = TransfoXLLMHeadModel.from_pretrained('transfo-xl-wt103')
-    txlTokenizer.pad_token = txlTokenizer.eos_token
-else:
-    raise NotImplementedError
+@lru_cache(maxsize=None)
+def load_reranker():
+    # loaded on first use rather than at import, so that importing this script does not pull gpt2-medium
+    if RERANKER=="GPT":
+        from transformers import OpenAIGPTTokenizer, OpenAIGPTLMHeadModel
+        gpt2Tokenizer = OpenAIGPTTokenizer.from_pretrained('openai-gpt')
+        gpt2LMHeadModel = OpenAIGPTLMHeadModel.from_pretrained('openai-gpt')
+        gpt2Tokenizer.add_special_tokens({'pad_token':"[PAD]"})
+        gpt2LMHeadModel.resize_token_embeddings(len(gpt2Tokenizer))
+        assert gpt2Tokenizer.pad_token == '[PAD]'
+    elif "GPT-2":
+        from transformers import GPT2Tokenizer, GPT2LMHeadModel
+        gpt2Tokenizer = GPT2Tokenizer.from_pretrained('gpt2-medium')
+        gpt2LMHeadModel = GPT2LMHeadModel.from_pretrained('gpt2-medium')
+        gpt2Tokenizer.pad_token = gpt2Tokenizer.eos_token
+    elif "Transformer-XL":
+        from transformers import TransfoXLTokenizer, TransfoXLLMHeadModel
+        gpt2Tokenizer = TransfoXLTokenizer.from_pretrained('transfo-xl-wt103')
+        gpt2LMHeadModel = TransfoXLLMHeadModel.from_pretrained('transfo-xl-wt103')
+        gpt2Tokenizer.pad_token = gpt2Tokenizer.eos_token
+    else:
+        raise NotImplementedError
+    return gpt2Tokenizer, gpt2LMHeadModel
 
 
 def get_losses_from_gpt_lm(this_sents: "list[str]", gpt2LMHeadModel, gpt2Tokenizer, DEVICE):
@@ -142,11 +148,15 @@ def load_pretrained(model, CHECKPOINT_PATH, optimizer=None, device='cuda'):
     
     return model
 
-def model_predictions(model, data, vocab, DEVICE, BATCH_SIZE=16, backoff="pass-through"):
+def model_predictions(model, data, vocab, DEVICE, BATCH_SIZE=16, backoff="pass-through", BUCKET_BY_LENGTH=False, SHORTLIST=None):
     """
     model: an instance of ElmoSCLSTM
     data: list of tuples, with each tuple consisting of correct and incorrect 
             sentence string (would be split at whitespaces)
+    BUCKET_BY_LENGTH: if True, sentences of similar lengths are batched together to reduce padding;
+            predictions are still returned in the order of data
+    SHORTLIST: optional callable, eg. a `shortlist.Shortlister`, that maps a batch of sentences to word shortlists;
+            if given, only the shortlisted output words are scored instead of the full output vocab
     """
     
     topk = 1
@@ -155,26 +165,29 @@ def model_predictions(model, data, vocab, DEVICE, BATCH_SIZE=16, backoff="pass-t
     final_sentences = []
     VALID_BATCH_SIZE = BATCH_SIZE
     # print("data size: {}".format(len(data)))
+    if BUCKET_BY_LENGTH:
+        order = get_bucketed_order(data)
+        data = [data[idx] for idx in order]
     data_iter = batch_iter(data, batch_size=VALID_BATCH_SIZE, shuffle=False)
     model.eval()
     model.to(DEVICE)
     for batch_id, (batch_clean_sentences,batch_corrupt_sentences) in enumerate(data_iter):
         # set batch data
-        batch_labels, batch_lengths = labelize(batch_clean_sentences, vocab)
-        batch_idxs, batch_lengths_ = sclstm_tokenize(batch_corrupt_sentences, vocab)
-        assert (batch_lengths_==batch_lengths).all()==True
+        batch_idxs, batch_lengths = sclstm_tokenize(batch_corrupt_sentences, vocab)
         batch_idxs = [batch_idxs_.to(DEVICE) for batch_idxs_ in batch_idxs]
         batch_lengths = batch_lengths.to(DEVICE)
-        batch_labels = batch_labels.to(DEVICE)
         batch_elmo_inp = elmo_batch_to_ids([line.split() for line in batch_corrupt_sentences]).to(DEVICE)
+        batch_shortlist = SHORTLIST(batch_corrupt_sentences, DEVICE) if SHORTLIST is not None else None
         # forward
         with torch.no_grad():
             """
             NEW: batch_predictions can now be of shape (batch_size,batch_max_seq_len,topk) if topk>1, else (batch_size,batch_max_seq_len)
             """
-            _, batch_predictions = model(batch_idxs, batch_lengths, batch_elmo_inp, targets=batch_labels, topk=topk)
+            _, batch_predictions = model(batch_idxs, batch_lengths, batch_elmo_inp, topk=topk, shortlist=batch_shortlist)
         batch_predictions = untokenize_without_unks(batch_predictions, batch_lengths, vocab, batch_clean_sentences, backoff=backoff)
         final_sentences.extend(batch_predictions)
+    if BUCKET_BY_LENGTH:
+        final_sentences = restore_order(final_sentences, order)
     # print("total inference time for this data is: {:4f} secs".format(time.time()-inference_st_time))
     return final_sentences
 
@@ -203,12 +216,9 @@ def model_predictions_for_ui(model, data, vocab, DEVICE, BATCH_SIZE=16, backoff=
     model.to(DEVICE)
     for batch_id, (batch_clean_sentences,batch_corrupt_sentences) in enumerate(data_iter):
         # set batch data
-        batch_labels, batch_lengths = labelize(batch_clean_sentences, vocab)
-        batch_idxs, batch_lengths_ = sclstm_tokenize(batch_corrupt_sentences, vocab)
-        assert (batch_lengths_==batch_lengths).all()==True
+        batch_idxs, batch_lengths = sclstm_tokenize(batch_corrupt_sentences, vocab)
         batch_idxs = [batch_idxs_.to(DEVICE) for batch_idxs_ in batch_idxs]
         batch_lengths = batch_lengths.to(DEVICE)
-        batch_labels = batch_labels.to(DEVICE)
         batch_elmo_inp = elmo_batch_to_ids([line.split() for line in batch_corrupt_sentences]).to(DEVICE)
         # forward
         try:
@@ -217,14 +227,14 @@ def model_predictions_for_ui(model, data, vocab, DEVICE, BATCH_SIZE=16, backoff=
                     """
                     NEW: batch_predictions can now be of shape (batch_size,batch_max_seq_len,topk) if topk>1, else (batch_size,batch_max_seq_len) if topk==1
                     """
-                    _, batch_predictions = model(batch_idxs, batch_lengths, batch_elmo_inp, targets=batch_labels, topk=topk) # topk=1 or 5
+                    _, batch_predictions = model(batch_idxs, batch_lengths, batch_elmo_inp, topk=topk) # topk=1 or 5
                 else:
                     """
                     NEW: batch_predictions can now be of shape (batch_size,batch_max_seq_len,topk) if topk==None
                     """
-                    _, batch_predictions, batch_predictions_probs = model(batch_idxs, batch_lengths, batch_elmo_inp, targets=batch_labels, topk=topk, beam_search=True)
+                    _, batch_predictions, batch_predictions_probs = model(batch_idxs, batch_lengths, batch_elmo_inp, topk=topk, beam_search=True)
         except RuntimeError:
-            print(f"batch_idxs:{len(batch_idxs)},batch_lengths:{batch_lengths.shape},batch_elmo_inp:{batch_elmo_inp.shape},batch_labels:{batch_labels.shape}")
+            print(f"batch_idxs:{len(batch_idxs)},batch_lengths:{batch_lengths.shape},batch_elmo_inp:{batch_elmo_inp.shape}")
             raise Exception("")
 
         # based on beam_search, do either greedy topk or beam search for topk
@@ -346,6 +356,7 @@ def model_inference(model, data, topk, DEVICE, BATCH_SIZE=16, beam_search=False,
 
             ##########################################################
             ############### this does reranking ######################
+            gpt2Tokenizer, gpt2LMHeadModel = load_reranker()
             gpt2LMHeadModel.to(DEVICE)
             gpt2LMHeadModel.eval()
             # txlLMHeadModel.to(DEVICE)
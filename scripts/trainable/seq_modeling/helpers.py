@@ -259,6 +259,61 @@ def batch_iter(data, batch_size, shuffle):
        
         yield (batch_labels,batch_sentences)
 
+def budget_batch_iter(data, batch_size, max_tokens=None, max_padded_tokens=None, key=None, stats=None):
+    """
+    each data item is a tuple of lables and text; data can be any iterable and is consumed lazily
+    yields batches in data order like `batch_iter(data, batch_size, shuffle=False)`, but a batch is
+    closed early if adding the next item exceeds `max_tokens` (sum of item lengths in the batch) or
+    `max_padded_tokens` (number of items times the longest item length); a batch always has at least
+    one item and `batch_size` can be None to bound batches only by the token budgets
+    by default, the length of an item is the number of whitespace separated tokens in its text
+    if a `stats` dict is passed, counts of batches, items, tokens and padded tokens are added to it
+    """
+    if key is None: key = lambda item: len(item[1].split())
+
+    def _make_batch(batch_items, ntokens, max_len):
+        if stats is not None:
+            for name, val in [("nbatches",1), ("nitems",len(batch_items)),
+                              ("ntokens",ntokens), ("npadded_tokens",len(batch_items)*max_len)]:
+                stats[name] = stats.get(name,0)+val
+        batch_labels = [item[0] for item in batch_items]
+        batch_sentences = [item[1] for item in batch_items]
+        return (batch_labels,batch_sentences)
+
+    batch_items, ntokens, max_len = [], 0, 0
+    for item in data:
+        len_ = key(item)
+        if batch_items and ( (batch_size is not None and len(batch_items)>=batch_size) or
+                             (max_tokens is not None and ntokens+len_>max_tokens) or
+                             (max_padded_tokens is not None and (len(batch_items)+1)*max(max_len,len_)>max_padded_tokens) ):
+            yield _make_batch(batch_items, ntokens, max_len)
+            batch_items, ntokens, max_len = [], 0, 0
+        batch_items.append(item)
+        ntokens += len_
+        max_len = max(max_len,len_)
+    if batch_items:
+        yield _make_batch(batch_items, ntokens, max_len)
+
+def get_bucketed_order(data, key=None):
+    """
+    returns indices of data items sorted by length, so that batching the data in this
+    order groups similar-length items and reduces padding in every batch
+    each data item is a tuple of lables and text; by default, the length of an item is
+    the number of whitespace separated tokens in its text
+    """
+    if key is None: key = lambda item: len(item[1].split())
+    # sorted() is stable, so items of equal length keep their relative input order
+    return sorted(range(len(data)), key=lambda idx: key(data[idx]))
+
+def restore_order(items, order):
+    """
+    inverse of re-ordering data with `get_bucketed_order`, where items[i] corresponds to data[order[i]]
+    """
+    assert len(items)==len(order), print(f"cannot restore order of {len(items)} items using {len(order)} indices")
+    restored_items = [None]*len(order)
+    for item, idx in zip(items,order): restored_items[idx] = item
+    return restored_items
+
 def labelize(batch_labels, vocab):
     token2idx, pad_token, unk_token = vocab["token2idx"], vocab["pad_token"], vocab["unk_token"]
     list_list = [[token2idx[token] if token in token2idx else token2idx[unk_token] for token in line.split()] for line in batch_labels]
@@ -273,10 +328,12 @@ def tokenize(batch_sentences, vocab):
     tensor_ = pad_sequence(list_tensors,batch_first=True,padding_value=token2idx[pad_token])
     return tensor_, torch.tensor([len(x) for x in list_list]).long()
 
-def char_tokenize(batch_sentences, vocab, return_nchars=False):
+def char_tokenize(batch_sentences, vocab, return_nchars=False, batched=False):
     """
     return (List[pad_sequence],Tensor[int]) if as_tensor=True
     return (List[List[int]],List[int],List[int]) if as_tensor=False
+    return (Tensor[int],Tensor[int]) if batched=True, with char idxs of dim [nsentences,max_nwords,max_nchars]
+        padded with the char_pad_token idx and nchars (if return_nchars) of dim [nsentences,max_nwords]
     """
     as_tensor = True
 
@@ -292,7 +349,22 @@ def char_tokenize(batch_sentences, vocab, return_nchars=False):
                                         for char in list(word)]+\
                                       [chartoken2idx[char_end_token]]
 
-    if as_tensor:
+    if batched:
+        char_idxs = [[func_word2charids(word) for word in sent.split()] for sent in batch_sentences]
+        char_padding_idx = chartoken2idx[char_pad_token]
+        # dim [nsentences]
+        nwords = torch.tensor([len(sentlevel) for sentlevel in char_idxs]).long()
+        # dim [total_nwords,max_nchars], scattered into [nsentences,max_nwords,max_nchars] in a single assignment
+        word_idxs = pad_sequence([torch.as_tensor(wordidxs).long() for sentlevel in char_idxs for wordidxs in sentlevel],
+                                 batch_first=True, padding_value=char_padding_idx)
+        word_mask = torch.arange(int(nwords.max()))[None,:] < nwords[:,None]
+        tokenized_output = torch.full((len(char_idxs),word_mask.size(1),word_idxs.size(1)), char_padding_idx,
+                                      dtype=torch.long)
+        tokenized_output[word_mask] = word_idxs
+        # dim [nsentences,max_nwords]
+        nchars = torch.zeros(word_mask.size(), dtype=torch.long)
+        nchars[word_mask] = torch.tensor([len(wordidxs) for sentlevel in char_idxs for wordidxs in sentlevel]).long()
+    elif as_tensor:
         # char_padding_idx = chartoken2idx[char_pad_token]
         # tokenized_output = [ pad_sequence(
         #                             [torch.as_tensor(func_word2charids(word)).long() for word in sent.split()],
@@ -325,28 +397,56 @@ def char_tokenize(batch_sentences, vocab, return_nchars=False):
     if not return_nchars: return tokenized_output, nwords
     else: return tokenized_output, nwords, nchars
 
-def sclstm_tokenize(batch_sentences, vocab):
+def _batch_sc_vectors(batch_sentences, vocab, extra_dims=0):
     """
-    return (List[pad_sequence],Tensor[int])
+    batched semi-character vectors; the vector of a word is the concatenation of a one-hot first char,
+    a bag of middle chars and a one-hot last char, each of size |chars| (unknown first and last chars
+    are mapped to the char unk token while unknown middle chars are dropped) followed by `extra_dims` zeros
+    returns List[Tensor] of shape [nwords,3*|chars|+extra_dims], one per sentence
     """
     chartoken2idx = vocab["chartoken2idx"]
     char_unk_token_idx =  vocab["chartoken2idx"][ vocab["char_unk_token"] ]
+    nchars = len(chartoken2idx)
+    dim = 3*nchars+extra_dims
+
+    batch_words = [sent.split() for sent in batch_sentences]
+    words = [word for sent_words in batch_words for word in sent_words]
+    nwords = len(words)
+
+    # map all chars of the batch to char indices at once (-1 for unknown chars)
+    codepoints = np.frombuffer("".join(words).encode("utf-32-le"), dtype=np.uint32)
+    unique_codepoints, inverse = np.unique(codepoints, return_inverse=True)
+    unique_char_idxs = np.array([chartoken2idx.get(chr(code),-1) for code in unique_codepoints], dtype=np.int64)
+    char_idxs = unique_char_idxs[inverse.reshape(-1)]
+
+    # first, middle and last chars of every word
+    word_lengths = np.array([len(word) for word in words], dtype=np.int64)
+    ends = np.cumsum(word_lengths)
+    starts = ends-word_lengths
+    word_ids = np.repeat(np.arange(nwords), word_lengths)
+    positions = np.arange(len(char_idxs))-starts[word_ids]
+    is_middle = (positions>0) & (positions<word_lengths[word_ids]-1) & (char_idxs>=0)
+    first_idxs = np.where(char_idxs[starts]>=0, char_idxs[starts], char_unk_token_idx)
+    last_idxs = np.where(char_idxs[ends-1]>=0, char_idxs[ends-1], char_unk_token_idx)
+    rows = np.concatenate([np.arange(nwords), word_ids[is_middle], np.arange(nwords)])
+    cols = np.concatenate([first_idxs, nchars+char_idxs[is_middle], 2*nchars+last_idxs])
+
+    # counts with a single scatter-add into a preallocated tensor
+    tensor_ = torch.zeros(nwords*dim)
+    tensor_.scatter_add_(0, torch.from_numpy(rows*dim+cols), torch.ones(len(rows)))
+    tensor_ = tensor_.view(nwords,dim)
+
+    # sentences without words are (as before) empty 1-d tensors
+    sent_nwords = [len(sent_words) for sent_words in batch_words]
+    return [ sent_tensor if len_>0 else torch.tensor([]).float()
+             for sent_tensor, len_ in zip(torch.split(tensor_,sent_nwords), sent_nwords) ]
 
-    def sc_vector(word):
-        a = [0]*len(chartoken2idx)
-        if word[0] in chartoken2idx: a[ chartoken2idx[word[0]] ] = 1
-        else: a[ char_unk_token_idx ] = 1
-        b = [0]*len(chartoken2idx)
-        for char in word[1:-1]: 
-            if char in chartoken2idx: b[ chartoken2idx[char] ] += 1
-            #else: b[ char_unk_token_idx ] = 1
-        c = [0]*len(chartoken2idx)
-        if word[-1] in chartoken2idx: c[ chartoken2idx[word[-1]] ] = 1
-        else: c[ char_unk_token_idx ] = 1
-        return a+b+c
-
+def sclstm_tokenize(batch_sentences, vocab):
+    """
+    return (List[pad_sequence],Tensor[int])
+    """
     # return list of tesnors and we don't need to pad these unlike cnn-lstm case!
-    tensor_output =  [ torch.tensor([sc_vector(word) for word in sent.split()]).float() for sent in batch_sentences]
+    tensor_output = _batch_sc_vectors(batch_sentences, vocab)
     nwords = torch.tensor([len(sentlevel) for sentlevel in tensor_output]).long()
     return tensor_output, nwords
 
@@ -354,26 +454,9 @@ def sctrans_tokenize(batch_sentences, vocab):
     """
     return (List[pad_sequence],Tensor[int],Tensor[int])
     """
-    chartoken2idx = vocab["chartoken2idx"]
-    char_unk_token_idx =  vocab["chartoken2idx"][ vocab["char_unk_token"] ]
-
-    def sc_vector(word):
-        a = [0]*len(chartoken2idx)
-        if word[0] in chartoken2idx: a[ chartoken2idx[word[0]] ] = 1
-        else: a[ char_unk_token_idx ] = 1
-        b = [0]*len(chartoken2idx)
-        for char in word[1:-1]: 
-            if char in chartoken2idx: b[ chartoken2idx[char] ] += 1
-            #else: b[ char_unk_token_idx ] = 1
-        c = [0]*len(chartoken2idx)
-        if word[-1] in chartoken2idx: c[ chartoken2idx[word[-1]] ] = 1
-        else: c[ char_unk_token_idx ] = 1
-        return a+b+c
-
     # return list of tensors and we don't need to pad these unlike cnn-lstm case!
-    # tensor_output =  [ torch.tensor([sc_vector(word) for word in sent.split()]).float() for sent in batch_sentences]
     # ------NEW---- Added +[0,0]
-    tensor_output =  [ torch.tensor([sc_vector(word)+[0,0] for word in sent.split()]).float() for sent in batch_sentences]
+    tensor_output = _batch_sc_vectors(batch_sentences, vocab, extra_dims=2)
     nwords = torch.tensor([len(sentlevel) for sentlevel in tensor_output]).long()
     inverted_mask = pad_sequence([torch.zeros(len_) for len_ in nwords],batch_first=True,padding_value=1).bool()
     return tensor_output, nwords, inverted_mask
@@ -571,12 +654,39 @@ def save_vocab_dict(path_: str, vocab_: dict):
 
 import numpy as np
 import transformers
+from functools import lru_cache
 # import torch
 # from torch.nn.utils.rnn import pad_sequence
-BERT_TOKENIZER = transformers.BertTokenizer.from_pretrained('bert-base-cased')
-BERT_TOKENIZER.do_basic_tokenize = True
-BERT_TOKENIZER.tokenize_chinese_chars = False
 BERT_MAX_SEQ_LEN = 512
+# the tokenizers are built on first use rather than at import time, see get_bert_tokenizer and get_bert_tokenizer_fast
+# both are built with the same (default) settings; in particular cjk chars are split into words of their own, as the
+#   pretrained checkpoints were trained with (setting tokenize_chinese_chars after init, as was done before, has no
+#   effect on the slow tokenizer)
+@lru_cache(maxsize=None)
+def get_bert_tokenizer():
+    return transformers.BertTokenizer.from_pretrained('bert-base-cased')
+@lru_cache(maxsize=None)
+def get_bert_tokenizer_fast():
+    # rust-backed tokenizer with the same vocab and settings, used for the single-pass bert_tokenize_for_valid_examples
+    #   returns None if it cannot be loaded, in which case the slow path is used
+    try:
+        return transformers.BertTokenizerFast.from_pretrained('bert-base-cased')
+    except (AttributeError, ImportError, OSError, ValueError):
+        return None
+
+def bert_subword_length_key(data):
+    """
+    a `key` for budget_batch_iter and get_bucketed_order that measures a data item by the number of bert sub-tokens
+        of its text ([CLS] and [SEP] included, capped at BERT_MAX_SEQ_LEN), so that token budgets bound the bert inputs
+    """
+    sentences = [*{item[1]:None for item in data}]
+    if get_bert_tokenizer_fast() is not None and len(sentences)>0:
+        input_ids = get_bert_tokenizer_fast()(sentences, truncation=True, max_length=BERT_MAX_SEQ_LEN)["input_ids"]
+        lengths = [len(ids) for ids in input_ids]
+    else:
+        lengths = [min(len(get_bert_tokenizer().tokenize(text)),BERT_MAX_SEQ_LEN-2)+2 for text in sentences]
+    subword_lengths = dict(zip(sentences,lengths))
+    return lambda item: subword_lengths[item[1]]
 
 def merge_subtokens(tokens: "list"):
     merged_tokens = []
@@ -587,7 +697,7 @@ def merge_subtokens(tokens: "list"):
     return text
 
 def _custom_bert_tokenize_sentence(text):
-    tokens = BERT_TOKENIZER.tokenize(text)
+    tokens = get_bert_tokenizer().tokenize(text)
     tokens = tokens[:BERT_MAX_SEQ_LEN-2] # 2 allowed for [CLS] and [SEP]
     idxs = np.array([idx for idx,token in enumerate(tokens) if not token.startswith("##")]+[len(tokens)])
     split_sizes = (idxs[1:]-idxs[0:-1]).tolist()
@@ -603,8 +713,24 @@ def _custom_bert_tokenize_sentences(list_of_texts):
     texts, tokens, split_sizes = list(zip(*out))
     return [*texts], [*tokens], [*split_sizes]
 
+def _subword_word_map(batch_splits, max_nsubwords):
+    """
+    returns a [BS,max_nsubwords] LongTensor with, for each sub-token position of the bert inputs, the index of the word
+    it belongs to in its sentence, and -1 for the [CLS], [SEP] and padding positions
+    """
+    # dim [total_nwords]
+    nsubwords = torch.tensor([n for seq_splits in batch_splits for n in seq_splits], dtype=torch.long)
+    # dim [total_nsubwords], word idxs within their sentence as in `torch.split(..., seq_splits)`
+    word_idxs = torch.repeat_interleave(torch.cat([torch.arange(len(seq_splits)) for seq_splits in batch_splits]),
+                                        nsubwords)
+    positions = torch.arange(max_nsubwords)[None,:]
+    lengths = torch.tensor([sum(seq_splits) for seq_splits in batch_splits], dtype=torch.long)[:,None]
+    subword_word_map = torch.full((len(batch_splits),max_nsubwords), -1, dtype=torch.long)
+    subword_word_map[(positions>=1) & (positions<=lengths)] = word_idxs # 1 for [CLS]
+    return subword_word_map
+
 _simple_bert_tokenize_sentences = \
-    lambda list_of_texts: [merge_subtokens( BERT_TOKENIZER.tokenize(text)[:BERT_MAX_SEQ_LEN-2] ) for text in list_of_texts]
+    lambda list_of_texts: [merge_subtokens( get_bert_tokenizer().tokenize(text)[:BERT_MAX_SEQ_LEN-2] ) for text in list_of_texts]
 
 def bert_tokenize(batch_sentences):
     """
@@ -616,12 +742,14 @@ def bert_tokenize(batch_sentences):
             2d tensors of shape (bs,max_len)
         batch_splits: List[List[Int]]
             specifies #sub-tokens for each word in each textual string after sub-word tokenization
+        the returned dict also has a "subword_word_map" 2d tensor of shape (bs,max_len), mapping each sub-token position
+            to its word idx (or -1), used to pool the sub-token encodings of the whole batch at once
     """
     batch_sentences, batch_tokens, batch_splits = _custom_bert_tokenize_sentences(batch_sentences)
     
     # max_seq_len = max([len(tokens) for tokens in batch_tokens])
-    # batch_encoded_dicts = [BERT_TOKENIZER.encode_plus(tokens,max_length=max_seq_len,pad_to_max_length=True) for tokens in batch_tokens]
-    batch_encoded_dicts = [BERT_TOKENIZER.encode_plus(tokens) for tokens in batch_tokens]
+    # batch_encoded_dicts = [get_bert_tokenizer().encode_plus(tokens,max_length=max_seq_len,pad_to_max_length=True) for tokens in batch_tokens]
+    batch_encoded_dicts = [get_bert_tokenizer().encode_plus(tokens) for tokens in batch_tokens]
 
     batch_attention_masks = pad_sequence([torch.tensor(encoded_dict["attention_mask"]) for encoded_dict in batch_encoded_dicts],batch_first=True,padding_value=0)
     batch_input_ids = pad_sequence([torch.tensor(encoded_dict["input_ids"]) for encoded_dict in batch_encoded_dicts],batch_first=True,padding_value=0)
@@ -629,7 +757,8 @@ def bert_tokenize(batch_sentences):
 
     batch_bert_dict = {"attention_mask":batch_attention_masks,
                        "input_ids":batch_input_ids,
-                       "token_type_ids":batch_token_type_ids}
+                       "token_type_ids":batch_token_type_ids,
+                       "subword_word_map":_subword_word_map(batch_splits, batch_input_ids.size(1))}
 
     # if len(batch_chunks)>0:
     #     assert sum(batch_chunks)==len(batch_text_pairs)
@@ -660,25 +789,78 @@ def bert_tokenize_for_valid_examples(batch_orginal_sentences, batch_noisy_senten
             2d tensors of shape (bs,max_len)
         batch_splits: List[List[Int]]
             specifies #sub-tokens for each word in each textual string after sub-word tokenization
+        the returned dict also has a "subword_word_map" 2d tensor of shape (bs,max_len), see `bert_tokenize`
     """
-    _batch_orginal_sentences = _simple_bert_tokenize_sentences(batch_orginal_sentences)
+    if get_bert_tokenizer_fast() is not None:
+        return _fast_bert_tokenize_for_valid_examples(batch_orginal_sentences, batch_noisy_sentences)
+    return _slow_bert_tokenize_for_valid_examples(batch_orginal_sentences, batch_noisy_sentences)
+
+def _slow_bert_tokenize_for_valid_examples(batch_orginal_sentences, batch_noisy_sentences):
     _batch_noisy_sentences, _batch_tokens, _batch_splits = _custom_bert_tokenize_sentences(batch_noisy_sentences)
+    # correctors pass the same sentences as both inputs, which then need not be tokenized twice
+    if batch_orginal_sentences is batch_noisy_sentences or batch_orginal_sentences==batch_noisy_sentences:
+        _batch_orginal_sentences = _batch_noisy_sentences
+    else:
+        _batch_orginal_sentences = _simple_bert_tokenize_sentences(batch_orginal_sentences)
     
     valid_idxs = [idx for idx,(a,b) in enumerate(zip(_batch_orginal_sentences, _batch_noisy_sentences)) if len(a.split())==len(b.split())]
-    batch_orginal_sentences = [line for idx,line in enumerate(_batch_orginal_sentences) if idx in valid_idxs]
-    batch_noisy_sentences = [line for idx,line in enumerate(_batch_noisy_sentences) if idx in valid_idxs]
-    batch_tokens = [line for idx,line in enumerate(_batch_tokens) if idx in valid_idxs]
-    batch_splits = [line for idx,line in enumerate(_batch_splits) if idx in valid_idxs]
+    batch_orginal_sentences = [_batch_orginal_sentences[idx] for idx in valid_idxs]
+    batch_noisy_sentences = [_batch_noisy_sentences[idx] for idx in valid_idxs]
+    batch_tokens = [_batch_tokens[idx] for idx in valid_idxs]
+    batch_splits = [_batch_splits[idx] for idx in valid_idxs]
     
-    batch_bert_dict = {"attention_mask":[],"input_ids":[],"token_type_ids":[]}
+    batch_bert_dict = {"attention_mask":[],"input_ids":[],"token_type_ids":[],"subword_word_map":[]}
     if len(valid_idxs)>0:
-        batch_encoded_dicts = [BERT_TOKENIZER.encode_plus(tokens) for tokens in batch_tokens]
+        batch_encoded_dicts = [get_bert_tokenizer().encode_plus(tokens) for tokens in batch_tokens]
         batch_attention_masks = pad_sequence([torch.tensor(encoded_dict["attention_mask"]) for encoded_dict in batch_encoded_dicts],batch_first=True,padding_value=0)
         batch_input_ids = pad_sequence([torch.tensor(encoded_dict["input_ids"]) for encoded_dict in batch_encoded_dicts],batch_first=True,padding_value=0)
         batch_token_type_ids = pad_sequence([torch.tensor(encoded_dict["token_type_ids"]) for encoded_dict in batch_encoded_dicts],batch_first=True,padding_value=0)
         batch_bert_dict = {"attention_mask":batch_attention_masks, 
                            "input_ids":batch_input_ids,
-                           "token_type_ids":batch_token_type_ids}
+                           "token_type_ids":batch_token_type_ids,
+                           "subword_word_map":_subword_word_map(batch_splits, batch_input_ids.size(1))}
+
+    return batch_orginal_sentences, batch_noisy_sentences, batch_bert_dict, batch_splits
+
+def _fast_bert_split_sizes(tokens):
+    idxs = np.array([idx for idx,token in enumerate(tokens) if not token.startswith("##")]+[len(tokens)])
+    return (idxs[1:]-idxs[0:-1]).tolist()
+
+def _fast_bert_tokenize_for_valid_examples(batch_orginal_sentences, batch_noisy_sentences):
+    """
+    same outputs as bert_tokenize_for_valid_examples, but with a single batched get_bert_tokenizer_fast() call
+        that gives the bert inputs directly, instead of tokenizing and encoding each sentence separately
+    """
+    # [CLS] and [SEP] are included in BERT_MAX_SEQ_LEN, as in _custom_bert_tokenize_sentence
+    bert_tokenizer_fast = get_bert_tokenizer_fast()
+    encoded = bert_tokenizer_fast(batch_noisy_sentences, truncation=True, max_length=BERT_MAX_SEQ_LEN, padding=True,
+                                  return_tensors="pt")
+    lengths = encoded["attention_mask"].sum(dim=1).tolist()
+    _batch_tokens = [bert_tokenizer_fast.convert_ids_to_tokens(input_ids[1:length-1])
+                     for input_ids,length in zip(encoded["input_ids"].tolist(),lengths)]
+    _batch_noisy_sentences = [merge_subtokens(tokens) for tokens in _batch_tokens]
+    # correctors pass the same sentences as both inputs, which then need not be tokenized twice
+    if batch_orginal_sentences is batch_noisy_sentences or batch_orginal_sentences==batch_noisy_sentences:
+        _batch_orginal_sentences = _batch_noisy_sentences
+    else:
+        _batch_orginal_sentences = [
+            merge_subtokens(bert_tokenizer_fast.convert_ids_to_tokens(input_ids[1:-1]))
+            for input_ids in bert_tokenizer_fast(batch_orginal_sentences, truncation=True,
+                                                 max_length=BERT_MAX_SEQ_LEN)["input_ids"]]
+
+    valid_idxs = [idx for idx,(a,b) in enumerate(zip(_batch_orginal_sentences, _batch_noisy_sentences)) if len(a.split())==len(b.split())]
+    batch_orginal_sentences = [_batch_orginal_sentences[idx] for idx in valid_idxs]
+    batch_noisy_sentences = [_batch_noisy_sentences[idx] for idx in valid_idxs]
+    batch_splits = [_fast_bert_split_sizes(_batch_tokens[idx]) for idx in valid_idxs]
+
+    batch_bert_dict = {"attention_mask":[],"input_ids":[],"token_type_ids":[],"subword_word_map":[]}
+    if len(valid_idxs)>0:
+        # drop the invalid rows, and the padding that only they needed
+        max_len = max([lengths[idx] for idx in valid_idxs])
+        valid_idxs_ = torch.tensor(valid_idxs, dtype=torch.long)
+        batch_bert_dict = {key:encoded[key][valid_idxs_,:max_len]
+                           for key in ["attention_mask","input_ids","token_type_ids"]}
+        batch_bert_dict["subword_word_map"] = _subword_word_map(batch_splits, max_len)
 
     return batch_orginal_sentences, batch_noisy_sentences, batch_bert_dict, batch_splits
   
@@ -19,6 +19,88 @@ import torch.nn.functional as F
 import transformers
 
 
+#################################################
+# shortlisted decoding
+#################################################
+
+def shortlist_predictions(dense, encodings, candidate_idxs, candidate_mask, shared_idxs=None, topk=1):
+    """
+    scores `encodings` only against a shortlist of output indices instead of the full output vocab
+    dense: the output nn.Linear of a word-level model
+    encodings: [BS,max_nwords,*], the inputs to `dense`
+    candidate_idxs, candidate_mask: [BS,max_nwords,K], per-word shortlist and its validity (bool) mask
+    shared_idxs: optional [F] shortlist common to all words (eg. frequent words); must not overlap `candidate_idxs`
+    returns indices into the output vocab, of shape [BS,max_nwords] if topk==1 else [BS,max_nwords,topk]
+    """
+    weight, bias = dense.weight, dense.bias
+    # [BS,max_nwords,K,*] x [BS,max_nwords,*] -> [BS,max_nwords,K]
+    scores = torch.einsum("bnkd,bnd->bnk", weight[candidate_idxs], encodings) + bias[candidate_idxs]
+    scores = scores.masked_fill(~candidate_mask, float("-inf"))
+    if shared_idxs is not None:
+        # a single matmul for the shortlist shared by all words
+        shared_scores = F.linear(encodings, weight[shared_idxs], bias[shared_idxs])  # [BS,max_nwords,F]
+        scores = torch.cat((scores,shared_scores), dim=-1)
+        candidate_idxs = torch.cat((candidate_idxs,shared_idxs.expand(*candidate_idxs.shape[:2],-1)), dim=-1)
+    if topk>1:
+        _, topk_inds = torch.topk(scores, topk, dim=-1, largest=True, sorted=True)
+        return torch.gather(candidate_idxs, -1, topk_inds)
+    elif topk==1:
+        topk_inds = torch.argmax(scores, dim=-1, keepdim=True)
+        return torch.gather(candidate_idxs, -1, topk_inds).squeeze(-1)
+    raise Exception("topk can be one of a value>=1")
+
+
+#################################################
+# batched char encodings
+#################################################
+
+def batched_char_encodings(char_encoder, batch_idxs, batch_lengths, padding_idx, batch_char_lengths=None):
+    """
+    encodes all words of a [BS,max_nwords,max_nchars] tensor of char idxs (see `char_tokenize(..., batched=True)`)
+    with a single `char_encoder(word_idxs, word_nchars, word_padded_nchars)` call, where word_padded_nchars is the
+    number of chars each word would have been padded to in a per-sentence `pad_sequence` of its sentence
+    returns [BS,max_nwords,*] encodings with zeros for the padded words, as `pad_sequence` of per-sentence encodings
+    """
+    device = batch_idxs.device
+    word_mask = torch.arange(batch_idxs.size(1), device=device)[None,:] < batch_lengths.to(device)[:,None]
+    if batch_char_lengths is None:
+        batch_char_lengths = (batch_idxs!=padding_idx).sum(dim=2)
+    batch_char_lengths = batch_char_lengths.to(device)
+    batch_padded_char_lengths, _ = torch.max(batch_char_lengths, dim=1, keepdim=True)
+    batch_padded_char_lengths = batch_padded_char_lengths.expand_as(batch_char_lengths)
+
+    word_encodings = char_encoder(batch_idxs[word_mask], batch_char_lengths[word_mask],
+                                  batch_padded_char_lengths[word_mask])
+    batch_encodings = word_encodings.new_zeros(batch_idxs.size(0), batch_idxs.size(1), word_encodings.size(-1))
+    batch_encodings[word_mask] = word_encodings
+    return batch_encodings
+
+
+#################################################
+# batched subword pooling
+#################################################
+
+def merge_subword_encodings(bert_encodings, subword_word_map, mode='avg'):
+    """
+    pools [BS,max_nsubwords,D] bert encodings into [BS,max_nwords,D] word encodings for the whole batch at once,
+    given the [BS,max_nsubwords] subword_word_map of word idxs (or -1) built at tokenization time by helpers.py;
+    words are averaged (mode='avg') or summed (mode='add') over their sub-tokens and padded words are zeros
+    """
+    batch_size = bert_encodings.size(0)
+    max_nwords = int(subword_word_map.max())+1
+    # flat word idxs, with [CLS], [SEP] and padding positions sent to an extra discarded row
+    sentence_offsets = max_nwords*torch.arange(batch_size, device=subword_word_map.device)[:,None]
+    segment_idxs = torch.where(subword_word_map>=0, subword_word_map+sentence_offsets, batch_size*max_nwords).view(-1)
+    out = bert_encodings.new_zeros(batch_size*max_nwords+1, bert_encodings.size(-1))
+    out = out.index_add(0, segment_idxs, bert_encodings.reshape(-1, bert_encodings.size(-1)))[:-1]
+    if mode=='avg':
+        counts = torch.bincount(segment_idxs, minlength=batch_size*max_nwords+1)[:-1]
+        out = out/counts.clamp(min=1).unsqueeze(1).to(out.dtype)
+    elif mode!="add":
+        raise Exception("Not Implemented")
+    return out.view(batch_size, max_nwords, -1)
+
+
 #################################################
 # CharCNNWordLSTMModel(CharCNNModel)
 #################################################
@@ -42,7 +124,7 @@ class CharCNNModel(nn.Module):
                 )
             )
         # each conv outputs [BS, nfilters, MAXSEQ, 1]
-    def forward(self, batch_tensor):
+    def forward(self, batch_tensor, padded_lengths=None):
 
         batch_size = len(batch_tensor)
 
@@ -55,6 +137,14 @@ class CharCNNModel(nn.Module):
         # [BS, 1, max_seq_len, emb_dim]->[BS, out_channels, max_seq_len, 1]->[BS, out_channels, max_seq_len]
         conv_outputs = [conv(embs_unsqueezed).squeeze(3) for conv in self.convmodule]
 
+        # if given, drop the conv positions that would not exist had each row been padded only up to padded_lengths;
+        # outputs are non-negative after relu, so zeroing them does not change the maxpool below
+        if padded_lengths is not None:
+            padded_lengths = padded_lengths.to(batch_tensor.device)
+            conv_outputs = [out.masked_fill(
+                (torch.arange(out.size(2), device=out.device)[None,:] >=
+                 (padded_lengths+out.size(2)-batch_tensor.size(1))[:,None]).unsqueeze(1), 0) for out in conv_outputs]
+
         # [BS, out_channels, max_seq_len]->[BS, out_channels]
         maxpool_conv_outputs = [F.max_pool1d(out, out.size(2)).squeeze(2) for out in conv_outputs]
 
@@ -90,17 +180,24 @@ class CharCNNWordLSTMModel(nn.Module):
         # See https://pytorch.org/docs/stable/nn.html#crossentropyloss
         self.criterion = nn.CrossEntropyLoss(reduction='mean',ignore_index=padding_idx)
     def forward(self, 
-                batch_idxs: "list[pad_sequence]", 
+                batch_idxs: "list[pad_sequence] or tensor", 
                 batch_lengths: "tensor",
                 aux_word_embs: "tensor" = None,
                 targets: "tensor" = None,
-                topk = 1):
+                topk = 1,
+                shortlist: "tuple" = None):
 
         batch_size = len(batch_idxs)
 
         # cnn
-        cnn_encodings = [self.cnnmodule(pad_sequence_) for pad_sequence_ in batch_idxs]
-        cnn_encodings = pad_sequence(cnn_encodings,batch_first=True,padding_value=0)
+        if torch.is_tensor(batch_idxs):
+            # a single [BS,max_nwords,max_nchars] tensor; all words of the batch are encoded at once
+            cnn_encodings = batched_char_encodings(
+                lambda word_idxs, word_nchars, word_padded_nchars: self.cnnmodule(word_idxs, word_padded_nchars),
+                batch_idxs, batch_lengths, self.cnnmodule.embeddings.padding_idx)
+        else:
+            cnn_encodings = [self.cnnmodule(pad_sequence_) for pad_sequence_ in batch_idxs]
+            cnn_encodings = pad_sequence(cnn_encodings,batch_first=True,padding_value=0)
 
         # concat aux_embs
         # if not None, the expected dim for aux_word_embs: [BS,max_nwords,*]
@@ -115,6 +212,13 @@ class CharCNNWordLSTMModel(nn.Module):
         lstm_encodings, (last_hidden_states, last_cell_states) = self.lstmmodule(intermediate_encodings)
         lstm_encodings, _ = pad_packed_sequence(lstm_encodings, batch_first=True, padding_value=0)
 
+        # shortlisted decoding; scores only a few candidates per word instead of the full output vocab
+        # see `shortlist_predictions` for the expected (candidate_idxs, candidate_mask, shared_idxs) tuple
+        if shortlist is not None:
+            assert not self.training and targets is None
+            topk_inds = shortlist_predictions(self.dense, lstm_encodings, *shortlist, topk=topk)
+            return None, topk_inds.cpu().detach().numpy()
+
         # dense
         # [BS,max_nwords,self.lstmmodule_outdim]->[BS,max_nwords,output_dim]
         logits = self.dense(self.dropout(lstm_encodings))
@@ -127,18 +231,19 @@ class CharCNNWordLSTMModel(nn.Module):
         
         # eval preds
         if not self.training:
-            probs = F.softmax(logits,dim=-1)            # [BS,max_nwords,output_dim]
+            # softmax is monotonic, so the predictions are obtained from the logits directly
             if topk>1:
                 topk_values, topk_inds = \
-                    torch.topk(probs, topk, dim=-1, largest=True, sorted=True)  # -> (Tensor, LongTensor) of [BS,max_nwords,topk]
+                    torch.topk(logits, topk, dim=-1, largest=True, sorted=True)  # -> (Tensor, LongTensor) of [BS,max_nwords,topk]
             elif topk==1:
-                topk_inds = torch.argmax(probs,dim=-1)   # [BS,max_nwords]
+                topk_inds = torch.argmax(logits,dim=-1)   # [BS,max_nwords]
 
             # Note that for those positions with padded_idx,
             #   the arg_max_prob above computes a index because 
             #   the bias term leads to non-uniform values in those positions
 
-            return loss.cpu().detach().numpy(), topk_inds.cpu().detach().numpy()
+            loss = loss.cpu().detach().numpy() if targets is not None else None
+            return loss, topk_inds.cpu().detach().numpy()
         return loss
 
 
@@ -166,7 +271,7 @@ class CharLSTMModel(nn.Module):
         assert output_combination in ["end","max","mean"], print('invalid output_combination; required one of {"end","max","mean"}')
         self.output_combination = output_combination
 
-    def forward(self, batch_tensor, batch_lengths):
+    def forward(self, batch_tensor, batch_lengths, padded_lengths=None):
 
         batch_size = len(batch_tensor)
         # print("************ stage 2")
@@ -185,6 +290,11 @@ class CharLSTMModel(nn.Module):
             last_seq_idxs = torch.LongTensor([x-1 for x in batch_lengths])
             source_encodings = lstm_encodings[range(lstm_encodings.shape[0]), last_seq_idxs, :]
         elif self.output_combination=="max":
+            # if given, drop the positions that would not exist had each row been padded only up to padded_lengths
+            if padded_lengths is not None:
+                positions = torch.arange(lstm_encodings.size(1), device=lstm_encodings.device)
+                lstm_encodings = lstm_encodings.masked_fill(
+                    (positions[None,:]>=padded_lengths.to(lstm_encodings.device)[:,None]).unsqueeze(2), float("-inf"))
             source_encodings, _ = torch.max(lstm_encodings, dim=1)
         elif self.output_combination=="mean":
             sum_ = torch.sum(lstm_encodings, dim=1)
@@ -224,8 +334,8 @@ class CharLSTMWordLSTMModel(nn.Module):
         # See https://pytorch.org/docs/stable/nn.html#crossentropyloss
         self.criterion = nn.CrossEntropyLoss(reduction='mean',ignore_index=padding_idx)
     def forward(self, 
-                batch_idxs: "list[pad_sequence]",
-                batch_char_lengths: "list[tensor]",
+                batch_idxs: "list[pad_sequence] or tensor",
+                batch_char_lengths: "list[tensor] or tensor",
                 batch_lengths: "tensor",
                 aux_word_embs: "tensor" = None,
                 targets: "tensor" = None,
@@ -235,8 +345,15 @@ class CharLSTMWordLSTMModel(nn.Module):
         # print("************ stage 1")
 
         # charlstm
-        charlstm_encodings = [self.charlstmmodule(pad_sequence_,lens) for pad_sequence_,lens in zip(batch_idxs,batch_char_lengths)]
-        charlstm_encodings = pad_sequence(charlstm_encodings,batch_first=True,padding_value=0)
+        if torch.is_tensor(batch_idxs):
+            # a single [BS,max_nwords,max_nchars] tensor; all words of the batch are encoded at once
+            charlstm_encodings = batched_char_encodings(
+                lambda word_idxs, word_nchars, word_padded_nchars:
+                    self.charlstmmodule(word_idxs, word_nchars.cpu(), word_padded_nchars),
+                batch_idxs, batch_lengths, self.charlstmmodule.embeddings.padding_idx, batch_char_lengths)
+        else:
+            charlstm_encodings = [self.charlstmmodule(pad_sequence_,lens) for pad_sequence_,lens in zip(batch_idxs,batch_char_lengths)]
+            charlstm_encodings = pad_sequence(charlstm_encodings,batch_first=True,padding_value=0)
 
         # concat aux_embs
         # if not None, the expected dim for aux_word_embs: [BS,max_nwords,*]
@@ -263,18 +380,19 @@ class CharLSTMWordLSTMModel(nn.Module):
         
         # eval preds
         if not self.training:
-            probs = F.softmax(logits,dim=-1)            # [BS,max_nwords,output_dim]
+            # softmax is monotonic, so the predictions are obtained from the logits directly
             if topk>1:
                 topk_values, topk_inds = \
-                    torch.topk(probs, topk, dim=-1, largest=True, sorted=True)  # -> (Tensor, LongTensor) of [BS,max_nwords,topk]
+                    torch.topk(logits, topk, dim=-1, largest=True, sorted=True)  # -> (Tensor, LongTensor) of [BS,max_nwords,topk]
             elif topk==1:
-                topk_inds = torch.argmax(probs,dim=-1)   # [BS,max_nwords]
+                topk_inds = torch.argmax(logits,dim=-1)   # [BS,max_nwords]
 
             # Note that for those positions with padded_idx,
             #   the arg_max_prob above computes a index because 
             #   the bias term leads to non-uniform values in those positions
 
-            return loss.cpu().detach().numpy(), topk_inds.cpu().detach().numpy()
+            loss = loss.cpu().detach().numpy() if targets is not None else None
+            return loss, topk_inds.cpu().detach().numpy()
         return loss
 
 
@@ -308,7 +426,8 @@ class SCLSTM(nn.Module):
                 batch_lengths: "tensor",
                 aux_word_embs: "tensor" = None,
                 targets: "tensor" = None,
-                topk = 1):
+                topk = 1,
+                shortlist: "tuple" = None):
 
         # cnn
         batch_size = len(batch_screps)
@@ -327,6 +446,13 @@ class SCLSTM(nn.Module):
         lstm_encodings, (last_hidden_states, last_cell_states) = self.lstmmodule(intermediate_encodings)
         lstm_encodings, _ = pad_packed_sequence(lstm_encodings, batch_first=True, padding_value=0)
 
+        # shortlisted decoding; scores only a few candidates per word instead of the full output vocab
+        # see `shortlist_predictions` for the expected (candidate_idxs, candidate_mask, shared_idxs) tuple
+        if shortlist is not None:
+            assert not self.training and targets is None
+            topk_inds = shortlist_predictions(self.dense, lstm_encodings, *shortlist, topk=topk)
+            return None, topk_inds.cpu().detach().numpy()
+
         # dense
         # [BS,max_nwords,self.lstmmodule_outdim]->[BS,max_nwords,output_dim]
         logits = self.dense(self.dropout(lstm_encodings))
@@ -339,18 +465,19 @@ class SCLSTM(nn.Module):
         
         # eval preds
         if not self.training:
-            probs = F.softmax(logits,dim=-1)            # [BS,max_nwords,output_dim]
+            # softmax is monotonic, so the predictions are obtained from the logits directly
             if topk>1:
                 topk_values, topk_inds = \
-                    torch.topk(probs, topk, dim=-1, largest=True, sorted=True)  # -> (Tensor, LongTensor) of [BS,max_nwords,topk]
+                    torch.topk(logits, topk, dim=-1, largest=True, sorted=True)  # -> (Tensor, LongTensor) of [BS,max_nwords,topk]
             elif topk==1:
-                topk_inds = torch.argmax(probs,dim=-1)   # [BS,max_nwords]
+                topk_inds = torch.argmax(logits,dim=-1)   # [BS,max_nwords]
 
             # Note that for those positions with padded_idx,
             #   the arg_max_prob above computes a index because 
             #   the bias term leads to non-uniform values in those positions
             
-            return loss.cpu().detach().numpy(), topk_inds.cpu().detach().numpy()
+            loss = loss.cpu().detach().numpy() if targets is not None else None
+            return loss, topk_inds.cpu().detach().numpy()
         return loss
 
 
@@ -405,7 +532,8 @@ class ElmoSCLSTM(nn.Module):
                 aux_word_embs: "tensor" = None,
                 targets: "tensor" = None,
                 topk = 1,
-                beam_search = False):
+                beam_search = False,
+                shortlist: "tuple" = None):
         
         if aux_word_embs is not None:
             raise Exception("dimensions of aux_word_embs not used in __init__()")
@@ -453,6 +581,13 @@ class ElmoSCLSTM(nn.Module):
             # out
             final_encodings = torch.cat((lstm_encodings,elmo_encodings), dim=2)
 
+        # shortlisted decoding; scores only a few candidates per word instead of the full output vocab
+        # see `shortlist_predictions` for the expected (candidate_idxs, candidate_mask, shared_idxs) tuple
+        if shortlist is not None:
+            assert not self.training and targets is None
+            topk_inds = shortlist_predictions(self.dense, final_encodings, *shortlist, topk=topk)
+            return None, topk_inds.cpu().detach().numpy()
+
         # dense
         # [BS,max_nwords,self.encodings_outdim]->[BS,max_nwords,output_dim]
         logits = self.dense(self.dropout(final_encodings))
@@ -465,14 +600,14 @@ class ElmoSCLSTM(nn.Module):
         
         # eval preds
         if not self.training:
-            probs = F.softmax(logits,dim=-1)            # [BS,max_nwords,output_dim]
+            # softmax is monotonic, so the predictions are obtained from the logits directly
 
             if not beam_search:
                 if topk>1:
-                    topk_probs, topk_inds = \
-                        torch.topk(probs, topk, dim=-1, largest=True, sorted=True)  # -> (Tensor, LongTensor) of [BS,max_nwords,topk]
+                    _, topk_inds = \
+                        torch.topk(logits, topk, dim=-1, largest=True, sorted=True)  # -> (Tensor, LongTensor) of [BS,max_nwords,topk]
                 elif topk==1:
-                    topk_inds = torch.argmax(probs,dim=-1)   # [BS,max_nwords]
+                    topk_inds = torch.argmax(logits,dim=-1)   # [BS,max_nwords]
                 else:
                     raise Exception("topk can be one of a value>=1")
 
@@ -480,12 +615,15 @@ class ElmoSCLSTM(nn.Module):
                 #   the arg_max_prob above computes a index because 
                 #   the bias term leads to non-uniform values in those positions
                 
-                return loss.cpu().detach().numpy(), topk_inds.cpu().detach().numpy()
+                loss = loss.cpu().detach().numpy() if targets is not None else None
+                return loss, topk_inds.cpu().detach().numpy()
             
             else:
-                topk_probs, topk_inds = \
-                    torch.topk(probs, topk, dim=-1, largest=True, sorted=True)  # -> (Tensor, LongTensor) of [BS,max_nwords,topk]
-                return loss.cpu().detach().numpy(), topk_inds.cpu().detach().numpy(), topk_probs.cpu().detach().numpy()
+                topk_logits, topk_inds = \
+                    torch.topk(logits, topk, dim=-1, largest=True, sorted=True)  # -> (Tensor, LongTensor) of [BS,max_nwords,topk]
+                topk_probs = torch.exp(topk_logits-torch.logsumexp(logits,dim=-1,keepdim=True))
+                loss = loss.cpu().detach().numpy() if targets is not None else None
+                return loss, topk_inds.cpu().detach().numpy(), topk_probs.cpu().detach().numpy()
                 
         return loss
 
@@ -547,14 +685,14 @@ class SubwordElmo(nn.Module):
         
         # eval preds
         if not self.training:
-            probs = F.softmax(logits,dim=-1)            # [BS,max_nwords,output_dim]
+            # softmax is monotonic, so the predictions are obtained from the logits directly
 
             if not beam_search:
                 if topk>1:
-                    topk_probs, topk_inds = \
-                        torch.topk(probs, topk, dim=-1, largest=True, sorted=True)  # -> (Tensor, LongTensor) of [BS,max_nwords,topk]
+                    _, topk_inds = \
+                        torch.topk(logits, topk, dim=-1, largest=True, sorted=True)  # -> (Tensor, LongTensor) of [BS,max_nwords,topk]
                 elif topk==1:
-                    topk_inds = torch.argmax(probs,dim=-1)   # [BS,max_nwords]
+                    topk_inds = torch.argmax(logits,dim=-1)   # [BS,max_nwords]
                 else:
                     raise Exception("topk can be one of a value>=1")
 
@@ -562,12 +700,15 @@ class SubwordElmo(nn.Module):
                 #   the arg_max_prob above computes a index because 
                 #   the bias term leads to non-uniform values in those positions
                 
-                return loss.cpu().detach().numpy(), topk_inds.cpu().detach().numpy()
+                loss = loss.cpu().detach().numpy() if targets is not None else None
+                return loss, topk_inds.cpu().detach().numpy()
             
             else:
-                topk_probs, topk_inds = \
-                    torch.topk(probs, topk, dim=-1, largest=True, sorted=True)  # -> (Tensor, LongTensor) of [BS,max_nwords,topk]
-                return loss.cpu().detach().numpy(), topk_inds.cpu().detach().numpy(), topk_probs.cpu().detach().numpy()
+                topk_logits, topk_inds = \
+                    torch.topk(logits, topk, dim=-1, largest=True, sorted=True)  # -> (Tensor, LongTensor) of [BS,max_nwords,topk]
+                topk_probs = torch.exp(topk_logits-torch.logsumexp(logits,dim=-1,keepdim=True))
+                loss = loss.cpu().detach().numpy() if targets is not None else None
+                return loss, topk_inds.cpu().detach().numpy(), topk_probs.cpu().detach().numpy()
                 
         return loss
 
@@ -667,18 +808,19 @@ class ElmoSCTransformer(nn.Module):
         
         # eval preds
         if not self.training:
-            probs = F.softmax(logits,dim=-1)            # [BS,max_nwords,output_dim]
+            # softmax is monotonic, so the predictions are obtained from the logits directly
             if topk>1:
                 topk_values, topk_inds = \
-                    torch.topk(probs, topk, dim=-1, largest=True, sorted=True)  # -> (Tensor, LongTensor) of [BS,max_nwords,topk]
+                    torch.topk(logits, topk, dim=-1, largest=True, sorted=True)  # -> (Tensor, LongTensor) of [BS,max_nwords,topk]
             elif topk==1:
-                topk_inds = torch.argmax(probs,dim=-1)   # [BS,max_nwords]
+                topk_inds = torch.argmax(logits,dim=-1)   # [BS,max_nwords]
 
             # Note that for those positions with padded_idx,
             #   the arg_max_prob above computes a index because 
             #   the bias term leads to non-uniform values in those positions
             
-            return loss.cpu().detach().numpy(), topk_inds.cpu().detach().numpy()
+            loss = loss.cpu().detach().numpy() if targets is not None else None
+            return loss, topk_inds.cpu().detach().numpy()
         return loss
 
 
@@ -755,7 +897,8 @@ class BertSCLSTM(nn.Module):
                 batch_splits: "list[list[int]]",
                 aux_word_embs: "tensor" = None,
                 targets: "tensor" = None,
-                topk = 1):
+                topk = 1,
+                shortlist: "tuple" = None):
         
         if aux_word_embs is not None:
             raise Exception("dimensions of aux_word_embs not used in __init__()")
@@ -773,12 +916,16 @@ class BertSCLSTM(nn.Module):
         )
         bert_encodings = self.bert_dropout(bert_encodings)
         # BS X max_nwords x self.bertmodule_outdim
-        bert_merged_encodings = pad_sequence(
-            [self.get_merged_encodings(bert_seq_encodings, seq_splits, mode='avg') \
-                for bert_seq_encodings, seq_splits in zip(bert_encodings,batch_splits)],
-            batch_first=True,
-            padding_value=0
-        )
+        if "subword_word_map" in batch_bert_dict:
+            bert_merged_encodings = merge_subword_encodings(bert_encodings, batch_bert_dict["subword_word_map"],
+                                                            mode='avg')
+        else:
+            bert_merged_encodings = pad_sequence(
+                [self.get_merged_encodings(bert_seq_encodings, seq_splits, mode='avg') \
+                    for bert_seq_encodings, seq_splits in zip(bert_encodings,batch_splits)],
+                batch_first=True,
+                padding_value=0
+            )
 
         if self.early_concat:
 
@@ -816,6 +963,13 @@ class BertSCLSTM(nn.Module):
             # out
             final_encodings = torch.cat((lstm_encodings,bert_merged_encodings), dim=2)
 
+        # shortlisted decoding; scores only a few candidates per word instead of the full output vocab
+        # see `shortlist_predictions` for the expected (candidate_idxs, candidate_mask, shared_idxs) tuple
+        if shortlist is not None:
+            assert not self.training and targets is None
+            topk_inds = shortlist_predictions(self.dense, final_encodings, *shortlist, topk=topk)
+            return None, topk_inds.cpu().detach().numpy()
+
         # dense
         # [BS,max_nwords,self.encodings_outdim]->[BS,max_nwords,output_dim]
         logits = self.dense(self.dropout(final_encodings))
@@ -828,18 +982,19 @@ class BertSCLSTM(nn.Module):
         
         # eval preds
         if not self.training:
-            probs = F.softmax(logits,dim=-1)            # [BS,max_nwords,output_dim]
+            # softmax is monotonic, so the predictions are obtained from the logits directly
             if topk>1:
                 topk_values, topk_inds = \
-                    torch.topk(probs, topk, dim=-1, largest=True, sorted=True)  # -> (Tensor, LongTensor) of [BS,max_nwords,topk]
+                    torch.topk(logits, topk, dim=-1, largest=True, sorted=True)  # -> (Tensor, LongTensor) of [BS,max_nwords,topk]
             elif topk==1:
-                topk_inds = torch.argmax(probs,dim=-1)   # [BS,max_nwords]
+                topk_inds = torch.argmax(logits,dim=-1)   # [BS,max_nwords]
 
             # Note that for those positions with padded_idx,
             #   the arg_max_prob above computes a index because 
             #   the bias term leads to non-uniform values in those positions
             
-            return loss.cpu().detach().numpy(), topk_inds.cpu().detach().numpy()
+            loss = loss.cpu().detach().numpy() if targets is not None else None
+            return loss, topk_inds.cpu().detach().numpy()
         return loss
 
 
@@ -908,12 +1063,16 @@ class SubwordBert(nn.Module):
         )
         bert_encodings = self.bert_dropout(bert_encodings)
         # BS X max_nwords x self.bertmodule_outdim
-        bert_merged_encodings = pad_sequence(
-            [self.get_merged_encodings(bert_seq_encodings, seq_splits, mode='avg') \
-                for bert_seq_encodings, seq_splits in zip(bert_encodings,batch_splits)],
-            batch_first=True,
-            padding_value=0
-        )
+        if "subword_word_map" in batch_bert_dict:
+            bert_merged_encodings = merge_subword_encodings(bert_encodings, batch_bert_dict["subword_word_map"],
+                                                            mode='avg')
+        else:
+            bert_merged_encodings = pad_sequence(
+                [self.get_merged_encodings(bert_seq_encodings, seq_splits, mode='avg') \
+                    for bert_seq_encodings, seq_splits in zip(bert_encodings,batch_splits)],
+                batch_first=True,
+                padding_value=0
+            )
 
         # concat aux_embs
         # if not None, the expected dim for aux_word_embs: [BS,max_nwords,*]
@@ -934,16 +1093,143 @@ class SubwordBert(nn.Module):
         
         # eval preds
         if not self.training:
-            probs = F.softmax(logits,dim=-1)            # [BS,max_nwords,output_dim]
+            # softmax is monotonic, so the predictions are obtained from the logits directly
             if topk>1:
                 topk_values, topk_inds = \
-                    torch.topk(probs, topk, dim=-1, largest=True, sorted=True)  # -> (Tensor, LongTensor) of [BS,max_nwords,topk]
+                    torch.topk(logits, topk, dim=-1, largest=True, sorted=True)  # -> (Tensor, LongTensor) of [BS,max_nwords,topk]
             elif topk==1:
-                topk_inds = torch.argmax(probs,dim=-1)   # [BS,max_nwords]
+                topk_inds = torch.argmax(logits,dim=-1)   # [BS,max_nwords]
 
             # Note that for those positions with padded_idx,
             #   the arg_max_prob above computes a index because 
             #   the bias term leads to non-uniform values in those positions
             
-            return loss.cpu().detach().numpy(), topk_inds.cpu().detach().numpy()
-        return loss
\ No newline at end of file
+            loss = loss.cpu().detach().numpy() if targets is not None else None
+            return loss, topk_inds.cpu().detach().numpy()
+        return loss
+
+
+
+
+#################################################
+# scriptable inference modules
+#################################################
+
+class WordLSTMInference(nn.Module):
+    """
+    the word-level lstm and dense modules of a trained model in eval mode, shared by the inference modules below
+    """
+    def __init__(self, model: nn.Module):
+        super(WordLSTMInference,self).__init__()
+        self.lstmmodule = model.lstmmodule
+        self.dense = model.dense
+    def word_lstm_topk(self, intermediate_encodings: torch.Tensor, batch_lengths: torch.Tensor, topk: int):
+        # returns [BS,max_nwords] or [BS,max_nwords,topk] indices into the output vocab
+        packed_encodings = pack_padded_sequence(intermediate_encodings,batch_lengths.cpu(),
+                                                batch_first=True,enforce_sorted=False)
+        lstm_encodings, _ = self.lstmmodule(packed_encodings)
+        lstm_encodings, _ = pad_packed_sequence(lstm_encodings, batch_first=True, padding_value=0.)
+        logits = self.dense(lstm_encodings)
+        if topk>1:
+            return torch.topk(logits, topk, dim=-1, largest=True, sorted=True)[1]
+        return torch.argmax(logits,dim=-1)
+
+class SCLSTMInference(WordLSTMInference):
+    """
+    the inference path of a trained `SCLSTM` with tensor-only inputs, compatible with `torch.jit.script`
+    forward takes [BS,max_nwords,screp_dim] dense semi-character vectors and [BS] batch_lengths
+    """
+    def __init__(self, model: SCLSTM):
+        super(SCLSTMInference,self).__init__(model)
+        self.model_type = "sclstm"
+    def forward(self, batch_screps: torch.Tensor, batch_lengths: torch.Tensor, topk: int = 1):
+        return self.word_lstm_topk(batch_screps, batch_lengths, topk)
+
+class CharCNNWordLSTMInference(WordLSTMInference):
+    """
+    the inference path of a trained `CharCNNWordLSTMModel` with tensor-only inputs, compatible with `torch.jit.script`
+    forward takes [BS,max_nwords,max_nchars] char idxs (see `char_tokenize(..., batched=True)`) and [BS] batch_lengths;
+    every word position is encoded, the padded ones being dropped by the word-level lstm, and the conv outputs are
+    max-pooled with a reduction so that the module is also exportable with dynamic shapes (see onnx_backend.py)
+    """
+    def __init__(self, model: CharCNNWordLSTMModel):
+        super(CharCNNWordLSTMInference,self).__init__(model)
+        self.model_type = "cnnlstm"
+        self.char_padding_idx: int = model.cnnmodule.embeddings.padding_idx
+        self.embeddings = model.cnnmodule.embeddings
+        self.convmodule = model.cnnmodule.convmodule
+    def forward(self, batch_idxs: torch.Tensor, batch_lengths: torch.Tensor, topk: int = 1):
+        batch_size, max_nwords, max_nchars = batch_idxs.size(0), batch_idxs.size(1), batch_idxs.size(2)
+        batch_char_lengths = (batch_idxs!=self.char_padding_idx).sum(dim=2)
+        # the number of chars each word would have been padded to in a per-sentence `pad_sequence`
+        padded_char_lengths, _ = torch.max(batch_char_lengths, dim=1, keepdim=True)
+        padded_char_lengths = padded_char_lengths.expand_as(batch_char_lengths).reshape(-1)
+
+        embs = torch.unsqueeze(self.embeddings(batch_idxs.reshape(-1,max_nchars)),dim=1)
+        maxpool_conv_outputs = []
+        for conv in self.convmodule:
+            out = conv(embs).squeeze(3)
+            # see `CharCNNModel.forward`
+            positions = torch.arange(out.size(2), device=out.device)
+            out = out.masked_fill(
+                (positions[None,:]>=(padded_char_lengths+out.size(2)-max_nchars)[:,None]).unsqueeze(1), 0.)
+            maxpool_conv_outputs.append(torch.max(out,dim=2)[0])
+        cnn_encodings = torch.cat(maxpool_conv_outputs,dim=1).view(batch_size,max_nwords,-1)
+        return self.word_lstm_topk(cnn_encodings, batch_lengths, topk)
+
+class CharLSTMWordLSTMInference(WordLSTMInference):
+    """
+    the inference path of a trained `CharLSTMWordLSTMModel` with tensor-only inputs, compatible with `torch.jit.script`
+    forward takes [BS,max_nwords,max_nchars] char idxs and [BS,max_nwords] batch_char_lengths (see
+    `char_tokenize(..., return_nchars=True, batched=True)`) and [BS] batch_lengths
+    """
+    def __init__(self, model: CharLSTMWordLSTMModel):
+        super(CharLSTMWordLSTMInference,self).__init__(model)
+        self.model_type = "lstmlstm"
+        self.char_padding_idx: int = model.charlstmmodule.embeddings.padding_idx
+        self.output_combination: str = model.charlstmmodule.output_combination
+        self.char_embeddings = model.charlstmmodule.embeddings
+        self.charlstmmodule = model.charlstmmodule.lstmmodule
+    def forward(self, batch_idxs: torch.Tensor, batch_char_lengths: torch.Tensor, batch_lengths: torch.Tensor,
+                topk: int = 1):
+        # all words of the batch are encoded at once, see `batched_char_encodings`
+        word_mask = torch.arange(batch_idxs.size(1), device=batch_idxs.device)[None,:] < \
+            batch_lengths.to(batch_idxs.device)[:,None]
+        batch_char_lengths = batch_char_lengths.to(batch_idxs.device)
+        word_nchars = batch_char_lengths[word_mask]
+        padded_char_lengths, _ = torch.max(batch_char_lengths, dim=1, keepdim=True)
+        word_padded_nchars = padded_char_lengths.expand_as(batch_char_lengths)[word_mask]
+
+        # see `CharLSTMModel.forward`
+        embs = self.char_embeddings(batch_idxs[word_mask])
+        embs_packed = pack_padded_sequence(embs,word_nchars.cpu(),batch_first=True,enforce_sorted=False)
+        lstm_encodings, _ = self.charlstmmodule(embs_packed)
+        lstm_encodings, _ = pad_packed_sequence(lstm_encodings, batch_first=True, padding_value=0.)
+        if self.output_combination=="end":
+            word_encodings = lstm_encodings[torch.arange(lstm_encodings.size(0)), word_nchars-1, :]
+        elif self.output_combination=="max":
+            positions = torch.arange(lstm_encodings.size(1), device=lstm_encodings.device)
+            lstm_encodings = lstm_encodings.masked_fill(
+                (positions[None,:]>=word_padded_nchars[:,None]).unsqueeze(2), float("-inf"))
+            word_encodings = torch.max(lstm_encodings,dim=1)[0]
+        else:
+            word_encodings = torch.sum(lstm_encodings,dim=1)/word_nchars.unsqueeze(1).to(lstm_encodings.dtype)
+
+        charlstm_encodings = word_encodings.new_zeros(batch_idxs.size(0), batch_idxs.size(1), word_encodings.size(-1))
+        charlstm_encodings[word_mask] = word_encodings
+        return self.word_lstm_topk(charlstm_encodings, batch_lengths, topk)
+
+INFERENCE_MODULES = {
+    SCLSTM: SCLSTMInference,
+    CharCNNWordLSTMModel: CharCNNWordLSTMInference,
+    CharLSTMWordLSTMModel: CharLSTMWordLSTMInference,
+}
+
+def get_inference_module(model: nn.Module):
+    """
+    returns the scriptable inference module of a trained model, sharing its weights
+    USAGE: scripted_module = torch.jit.script(get_inference_module(model).eval()); scripted_module.save(path)
+    """
+    if type(model) not in INFERENCE_MODULES:
+        raise NotImplementedError(f"no inference module for {model.__class__.__name__}")
+    return INFERENCE_MODULES[type(model)](model)
@@ -42,6 +42,7 @@ from helpers import progressBar
 from helpers import load_vocab_dict, save_vocab_dict
 from helpers import load_data, train_validation_split, get_char_tokens, get_tokens, num_unk_tokens
 from helpers import batch_iter, labelize, tokenize, char_tokenize, sclstm_tokenize
+from helpers import get_bucketed_order, restore_order
 from helpers import untokenize, untokenize_without_unks, untokenize_without_unks2, get_model_nparams
 from helpers import batch_accuracy_func
 
@@ -84,11 +85,15 @@ def load_pretrained(model, CHECKPOINT_PATH, optimizer=None, device='cpu'):
     
     return model
 
-def model_predictions(model, data, vocab, DEVICE, BATCH_SIZE=16):
+def model_predictions(model, data, vocab, DEVICE, BATCH_SIZE=16, BUCKET_BY_LENGTH=False, SHORTLIST=None):
     """
     model: an instance of SCLSTM
     data: list of tuples, with each tuple consisting of correct and incorrect 
             sentence string (would be split at whitespaces)
+    BUCKET_BY_LENGTH: if True, sentences of similar lengths are batched together to reduce padding;
+            predictions are still returned in the order of data
+    SHORTLIST: optional callable, eg. a `shortlist.Shortlister`, that maps a batch of sentences to word shortlists;
+            if given, only the shortlisted output words are scored instead of the full output vocab
     """
 
     topk = 1
@@ -97,23 +102,26 @@ def model_predictions(model, data, vocab, DEVICE, BATCH_SIZE=16):
     final_sentences = []
     VALID_BATCH_SIZE = BATCH_SIZE
     print("data size: {}".format(len(data)))
+    if BUCKET_BY_LENGTH:
+        order = get_bucketed_order(data)
+        data = [data[idx] for idx in order]
     data_iter = batch_iter(data, batch_size=VALID_BATCH_SIZE, shuffle=False)
     model.eval()
     model.to(DEVICE)
     for batch_id, (batch_clean_sentences,batch_corrupt_sentences) in enumerate(data_iter):
         # set batch data
-        batch_labels, batch_lengths = labelize(batch_clean_sentences, vocab)
-        batch_idxs, batch_lengths_ = sclstm_tokenize(batch_corrupt_sentences, vocab)
-        assert (batch_lengths_==batch_lengths).all()==True
+        batch_idxs, batch_lengths = sclstm_tokenize(batch_corrupt_sentences, vocab)
         batch_idxs = [batch_idxs_.to(DEVICE) for batch_idxs_ in batch_idxs]
         batch_lengths = batch_lengths.to(DEVICE)
-        batch_labels = batch_labels.to(DEVICE)
+        batch_shortlist = SHORTLIST(batch_corrupt_sentences, DEVICE) if SHORTLIST is not None else None
         # forward
         with torch.no_grad():
             # because topk=1, batch_predictions are of shape (batch_size,batch_max_seq_len)
-            _, batch_predictions = model(batch_idxs, batch_lengths, targets=batch_labels, topk=topk)
+            _, batch_predictions = model(batch_idxs, batch_lengths, topk=topk, shortlist=batch_shortlist)
         batch_predictions = untokenize_without_unks(batch_predictions, batch_lengths, vocab, batch_clean_sentences)
         final_sentences.extend(batch_predictions)
+    if BUCKET_BY_LENGTH:
+        final_sentences = restore_order(final_sentences, order)
     print("total inference time for this data is: {:4f} secs".format(time.time()-inference_st_time))
     return final_sentences  
 
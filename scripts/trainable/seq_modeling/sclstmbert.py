@@ -46,6 +46,7 @@ from helpers import progressBar
 from helpers import load_vocab_dict, save_vocab_dict
 from helpers import load_data, train_validation_split, get_char_tokens, get_tokens, num_unk_tokens
 from helpers import batch_iter, labelize, tokenize, bert_tokenize_for_valid_examples, sclstm_tokenize
+from helpers import get_bucketed_order, restore_order
 from helpers import untokenize, untokenize_without_unks, untokenize_without_unks2, get_model_nparams
 from helpers import batch_accuracy_func
 
@@ -83,11 +84,14 @@ def load_pretrained(model, CHECKPOINT_PATH, optimizer=None, device='cuda'):
     
     return model
 
-def model_predictions(model, data, vocab, DEVICE, BATCH_SIZE=16):
+def model_predictions(model, data, vocab, DEVICE, BATCH_SIZE=16, BUCKET_BY_LENGTH=False):
     """
     model: an instance of BertSCLSTM
     data: list of tuples, with each tuple consisting of correct and incorrect 
             sentence string (would be split at whitespaces)
+    BUCKET_BY_LENGTH: if True, sentences of similar lengths are batched together to reduce padding;
+            predictions are still returned in the order of data, so every line must pass the
+            bert pre-processing check
     """
 
     topk = 1
@@ -96,6 +100,10 @@ def model_predictions(model, data, vocab, DEVICE, BATCH_SIZE=16):
     final_sentences = []
     VALID_BATCH_SIZE = BATCH_SIZE
     # print("data size: {}".format(len(data)))
+    if BUCKET_BY_LENGTH:
+        # number of characters is a cheap proxy for the number of bert subwords
+        order = get_bucketed_order(data, key=lambda item: len(item[1]))
+        data = [data[idx] for idx in order]
     data_iter = batch_iter(data, batch_size=VALID_BATCH_SIZE, shuffle=False)
     model.eval()
     model.to(DEVICE)
@@ -112,21 +120,20 @@ def model_predictions(model, data, vocab, DEVICE, BATCH_SIZE=16):
             batch_labels, batch_sentences = batch_labels_, batch_sentences_
         batch_bert_inp = {k:v.to(DEVICE) for k,v in batch_bert_inp.items()}
         # set batch data for others
-        batch_labels_ids, batch_lengths = labelize(batch_labels, vocab)
-        batch_idxs, batch_lengths_ = sclstm_tokenize(batch_sentences, vocab)
-        assert (batch_lengths_==batch_lengths).all()==True
+        batch_idxs, batch_lengths = sclstm_tokenize(batch_sentences, vocab)
         assert len(batch_bert_splits)==len(batch_idxs)
         batch_idxs = [batch_idxs_.to(DEVICE) for batch_idxs_ in batch_idxs]
         batch_lengths = batch_lengths.to(DEVICE)
-        batch_labels_ids = batch_labels_ids.to(DEVICE) 
         # forward
         with torch.no_grad():
             """
             NEW: batch_predictions can now be of shape (batch_size,batch_max_seq_len,topk) if topk>1, else (batch_size,batch_max_seq_len)
             """
-            _, batch_predictions = model(batch_idxs, batch_lengths, batch_bert_inp, batch_bert_splits, targets=batch_labels_ids, topk=topk)
+            _, batch_predictions = model(batch_idxs, batch_lengths, batch_bert_inp, batch_bert_splits, topk=topk)
         batch_predictions = untokenize_without_unks(batch_predictions, batch_lengths, vocab, batch_labels)
         final_sentences.extend(batch_predictions)
+    if BUCKET_BY_LENGTH:
+        final_sentences = restore_order(final_sentences, order)
     # print("total inference time for this data is: {:4f} secs".format(time.time()-inference_st_time))
     return final_sentences
 
@@ -0,0 +1,140 @@
+
+#############################################
+# USAGE
+# python shortlist.py sclstm ../../data/checkpoints/scrnn-probwordnoise ../../data/traintest/test.bea4k ../../data/traintest/test.bea4k.noise
+# python shortlist.py cnnlstm ../../data/checkpoints/cnn-lstm-probwordnoise ../../data/traintest/test.bea4k ../../data/traintest/test.bea4k.noise 2000 1 meta
+#
+# benchmarks shortlisted decoding against full-vocab argmax, for both accuracy and speed
+# supported models: sclstm, cnnlstm, elmosclstm, bertsclstm
+#############################################
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/../..")
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/.")
+
+import importlib
+import time
+
+import torch
+
+from non_trainable.candidates_generation import CandidatesGenerator
+
+
+class Shortlister(object):
+    """
+    builds per-word shortlists of output-vocab indices for `shortlist_predictions` in models.py
+
+    a word's shortlist consists of the word itself (if in the output vocab), its edit-distance and (optionally)
+    double-metaphone neighbours obtained with `CandidatesGenerator`, and the unk token so that the model can still
+    back off to the input word; the `n_frequent` most frequent words of the vocab are scored for every word
+    """
+
+    def __init__(self, vocab, n_frequent=1000, max_edit_dist=1, do_meta=False):
+        self.token2idx = vocab["token2idx"]
+        self.unk_idx = self.token2idx[vocab["unk_token"]]
+        self.pad_idx = self.token2idx[vocab["pad_token"]]
+        self.max_edit_dist = max_edit_dist
+        self.do_meta = do_meta
+
+        # candidates are only generated from words in the output vocab
+        self.generator = CandidatesGenerator([], do_meta=False)
+        self.generator.add_tokens([*self.token2idx.keys()])
+
+        # special tokens have a token_freq of -1
+        sorted_ = sorted([(t,f) for t,f in vocab["token_freq"].items() if f>0], key=lambda item: item[1], reverse=True)
+        self.shared_idxs = torch.tensor([self.token2idx[t] for t,_ in sorted_[:n_frequent]]).long()
+        self.shared_set = set(self.shared_idxs.tolist())
+
+        # keys are words and values are lists of output-vocab indices
+        self.cache = {}
+
+    def get_word_shortlist(self, word):
+        if word not in self.cache:
+            lower_word = word.lower()
+            cands = [word, lower_word]
+            cands += [cand.word for cand in self.generator.get_editdistance_doublemetaphone_candidates(
+                lower_word, self.max_edit_dist, do_meta=self.do_meta)]
+            if word!=lower_word:
+                # eg. "Teh" -> "the" -> "The"
+                cands += [cand[:1].upper()+cand[1:] for cand in cands]
+            idxs = [self.unk_idx] + [self.token2idx[cand] for cand in cands if cand in self.token2idx]
+            # shared_idxs are scored for every word anyway
+            self.cache[word] = [*dict.fromkeys([idx for idx in idxs if idx not in self.shared_set])]
+        return self.cache[word]
+
+    def __call__(self, batch_sentences, device="cpu"):
+        """
+        returns the (candidate_idxs, candidate_mask, shared_idxs) tuple expected by `shortlist_predictions`
+        """
+        batch_words = [line.split() for line in batch_sentences]
+        max_nwords = max([len(words) for words in batch_words])
+        batch_shortlists = [[self.get_word_shortlist(word) for word in words] for words in batch_words]
+        max_ncands = max([len(shortlist) for shortlists in batch_shortlists for shortlist in shortlists])
+        candidate_idxs = torch.full((len(batch_words),max_nwords,max_ncands), self.pad_idx, dtype=torch.long)
+        candidate_mask = torch.zeros((len(batch_words),max_nwords,max_ncands), dtype=torch.bool)
+        for i, shortlists in enumerate(batch_shortlists):
+            for j, shortlist in enumerate(shortlists):
+                candidate_idxs[i,j,:len(shortlist)] = torch.tensor(shortlist)
+                candidate_mask[i,j,:len(shortlist)] = True
+        return candidate_idxs.to(device), candidate_mask.to(device), self.shared_idxs.to(device)
+
+
+def get_word_metrics(clean_lines, corrupt_lines, predicted_lines):
+    corr2corr, corr2incorr, incorr2corr, incorr2incorr = 0, 0, 0, 0
+    for clean_line, corrupt_line, predicted_line in zip(clean_lines, corrupt_lines, predicted_lines):
+        for clean_token, corrupt_token, predicted_token in zip(clean_line.split(), corrupt_line.split(),
+                                                                predicted_line.split()):
+            if clean_token==corrupt_token:
+                corr2corr, corr2incorr = (corr2corr+1, corr2incorr) if predicted_token==clean_token \
+                    else (corr2corr, corr2incorr+1)
+            else:
+                incorr2corr, incorr2incorr = (incorr2corr+1, incorr2incorr) if predicted_token==clean_token \
+                    else (incorr2corr, incorr2incorr+1)
+    total = max(corr2corr+corr2incorr+incorr2corr+incorr2incorr, 1)
+    return (corr2corr+incorr2corr)/total, incorr2corr/max(incorr2corr+incorr2incorr, 1)
+
+
+if __name__=="__main__":
+
+    # "sclstm", "cnnlstm", "elmosclstm" or "bertsclstm"
+    MODEL_NAME = sys.argv[1]
+    CHECKPOINT_PATH = sys.argv[2]
+    CLEAN_FILE_PATH, CORRUPT_FILE_PATH = sys.argv[3], sys.argv[4]
+    N_FREQUENT = int(sys.argv[5]) if len(sys.argv)>5 else 1000
+    MAX_EDIT_DIST = int(sys.argv[6]) if len(sys.argv)>6 else 1
+    DO_META = len(sys.argv)>7 and sys.argv[7]=="meta"
+    if MODEL_NAME not in ["sclstm", "cnnlstm", "elmosclstm", "bertsclstm"]:
+        raise Exception("shortlisted decoding is only available for sclstm, cnnlstm, elmosclstm and bertsclstm")
+
+    DEVICE = "cuda:0" if torch.cuda.is_available() else "cpu"
+    INFER_BATCH_SIZE = 16
+
+    module = importlib.import_module(MODEL_NAME)
+    vocab = module.load_vocab_dict(os.path.join(CHECKPOINT_PATH, "vocab.pkl"))
+    model = module.load_pretrained(module.load_model(vocab), CHECKPOINT_PATH, device=DEVICE)
+
+    clean_lines = [line.strip() for line in open(CLEAN_FILE_PATH, "r")]
+    corrupt_lines = [line.strip() for line in open(CORRUPT_FILE_PATH, "r")]
+    data = [(a,b) for a,b in zip(clean_lines,corrupt_lines) if a!="" and b!=""]
+    clean_lines, corrupt_lines = [a for a,_ in data], [b for _,b in data]
+
+    st_time = time.time()
+    shortlister = Shortlister(vocab, n_frequent=N_FREQUENT, max_edit_dist=MAX_EDIT_DIST, do_meta=DO_META)
+    print(f"shortlister with {len(shortlister.shared_idxs)} shared words built in {time.time()-st_time:.2f} secs")
+
+    results = {}
+    # run the shortlisted decoding twice to report timings with a warm shortlist cache
+    for name, shortlist in [("full-vocab", None), ("shortlist (cold)", shortlister), ("shortlist", shortlister)]:
+        st_time = time.time()
+        predicted_lines = module.model_predictions(model, data, vocab, DEVICE, BATCH_SIZE=INFER_BATCH_SIZE,
+                                                   SHORTLIST=shortlist)
+        results[name] = (time.time()-st_time, predicted_lines)
+
+    full_predicted_lines = results["full-vocab"][1]
+    print("")
+    print(f"{'decoding':<20}{'time (secs)':>12}{'accuracy':>12}{'correction rate':>18}{'agreement':>12}")
+    for name, (time_taken, predicted_lines) in results.items():
+        accuracy, correction_rate = get_word_metrics(clean_lines, corrupt_lines, predicted_lines)
+        agreement = sum([a==b for a,b in zip(predicted_lines,full_predicted_lines)])/max(len(predicted_lines), 1)
+        print(f"{name:<20}{time_taken:>12.2f}{accuracy:>12.4f}{correction_rate:>18.4f}{agreement:>12.4f}")
@@ -38,7 +38,8 @@ setup(
         "spacy": ["spacy"],
         "elmo": ["allennlp==1.5.0"],
         "noising": ["unidecode"],
-        "flask": ["flask_cors"]
+        "flask": ["flask", "flask_cors", "gunicorn"],
+        "onnx": ["onnx", "onnxruntime"]
     },
     keywords="transformer networks neuspell neural spelling correction embedding PyTorch NLP deep learning"
 )
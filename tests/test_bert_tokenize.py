@@ -0,0 +1,46 @@
+"""
+USAGE
+-----
+checks that the fast (rust) bert tokenization path of `bert_tokenize_for_valid_examples` gives the same outputs as the
+slow (python) one, on mixed english, accented, cjk and other text
+>>> python test_bert_tokenize.py
+-----
+"""
+
+import torch
+
+from neuspell.seq_modeling.helpers import get_bert_tokenizer_fast
+from neuspell.seq_modeling.helpers import _fast_bert_tokenize_for_valid_examples, _slow_bert_tokenize_for_valid_examples
+
+example_texts = [
+    "I can't believe it's not butter!! (really...)",
+    "Mr. Smith's well-known dog, e.g., costs $100 and weighs 10kg.",
+    "naïve café résumé Zürich façade",
+    "我爱 中文 and 日本語のテキスト mixed with english",
+    "한국어 텍스트 and Ελληνικά and русский текст",
+    "emojis 😀👍 and symbols ©®™ → ∞",
+    "  leading and  double   spaces ",
+    " ".join(["supercalifragilisticexpialidocious"] * 100),  # longer than BERT_MAX_SEQ_LEN sub-tokens
+]
+
+assert get_bert_tokenizer_fast() is not None, "the fast bert tokenizer could not be loaded"
+
+######################################################
+######################################################
+
+""" same sentences as both inputs, as the correctors pass them, and different ones, as in training """
+for batch_orginal_sentences, batch_noisy_sentences in [
+    (example_texts, example_texts),
+    ([text.replace("e", "") for text in example_texts], example_texts),
+]:
+    slow_outputs = _slow_bert_tokenize_for_valid_examples(batch_orginal_sentences, batch_noisy_sentences)
+    fast_outputs = _fast_bert_tokenize_for_valid_examples(batch_orginal_sentences, batch_noisy_sentences)
+    for name, slow, fast in zip(["orginal sentences", "noisy sentences", "bert dict", "splits"],
+                                slow_outputs, fast_outputs):
+        if isinstance(slow, dict):
+            assert slow.keys() == fast.keys(), name
+            for key in slow:
+                assert torch.equal(torch.as_tensor(slow[key]), torch.as_tensor(fast[key])), f"{name}: {key}"
+        else:
+            assert slow == fast, f"{name}:\n\tslow: {slow}\n\tfast: {fast}"
+    print(f"{len(slow_outputs[0])} of {len(batch_noisy_sentences)} examples valid, slow and fast outputs match")
@@ -0,0 +1,98 @@
+"""
+USAGE
+-----
+checks `correct_files` of the `python -m neuspell correct` command with a stub corrector: line order, empty lines,
+resuming an interrupted run from its completed shards, and correcting again only the inputs that changed
+>>> python test_cli_correct.py
+-----
+"""
+
+import os
+import tempfile
+
+from neuspell.cli import correct_files
+
+SHARD_MB = 0.0002  # 200 bytes, i.e. several shards per file
+
+
+class StubCorrector:
+    """
+    upper-cases lines and counts its calls, i.e. the shards it corrected; after `fail_after` calls, it raises as if
+    the run was interrupted
+    """
+
+    def __init__(self, fail_after=None):
+        self.ncalls = 0
+        self.fail_after = fail_after
+
+    def correct_strings(self, mystrings):
+        if self.fail_after is not None and self.ncalls >= self.fail_after:
+            raise KeyboardInterrupt
+        self.ncalls += 1
+        return [my_str.upper() for my_str in mystrings]
+
+
+def write_lines(path, lines):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as fp:
+        fp.write("".join([line + "\n" for line in lines]))
+
+
+def check_outputs(inputs, out):
+    for rel_path, lines in inputs.items():
+        with open(os.path.join(out, rel_path), "r", encoding="utf-8") as fp:
+            assert fp.read() == "".join([line.strip().upper() + "\n" for line in lines]), rel_path
+    leftovers = [name for _, dirs, files in os.walk(out) for name in dirs + files
+                 if name.endswith(".shards") or name.endswith(".tmp")]
+    assert not leftovers, leftovers
+
+
+######################################################
+######################################################
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    inp = os.path.join(tmp_dir, "in")
+    inputs = {
+        "a.txt": [f"line {i} of a" if i % 7 else "" for i in range(100)],
+        os.path.join("sub", "b.txt"): [f"  line {i} of b " for i in range(60)],
+    }
+    for rel_path, lines in inputs.items():
+        write_lines(os.path.join(inp, rel_path), lines)
+
+    """ a full run, line by line and in order """
+    corrector = StubCorrector()
+    correct_files(corrector, inp, os.path.join(tmp_dir, "full"), shard_mb=SHARD_MB)
+    check_outputs(inputs, os.path.join(tmp_dir, "full"))
+    nshards = corrector.ncalls
+    assert nshards > 4, nshards
+    print(f"full run: ok, {nshards} shards")
+
+    """ an interrupted run resumes from its completed shards, and a completed run has nothing left to correct """
+    out = os.path.join(tmp_dir, "out")
+    try:
+        correct_files(StubCorrector(fail_after=3), inp, out, shard_mb=SHARD_MB)
+        raise AssertionError("expected the run to be interrupted")
+    except KeyboardInterrupt:
+        pass
+    corrector = StubCorrector()
+    correct_files(corrector, inp, out, shard_mb=SHARD_MB)
+    assert corrector.ncalls == nshards - 3, corrector.ncalls
+    check_outputs(inputs, out)
+    corrector = StubCorrector()
+    correct_files(corrector, inp, out, shard_mb=SHARD_MB)
+    assert corrector.ncalls == 0, corrector.ncalls
+    print("resume: ok")
+
+    """ an input that changed since its output was written is corrected again, and only that one """
+    inputs["a.txt"] = inputs["a.txt"] + ["a new line of a"]
+    write_lines(os.path.join(inp, "a.txt"), inputs["a.txt"])
+    stat = os.stat(os.path.join(inp, "a.txt"))
+    os.utime(os.path.join(inp, "a.txt"), (stat.st_atime, stat.st_mtime + 10))
+    corrector = StubCorrector()
+    correct_files(corrector, inp, out, shard_mb=SHARD_MB)
+    check_outputs(inputs, out)
+    nshards_a = corrector.ncalls
+    corrector = StubCorrector()
+    correct_files(corrector, os.path.join(inp, "a.txt"), os.path.join(tmp_dir, "only_a"), shard_mb=SHARD_MB)
+    assert nshards_a == corrector.ncalls, (nshards_a, corrector.ncalls)
+    print("stale inputs: ok")
@@ -0,0 +1,67 @@
+"""
+USAGE
+-----
+checks that `tokenize="fast"` tokenizes exactly like the default spacy path, and compares their speeds
+>>> python test_fast_tokenizer.py
+to also check other text files:
+>>> python test_fast_tokenizer.py path/to/file1.txt path/to/file2.txt
+-----
+"""
+
+import glob
+import os
+import sys
+import time
+
+import neuspell
+from neuspell.commons import _load_spacy_tokenizer, spacy_tokenizer, spacy_batch_tokenizer, fast_tokenizer
+
+TRAIN_TEST_DATA_PATH = neuspell.commons.DEFAULT_TRAINTEST_DATA_PATH
+REPO_PATH = os.path.join(os.path.split(__file__)[0], "..")
+
+example_texts = [
+    "I can't believe it's not butter!! (really...)",
+    "He said: \"don't go\" -- but we didnt listen :)",
+    "Mr. Smith's well-known dog, e.g., costs $100 and weighs 10kg.",
+    "U.S. vs. U.K. at 5p.m., see www.example.com or mail me@example.com",
+    "rock'n'roll o'clock ma'am y'all 3.5km 1990s 2-3 a/b",
+    "  leading and  double   spaces ",
+]
+
+# raises if spacy or en_core_web_sm are not installed; otherwise `spacy_tokenizer` silently falls back to str.split()
+_load_spacy_tokenizer()
+
+files = sys.argv[1:] or [
+    *glob.glob(os.path.join(REPO_PATH, "test files", "*.txt")),
+    *glob.glob(os.path.join(TRAIN_TEST_DATA_PATH, "sample_*.txt")),
+]
+lines = [*example_texts]
+for file in files:
+    with open(file, "r", errors="ignore") as fp:
+        lines.extend([line.strip() for line in fp if line.strip()])
+print(f"comparing tokenizations of {len(lines)} lines from {len(files)} files")
+
+######################################################
+######################################################
+
+spacy_outputs = [spacy_tokenizer(line) for line in lines]
+assert spacy_batch_tokenizer(lines) == spacy_outputs
+fast_outputs = [fast_tokenizer(line) for line in lines]
+mismatches = [(line, a, b) for line, a, b in zip(lines, spacy_outputs, fast_outputs) if a != b]
+for line, a, b in mismatches[:10]:
+    print(f"{line}\n\tspacy: {a}\n\tfast:  {b}")
+assert len(mismatches) == 0, f"{len(mismatches)} of {len(lines)} lines tokenized differently"
+print("all tokenizations match")
+
+######################################################
+######################################################
+
+for name, tokenize in [
+    ("spacy_tokenizer", lambda lines_: [spacy_tokenizer(line) for line in lines_]),
+    ("spacy_batch_tokenizer", spacy_batch_tokenizer),
+    ("fast_tokenizer", lambda lines_: [fast_tokenizer(line) for line in lines_]),
+]:
+    st_time = time.time()
+    tokenize(lines)
+    time_taken = time.time() - st_time
+    print(f"{name:<24}{time_taken:>8.3f} secs{len(lines) / max(time_taken, 1e-9):>12.0f} lines/sec")
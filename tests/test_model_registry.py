@@ -0,0 +1,95 @@
+"""
+USAGE
+-----
+checks `ModelRegistry` with small torch modules: sharing, freeing of dropped entries under a memory budget, reuse
+of dropped entries still in use, and loads of one key not blocking lookups of the others
+>>> python test_model_registry.py
+-----
+"""
+
+import gc
+import os
+import pickle
+import tempfile
+import threading
+import time
+import weakref
+
+import torch
+
+from neuspell.model_registry import ModelRegistry, get_model_memory
+
+MODEL_MB = get_model_memory(torch.nn.Linear(1000, 100)) / 1e6
+
+
+class Loader:
+    """
+    loads a new `torch.nn.Linear(1000, 100)`, about 0.4 MB, and counts its calls
+    """
+
+    def __init__(self):
+        self.nloads = 0
+
+    def __call__(self):
+        self.nloads += 1
+        return torch.nn.Linear(1000, 100)
+
+
+######################################################
+######################################################
+
+""" a key is loaded once, and shared """
+registry, loader = ModelRegistry(), Loader()
+model = registry.get_model("a", loader)
+assert registry.get_model("a", loader) is model and loader.nloads == 1
+print("sharing: ok")
+
+""" a dropped entry that is not in use is freed, and loaded again on its next use """
+registry, loader = ModelRegistry(max_memory_mb=1.5 * MODEL_MB), Loader()
+model_ref = weakref.ref(registry.get_model("a", loader))
+registry.get_model("b", loader)
+gc.collect()
+assert "a" not in registry and model_ref() is None
+assert abs(registry.memory_mb() - MODEL_MB) < 1e-6, registry.memory_mb()
+registry.get_model("a", loader)
+assert loader.nloads == 3 and registry.stats["evictions"] == 2, registry.stats
+print("freeing: ok")
+
+""" a dropped entry still in use counts towards the budget, and is handed out again rather than loaded twice """
+registry, loader = ModelRegistry(max_memory_mb=1.5 * MODEL_MB), Loader()
+model = registry.get_model("a", loader)
+registry.get_model("b", loader)
+assert "a" not in registry and abs(registry.memory_mb() - 2 * MODEL_MB) < 1e-6, registry.memory_mb()
+assert registry.get_model("a", loader) is model and loader.nloads == 2
+print("dropped entries in use: ok")
+
+""" vocabs too """
+with tempfile.TemporaryDirectory() as tmp_dir:
+    vocab_path = os.path.join(tmp_dir, "vocab.pkl")
+    with open(vocab_path, "wb") as fp:
+        pickle.dump({"token2idx": {"a": 0}}, fp)
+    registry = ModelRegistry(max_memory_mb=0)
+    vocab = registry.get_vocab(vocab_path, lambda path: pickle.load(open(path, "rb")))
+    registry.get_model("a", Loader())
+    assert vocab_path not in registry and registry.get_vocab(vocab_path, None) is vocab
+    assert vocab == {"token2idx": {"a": 0}}
+print("vocabs: ok")
+
+""" a slow load blocks only the lookups of its own key """
+registry, loader, loading = ModelRegistry(), Loader(), threading.Event()
+
+
+def _slow_loader():
+    loading.wait(10)
+    return torch.nn.Linear(2, 2)
+
+
+thread = threading.Thread(target=registry.get_model, args=("slow", _slow_loader))
+thread.start()
+st_time = time.perf_counter()
+registry.get_model("fast", loader)
+time_taken = time.perf_counter() - st_time
+loading.set()
+thread.join()
+assert time_taken < 5, time_taken
+print("per-key loading: ok")
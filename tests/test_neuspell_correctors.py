@@ -9,6 +9,7 @@ for cpu-only testing:
 """
 
 import logging
+import os
 
 import neuspell
 from neuspell import CnnlstmChecker, BertsclstmChecker, NestedlstmChecker, SclstmbertChecker, BertChecker, SclstmChecker
@@ -33,6 +34,51 @@ if is_module_available("allennlp"):
 logging.getLogger().setLevel(logging.ERROR)
 TRAIN_TEST_DATA_PATH = neuspell.commons.DEFAULT_TRAINTEST_DATA_PATH
 
+
+def check_chunked_correct_from_file(checker, src, expected, dest, chunk_size=8):
+    """ streaming `correct_from_file` writes the same lines as the unchunked run in `expected`, also when resumed """
+    with open(expected, "rb") as fp:
+        expected_bytes = fp.read()
+    checker.correct_from_file(src=src, dest=dest, chunk_size=chunk_size)
+    with open(dest, "rb") as fp:
+        assert fp.read() == expected_bytes, f"chunked output {dest} differs from {expected}"
+    assert not os.path.exists(dest + ".ckpt")
+
+    # interrupted after the first chunk, while the second one was being written
+    with open(src, "rb") as fp:
+        src_offset = sum([len(fp.readline()) for _ in range(chunk_size)])
+    dest_offset = sum([len(line) for line in expected_bytes.splitlines(keepends=True)[:chunk_size]])
+    with open(dest, "r+b") as fp:
+        fp.truncate(dest_offset)
+        fp.seek(dest_offset)
+        fp.write(b"partially written chu")
+    checker._save_file_checkpoint(dest + ".ckpt", src, src_offset, dest_offset, chunk_size)
+    checker.correct_from_file(src=src, dest=dest, chunk_size=chunk_size, resume=True)
+    with open(dest, "rb") as fp:
+        assert fp.read() == expected_bytes, f"resumed output {dest} differs from {expected}"
+    assert not os.path.exists(dest + ".ckpt")
+
+    # a checkpoint whose output was deleted starts over
+    checker._save_file_checkpoint(dest + ".ckpt", src, src_offset, dest_offset, chunk_size)
+    os.remove(dest)
+    checker.correct_from_file(src=src, dest=dest, chunk_size=chunk_size, resume=True)
+    with open(dest, "rb") as fp:
+        assert fp.read() == expected_bytes, f"restarted output {dest} differs from {expected}"
+
+    # a checkpoint of a source that changed since is not resumed
+    checker._save_file_checkpoint(dest + ".ckpt", src, src_offset, dest_offset, chunk_size)
+    stat = os.stat(src)
+    os.utime(src, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    try:
+        checker.correct_from_file(src=src, dest=dest, chunk_size=chunk_size, resume=True)
+        raise AssertionError("expected the checkpoint of a changed source not to be resumed")
+    except ValueError:
+        pass
+    finally:
+        os.utime(src, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.remove(dest + ".ckpt")
+
+
 ######################################################
 ######################################################
 
@@ -46,6 +92,11 @@ for Checker in all_checkers:
     print("to cheque sum spelling rul", "\n\t\t→", checker.correct("to cheque sum spelling rul"))
     checker.correct_from_file(src=f"{TRAIN_TEST_DATA_PATH}/sample_corrupt.txt",
                               dest=f"{TRAIN_TEST_DATA_PATH}/sample_prediction.txt")
+    check_chunked_correct_from_file(checker, src=f"{TRAIN_TEST_DATA_PATH}/sample_corrupt.txt",
+                                    expected=f"{TRAIN_TEST_DATA_PATH}/sample_prediction.txt",
+                                    dest=f"{TRAIN_TEST_DATA_PATH}/sample_prediction_chunked.txt")
+    with open(f"{TRAIN_TEST_DATA_PATH}/sample_corrupt.txt") as fp:
+        print(list(checker.correct_strings_iter(line.strip() for line in fp))[:2])
     checker.evaluate(f"{TRAIN_TEST_DATA_PATH}/sample_clean.txt", f"{TRAIN_TEST_DATA_PATH}/sample_corrupt.txt")
 
     """ load a checker from a checkpoint; defaults to load on cpu device """
@@ -0,0 +1,109 @@
+"""
+USAGE
+-----
+checks that randomly initialised `SCLSTM`, `CharCNNWordLSTMModel` and `SubwordBert` models exported with `export_onnx`
+give, under `OrtModel`, the same predictions as the torch models on batches of sentences of different lengths; skipped
+when `onnx` or `onnxruntime` is not installed
+>>> python test_onnx_backend.py
+-----
+"""
+
+import os
+import sys
+import tempfile
+
+import torch
+import transformers
+
+from neuspell.seq_modeling.helpers import _subword_word_map, char_tokenize, get_tokens, sclstm_tokenize
+from neuspell.seq_modeling.models import CharCNNWordLSTMModel, SCLSTM, SubwordBert
+from neuspell.util import is_module_available
+
+if not (is_module_available("onnx") and is_module_available("onnxruntime")):
+    print("onnx or onnxruntime not installed, skipping; install them by running `pip install neuspell[onnx]`")
+    sys.exit(0)
+
+from neuspell.onnx_backend import OrtModel, export_onnx
+
+SENTENCES = [
+    "the quick brown fox jumps over the lazy dog",
+    "a sentance with a speling misteak",
+    "short",
+    "words of very different lengths: a bb ccc dddddddddddddddd",
+    "the lazy dog sleeps",
+    "one two",
+]
+BATCHES = [SENTENCES[:3], SENTENCES[3:], SENTENCES[2:3], SENTENCES]
+
+
+def check_predictions(model, ort_model, batch_inputs, batch_lengths, batch_nwords):
+    """ the predictions of the words of each sentence; those of the padding positions are not used by the checkers """
+    _, predictions = model(batch_inputs, batch_lengths)
+    _, ort_predictions = ort_model(batch_inputs, batch_lengths)
+    assert predictions.shape == ort_predictions.shape, (predictions.shape, ort_predictions.shape)
+    for nwords, preds, ort_preds in zip(batch_nwords, predictions, ort_predictions):
+        assert (preds[:nwords] == ort_preds[:nwords]).all(), (preds[:nwords], ort_preds[:nwords])
+
+
+def random_subword_bert(output_dim):
+    """ a `SubwordBert` on a small randomly initialised bert, without downloading the pretrained one """
+    config = transformers.BertConfig(vocab_size=1000, hidden_size=64, num_hidden_layers=2, num_attention_heads=2,
+                                     intermediate_size=128, return_dict=False)
+    from_pretrained = transformers.BertModel.from_pretrained
+    transformers.BertModel.from_pretrained = lambda *args, **kwargs: transformers.BertModel(config)
+    try:
+        return SubwordBert(3 * 128, 0, output_dim)
+    finally:
+        transformers.BertModel.from_pretrained = from_pretrained
+
+
+def bert_inputs(batch_sentences, vocab_size):
+    """ random sub-token ids for the words of `batch_sentences`, a word being split into 1 to 3 sub-tokens """
+    batch_splits = [[len(word) % 3 + 1 for word in sentence.split()] for sentence in batch_sentences]
+    max_nsubwords = max([sum(splits) for splits in batch_splits]) + 2  # 2 for [CLS] and [SEP]
+    input_ids = torch.randint(1, vocab_size, (len(batch_sentences), max_nsubwords))
+    attention_mask = torch.zeros_like(input_ids)
+    for i, splits in enumerate(batch_splits):
+        attention_mask[i, :sum(splits) + 2] = 1
+    batch_bert_dict = {"input_ids": input_ids * attention_mask,
+                       "attention_mask": attention_mask,
+                       "token_type_ids": torch.zeros_like(input_ids),
+                       "subword_word_map": _subword_word_map(batch_splits, max_nsubwords)}
+    return batch_bert_dict, batch_splits
+
+
+######################################################
+######################################################
+
+torch.manual_seed(0)
+vocab = get_tokens(SENTENCES, load_char_tokens=True)
+output_dim = len(vocab["token2idx"])
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    """ SCLSTM """
+    model = SCLSTM(3 * len(vocab["chartoken2idx"]), vocab["token2idx"][vocab["pad_token"]], output_dim).eval()
+    ort_model = OrtModel(export_onnx(model, "sclstm", os.path.join(tmp_dir, "sclstm.onnx")), "sclstm")
+    for batch_sentences in BATCHES:
+        batch_screps, batch_lengths = sclstm_tokenize(batch_sentences, vocab)
+        check_predictions(model, ort_model, batch_screps, batch_lengths, batch_lengths.tolist())
+    print("sclstm: ok")
+
+    """ CharCNNWordLSTMModel, on the batched char idxs """
+    model = CharCNNWordLSTMModel(len(vocab["chartoken2idx"]), 128, vocab["chartoken2idx"][vocab["char_pad_token"]],
+                                 vocab["token2idx"][vocab["pad_token"]], output_dim).eval()
+    ort_model = OrtModel(export_onnx(model, "cnnlstm", os.path.join(tmp_dir, "cnnlstm.onnx")), "cnnlstm")
+    for batch_sentences in BATCHES:
+        batch_idxs, batch_lengths = char_tokenize(batch_sentences, vocab, batched=True)
+        check_predictions(model, ort_model, batch_idxs, batch_lengths, batch_lengths.tolist())
+    print("cnnlstm: ok")
+
+    """ SubwordBert, with and without the sub-token to word map of `bert_tokenize` """
+    model = random_subword_bert(output_dim).eval()
+    ort_model = OrtModel(export_onnx(model, "subwordbert", os.path.join(tmp_dir, "subwordbert.onnx")), "subwordbert")
+    for batch_sentences in BATCHES:
+        batch_bert_dict, batch_splits = bert_inputs(batch_sentences, model.bert_model.config.vocab_size)
+        batch_nwords = [len(splits) for splits in batch_splits]
+        check_predictions(model, ort_model, batch_bert_dict, batch_splits, batch_nwords)
+        batch_bert_dict.pop("subword_word_map")
+        check_predictions(model, ort_model, batch_bert_dict, batch_splits, batch_nwords)
+    print("subwordbert: ok")
@@ -0,0 +1,159 @@
+"""
+USAGE
+-----
+checks `MicroBatchScheduler` with a stub corrector: result ordering, batch flushing on `max_batch_size` and
+`max_wait_ms`, the all-or-nothing `submit_many` on a full queue, cancellation, the draining `close()`, failing and empty
+requests
+>>> python test_scheduler.py
+-----
+"""
+
+import queue
+import threading
+import time
+
+from neuspell.scheduler import MicroBatchScheduler
+
+TIMEOUT = 10  # secs; only reached if something is broken
+
+
+class StubCorrector:
+    """
+    upper-cases strings and records its batches; a call blocks while `gate` is cleared, and sets `entered`
+    """
+
+    def __init__(self):
+        self.batches = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.entered = threading.Event()
+
+    def correct_strings(self, mystrings, return_all=False):
+        self.batches.append([*mystrings])
+        self.entered.set()
+        assert self.gate.wait(TIMEOUT)
+        corrected_strings = [my_str.upper() for my_str in mystrings]
+        return ([*mystrings], corrected_strings) if return_all else corrected_strings
+
+
+def blocked_scheduler(**kwargs):
+    """ a scheduler whose corrector is stuck in a first batch ("blocker") until `corrector.gate.set()` """
+    corrector = StubCorrector()
+    corrector.gate.clear()
+    scheduler = MicroBatchScheduler(corrector, **kwargs)
+    blocker = scheduler.submit("blocker")
+    assert corrector.entered.wait(TIMEOUT)
+    return scheduler, corrector, blocker
+
+
+######################################################
+######################################################
+
+""" every future gets the result of its own string, across threads and batches """
+corrector = StubCorrector()
+with MicroBatchScheduler(corrector, max_batch_size=8, max_wait_ms=2) as scheduler:
+    results = {}
+
+    def _submit(thread_id):
+        mystrings = [f"thread {thread_id} string {i}" for i in range(50)]
+        results[thread_id] = (mystrings, scheduler.correct_strings(mystrings, timeout=TIMEOUT))
+
+    threads = [threading.Thread(target=_submit, args=(thread_id,)) for thread_id in range(4)]
+    [thread.start() for thread in threads]
+    [thread.join() for thread in threads]
+    for mystrings, corrected_strings in results.values():
+        assert corrected_strings == [my_str.upper() for my_str in mystrings]
+    assert scheduler.correct_string("one more", return_all=True, timeout=TIMEOUT) == ("one more", "ONE MORE")
+assert max([len(batch) for batch in corrector.batches]) <= 8
+assert scheduler.metrics()["nrequests"] == 4 * 50 + 1
+print(f"ordering: ok, {len(corrector.batches)} batches")
+
+""" a full batch runs right away, without waiting for `max_wait_ms` """
+corrector = StubCorrector()
+with MicroBatchScheduler(corrector, max_batch_size=4, max_wait_ms=60 * 1000) as scheduler:
+    st_time = time.perf_counter()
+    futures = scheduler.submit_many([f"string {i}" for i in range(8)])
+    assert [future.result(TIMEOUT)[1] for future in futures] == [f"STRING {i}" for i in range(8)]
+    assert time.perf_counter() - st_time < TIMEOUT / 2
+    assert [len(batch) for batch in corrector.batches] == [4, 4]
+print("max_batch_size flushing: ok")
+
+""" a partial batch runs `max_wait_ms` after its first request """
+corrector = StubCorrector()
+with MicroBatchScheduler(corrector, max_batch_size=100, max_wait_ms=200) as scheduler:
+    st_time = time.perf_counter()
+    futures = scheduler.submit_many(["a", "b", "c"])
+    [future.result(TIMEOUT) for future in futures]
+    time_taken = time.perf_counter() - st_time
+    assert 0.2 <= time_taken < TIMEOUT / 2, time_taken
+    assert corrector.batches == [["a", "b", "c"]]
+print(f"max_wait_ms flushing: ok, after {time_taken * 1000:.0f} ms")
+
+""" `submit_many` queues all strings or, when the queue fills up, none: the queued ones are cancelled and dropped """
+scheduler, corrector, blocker = blocked_scheduler(max_batch_size=100, max_wait_ms=1, max_queue_size=4)
+try:
+    scheduler.submit_many([f"rejected {i}" for i in range(6)])
+    raise AssertionError("expected queue.Full")
+except queue.Full:
+    pass
+corrector.gate.set()
+assert blocker.result(TIMEOUT) == ("blocker", "BLOCKER")
+assert scheduler.correct_strings(["accepted"], timeout=TIMEOUT) == ["ACCEPTED"]
+assert not any([my_str.startswith("rejected") for batch in corrector.batches for my_str in batch])
+scheduler.close()
+print("queue.Full rollback: ok")
+
+""" a request cancelled while queued is not corrected, and the others of its batch still are """
+scheduler, corrector, blocker = blocked_scheduler(max_batch_size=100, max_wait_ms=1)
+futures = scheduler.submit_many(["x", "y", "z"])
+assert futures[1].cancel()
+corrector.gate.set()
+assert [futures[0].result(TIMEOUT), futures[2].result(TIMEOUT)] == [("x", "X"), ("z", "Z")]
+assert futures[1].cancelled()
+scheduler.close()
+assert corrector.batches == [["blocker"], ["x", "z"]]
+print("cancellation: ok")
+
+""" `close()` stops accepting requests, and corrects those already queued """
+scheduler, corrector, blocker = blocked_scheduler(max_batch_size=2, max_wait_ms=1)
+futures = scheduler.submit_many([f"queued {i}" for i in range(5)])
+scheduler.close(wait=False)
+try:
+    scheduler.submit("too late")
+    raise AssertionError("expected RuntimeError")
+except RuntimeError:
+    pass
+corrector.gate.set()
+scheduler.close()
+assert not scheduler._thread.is_alive()
+assert [future.result(0)[1] for future in futures] == [f"QUEUED {i}" for i in range(5)]
+print("close() draining: ok")
+
+""" a failing request fails alone: its batch is retried string by string """
+corrector = StubCorrector()
+with MicroBatchScheduler(corrector, max_batch_size=100, max_wait_ms=50) as scheduler:
+    correct_strings = corrector.correct_strings
+
+    def _failing_correct_strings(mystrings, return_all=False):
+        if "fails" in mystrings:
+            raise ZeroDivisionError("fails")
+        return correct_strings(mystrings, return_all=return_all)
+
+    corrector.correct_strings = _failing_correct_strings
+    futures = scheduler.submit_many(["works", "fails", "works too"])
+    try:
+        futures[1].result(TIMEOUT)
+        raise AssertionError("expected ZeroDivisionError")
+    except ZeroDivisionError:
+        pass
+    assert [futures[0].result(TIMEOUT), futures[2].result(TIMEOUT)] == [("works", "WORKS"), ("works too", "WORKS TOO")]
+    assert corrector.batches == [["works"], ["works too"]]
+print("errors: ok")
+
+""" empty and whitespace-only strings are returned as they are, without reaching the corrector """
+corrector = StubCorrector()
+with MicroBatchScheduler(corrector, max_batch_size=100, max_wait_ms=1) as scheduler:
+    assert scheduler.correct_strings(["", "  ", "text", "\t"], return_all=True, timeout=TIMEOUT) == \
+           (["", "  ", "text", "\t"], ["", "  ", "TEXT", "\t"])
+    assert corrector.batches == [["text"]]
+print("empty strings: ok")
@@ -0,0 +1,75 @@
+"""
+USAGE
+-----
+checks that randomly initialised `SCLSTM`, `CharCNNWordLSTMModel` and `CharLSTMWordLSTMModel` models saved with
+`save_torchscript` give, under `ScriptedModel`, the same predictions as the eager models on batches of sentences of
+different lengths, with both the batched and the list inputs of `char_tokenize`
+>>> python test_torchscript_backend.py
+-----
+"""
+
+import os
+import tempfile
+
+import torch
+
+from neuspell.seq_modeling.helpers import char_tokenize, get_tokens, sclstm_tokenize
+from neuspell.seq_modeling.models import CharCNNWordLSTMModel, CharLSTMWordLSTMModel, SCLSTM
+from neuspell.torchscript_backend import ScriptedModel, save_torchscript
+
+SENTENCES = [
+    "the quick brown fox jumps over the lazy dog",
+    "a sentance with a speling misteak",
+    "short",
+    "words of very different lengths: a bb ccc dddddddddddddddd",
+    "the lazy dog sleeps",
+    "one two",
+]
+BATCHES = [SENTENCES[:3], SENTENCES[3:], SENTENCES[2:3], SENTENCES]
+
+
+def check_predictions(model, scripted_model, batch_nwords, *args):
+    """ the predictions of the words of each sentence; those of the padding positions are not used by the checkers """
+    _, predictions = model(*args)
+    _, scripted_predictions = scripted_model(*args)
+    assert predictions.shape == scripted_predictions.shape, (predictions.shape, scripted_predictions.shape)
+    for nwords, preds, scripted_preds in zip(batch_nwords, predictions, scripted_predictions):
+        assert (preds[:nwords] == scripted_preds[:nwords]).all(), (preds[:nwords], scripted_preds[:nwords])
+
+
+######################################################
+######################################################
+
+torch.manual_seed(0)
+vocab = get_tokens(SENTENCES, load_char_tokens=True)
+nchars, output_dim = len(vocab["chartoken2idx"]), len(vocab["token2idx"])
+char_padding_idx, padding_idx = vocab["chartoken2idx"][vocab["char_pad_token"]], vocab["token2idx"][vocab["pad_token"]]
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    """ SCLSTM """
+    model = SCLSTM(3 * nchars, padding_idx, output_dim).eval()
+    scripted_model = ScriptedModel(save_torchscript(model, os.path.join(tmp_dir, "sclstm.pt")))
+    for batch_sentences in BATCHES:
+        batch_screps, batch_lengths = sclstm_tokenize(batch_sentences, vocab)
+        check_predictions(model, scripted_model, batch_lengths.tolist(), batch_screps, batch_lengths)
+    print("sclstm: ok")
+
+    """ CharCNNWordLSTMModel, on the batched char idxs and on the per-sentence list of them """
+    model = CharCNNWordLSTMModel(nchars, 128, char_padding_idx, padding_idx, output_dim).eval()
+    scripted_model = ScriptedModel(save_torchscript(model, os.path.join(tmp_dir, "cnnlstm.pt")))
+    for batch_sentences in BATCHES:
+        for batched in [True, False]:
+            batch_idxs, batch_lengths = char_tokenize(batch_sentences, vocab, batched=batched)
+            check_predictions(model, scripted_model, batch_lengths.tolist(), batch_idxs, batch_lengths)
+    print("cnnlstm: ok")
+
+    """ CharLSTMWordLSTMModel, likewise with the char lengths """
+    model = CharLSTMWordLSTMModel(nchars, 128, char_padding_idx, padding_idx, output_dim).eval()
+    scripted_model = ScriptedModel(save_torchscript(model, os.path.join(tmp_dir, "lstmlstm.pt")))
+    for batch_sentences in BATCHES:
+        for batched in [True, False]:
+            batch_idxs, batch_lengths, batch_char_lengths = \
+                char_tokenize(batch_sentences, vocab, return_nchars=True, batched=batched)
+            check_predictions(model, scripted_model, batch_lengths.tolist(), batch_idxs, batch_char_lengths,
+                              batch_lengths)
+    print("lstmlstm: ok")
@@ -0,0 +1,60 @@
+"""
+USAGE
+-----
+checks that a checkpoint pruned with `prune_checkpoint` loads, and that its kept output rows and special tokens line up
+with the original checkpoint's
+>>> python test_vocab_pruning.py
+-----
+"""
+
+import os
+import tempfile
+
+import torch
+
+from neuspell import SclstmChecker
+from neuspell.vocab_pruning import prune_checkpoint
+
+TOPN = 1000
+
+######################################################
+######################################################
+
+checker = SclstmChecker(tokenize=False, device="cpu")
+checker.from_pretrained()
+vocab, state_dict = checker.vocab, checker.model.state_dict()
+
+with tempfile.TemporaryDirectory() as dest_path:
+    prune_checkpoint(checker.ckpt_path, dest_path, topn=TOPN)
+    assert not any([name in os.listdir(dest_path) for name in ["model.onnx", "model.pt", "quantized_model.pt"]])
+
+    pruned_checker = SclstmChecker(tokenize=False, device="cpu")
+    pruned_checker.from_pretrained(dest_path)
+    pruned_vocab, pruned_state_dict = pruned_checker.vocab, pruned_checker.model.state_dict()
+
+    """ special tokens are kept, and their idxs point at them """
+    for key in ["pad_token", "unk_token", "eos_token"]:
+        if f"{key}_idx" in vocab:
+            assert pruned_vocab["idx2token"][pruned_vocab[f"{key}_idx"]] == vocab[key], key
+    assert TOPN < len(pruned_vocab["token_freq"]) <= TOPN + 3
+
+    """ the pruned output rows are the original rows of the kept tokens, in the new vocab's order """
+    kept_idxs = [vocab["token2idx"][pruned_vocab["idx2token"][idx]] for idx in range(len(pruned_vocab["idx2token"]))]
+    assert kept_idxs == sorted(kept_idxs)
+    for key in ["dense.weight", "dense.bias"]:
+        assert pruned_state_dict[key].size(0) == len(kept_idxs), key
+        assert torch.equal(pruned_state_dict[key], state_dict[key][kept_idxs]), key
+
+    """ the training checkpoint, if any, is pruned alike """
+    if os.path.isfile(os.path.join(dest_path, "model.pth.tar")):
+        checkpoint_data = torch.load(os.path.join(dest_path, "model.pth.tar"), map_location="cpu")
+        for key in ["dense.weight", "dense.bias"]:
+            assert checkpoint_data["model_state_dict"][key].size(0) == len(kept_idxs), key
+
+    """ the pruned checker still corrects """
+    lines = ["to cheque sum spelling rul", "I lok forward to receving ur reply", "misteaks eye can knot sea"]
+    for line, original, pruned in zip(lines, checker.correct_strings(lines), pruned_checker.correct_strings(lines)):
+        assert len(pruned.split()) == len(line.split())
+        print(original, "\n\t\t→", pruned)
+
+print("pruned checkpoint lines up with the original")